@@ -0,0 +1,151 @@
+"""
+Worker memory and startup time of the case store as the catalogue grows, fully offline.
+
+For each --sizes value, writes a catalogue of that many generated cases (the same generator as
+benchmarks/ingest.py), then measures each loading mode in a fresh process, the way a worker starts:
+  * catalogue  CaseStore on the catalogue file: ids and indexes on the heap, texts left in the mapping
+  * validated  every record validated into CaseInterview and held in a dict, which is how the store
+               held a catalogue before (the search index is left out of both)
+Reported per mode: load time, private resident memory after loading (RssAnon: what every worker
+pays on its own) and file-backed resident memory (RssFile: mapped pages shared through the page
+cache), the same after 200 get()s and a page of summaries, and the get() latency.
+
+    python -m backend.benchmarks.case_memory --sizes 1000,10000,100000
+
+Linux only for RssAnon/RssFile; elsewhere the peak RSS from getrusage is reported instead.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from backend.benchmarks.ingest import synthetic_case
+from backend.database.case_store import stable_case_id
+from backend.database.catalogue import CatalogueWriter
+from backend.database.ingest import case_record
+from backend.database.models import CaseInterview
+
+MODES = ("catalogue", "validated")
+
+
+def write_catalogue(path: Path, count: int, seed: int) -> float:
+    """Returns the file size in MB."""
+    rng = random.Random(seed)
+    with CatalogueWriter(str(path)) as writer:
+        for number in range(count):
+            case = CaseInterview.model_validate({**synthetic_case(rng, number), "id": ""})
+            case.id = stable_case_id(case)
+            writer.add(*case_record(case))
+    return path.stat().st_size / 1e6
+
+
+def resident_mb() -> Dict[str, float]:
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f)
+        return {key: int(fields[key].split()[0]) / 1024 for key in ("RssAnon", "RssFile")}
+    except (OSError, KeyError):
+        scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return {"RssPeak": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale}
+
+
+def probe(mode: str, path: str) -> Dict:
+    """Runs in the child process: load the catalogue one way and measure."""
+    from backend.database.case_store import CaseStore
+    from backend.database.catalogue import CatalogueReader
+    from backend.services.catalogue_cache import CatalogueCache
+
+    before = resident_mb()
+    started = time.perf_counter()
+    if mode == "catalogue":
+        store = CaseStore(path)
+        ids = store.find()
+        get = store.get
+    else:
+        with CatalogueReader(path) as catalogue:
+            by_id = {case_id: CaseInterview.model_validate_json(catalogue.record(number))
+                     for number, case_id in enumerate(catalogue.ids)}
+        ids = list(by_id)
+        get = by_id.get
+    load_seconds = time.perf_counter() - started
+    loaded = resident_mb()
+
+    rng = random.Random(0)
+    sample = [rng.choice(ids) for _ in range(200)]
+    started = time.perf_counter()
+    for case_id in sample:
+        get(case_id)
+    get_us = (time.perf_counter() - started) / len(sample) * 1e6
+    if mode == "catalogue":
+        CatalogueCache(store).page(view="summary", limit=20)
+    used = resident_mb()
+
+    return {
+        "mode": mode,
+        "cases": len(ids),
+        "load_seconds": round(load_seconds, 3),
+        "get_us": round(get_us, 1),
+        "before_mb": {key: round(value, 1) for key, value in before.items()},
+        "loaded_mb": {key: round(value, 1) for key, value in loaded.items()},
+        "used_mb": {key: round(value, 1) for key, value in used.items()},
+    }
+
+
+def run(args) -> List[Dict]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="case-memory-") as tmp:
+        for size in args.sizes:
+            path = Path(tmp) / f"cases-{size}.catalogue"
+            started = time.perf_counter()
+            size_mb = write_catalogue(path, size, args.seed)
+            print(f"wrote {size} cases ({size_mb:.1f} MB) in {time.perf_counter() - started:.1f}s", flush=True)
+            for mode in args.modes:
+                output = subprocess.run(
+                    [sys.executable, "-m", "backend.benchmarks.case_memory", "--probe", mode, str(path)],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                result["catalogue_mb"] = round(size_mb, 1)
+                results.append(result)
+                print_row(result)
+    return results
+
+
+def _delta(result: Dict, stage: str) -> str:
+    memory, before = result[stage], result["before_mb"]
+    return " ".join(f"{key}={memory[key] - before[key]:+.1f}" for key in memory)
+
+
+def print_row(result: Dict) -> None:
+    print(f"  {result['mode']:<10} {result['cases']:>7} cases  load {result['load_seconds']:>7.2f}s  "
+          f"get {result['get_us']:>7.1f}us  loaded MB {_delta(result, 'loaded_mb')}  "
+          f"after use MB {_delta(result, 'used_mb')}", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated catalogue sizes")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"comma-separated subset of {','.join(MODES)}")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    parser.add_argument("--probe", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(probe(*args.probe)))
+        sys.exit(0)
+    args.sizes = [int(value) for value in args.sizes.split(",")]
+    args.modes = [mode for mode in args.modes.split(",") if mode in MODES]
+
+    report = run(args)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(report, indent=2))
+        print(f"report written to {args.out}")
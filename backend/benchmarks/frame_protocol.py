@@ -0,0 +1,109 @@
+"""
+Micro-benchmark of the chat websocket wire formats (services/frames.py).
+
+Encodes a typical streamed turn (session frame, coalesced deltas, the done frame, a phase change)
+with every available encoding and reports, per frame, the payload bytes, the bytes after
+permessage-deflate (zlib with context takeover, as a websocket connection keeps it) and the
+encode CPU time:
+
+    python -m backend.benchmarks.frame_protocol --turns 20 --repeat 200
+
+Encodings that need a missing optional package (orjson, msgpack) are skipped.
+"""
+import argparse
+import json
+import random
+import secrets
+import time
+import zlib
+from typing import Callable, Dict, List
+
+from backend.services import frames
+from backend.services.frames import FrameProtocol
+
+WORDS = (
+    "good question for this case you can assume the market is stable and client has no major competitor "
+    "moves planned think about customer consultants retailers economics of new model tell me which these "
+    "would look at first why revenue margin growth channel online store social media advisors brand cost"
+).split()
+
+
+def _reply(rng: random.Random, words: int = 110) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _response_id() -> str:
+    return "resp_" + secrets.token_hex(24)  # the shape of a Responses API id
+
+
+def sample_frames(turns: int, delta_chars: int = 48, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed)
+    out: List[Dict] = [{
+        "type": "session", "session_id": secrets.token_urlsafe(16), "resumed": False,
+        "response_id": _response_id(), "question_index": 0, "last_ai_message": _reply(rng, 30),
+    }]
+    for turn in range(turns):
+        reply = _reply(rng)
+        for start in range(0, len(reply), delta_chars):
+            out.append({"type": "delta", "delta": reply[start:start + delta_chars]})
+        out.append({"type": "done", "response_id": _response_id(), "ai_message": reply})
+        if turn % 5 == 4:
+            out.append({"type": "phase", "phase": "answer", "question_index": turn // 5, "question_count": 4})
+    return out
+
+
+def encoders() -> Dict[str, Callable[[Dict], bytes]]:
+    v1 = FrameProtocol(None)
+    v2 = FrameProtocol(None, frames.SUBPROTOCOL_JSON)
+    available: Dict[str, Callable[[Dict], bytes]] = {
+        "v1 json": lambda frame: v1.encode(frame).encode("utf-8"),
+        "v2 json": lambda frame: json.dumps(v2.compact(frame), separators=(",", ":"), ensure_ascii=False).encode("utf-8"),
+    }
+    if frames.orjson is not None:
+        available["v2 orjson"] = lambda frame: frames.orjson.dumps(v2.compact(frame))
+    if frames.msgpack is not None:
+        available["v2 msgpack"] = lambda frame: frames.msgpack.packb(v2.compact(frame))
+    return available
+
+
+def deflated_size(payloads: List[bytes]) -> int:
+    compressor = zlib.compressobj(wbits=-15)
+    total = 0
+    for payload in payloads:
+        # permessage-deflate: sync flush per message, minus the 4-byte empty block trailer
+        total += len(compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return total
+
+
+def run(args) -> Dict[str, Dict[str, float]]:
+    sample = sample_frames(args.turns)
+    results = {}
+    for name, encode in encoders().items():
+        payloads = [encode(frame) for frame in sample]
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for frame in sample:
+                encode(frame)
+        seconds = time.perf_counter() - started
+        results[name] = {
+            "bytes_per_frame": sum(map(len, payloads)) / len(payloads),
+            "deflated_bytes_per_frame": deflated_size(payloads) / len(payloads),
+            "encode_us_per_frame": seconds / (args.repeat * len(sample)) * 1e6,
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    results = run(args)
+    baseline = results["v1 json"]
+    print(f"{len(sample_frames(args.turns))} frames per pass, {args.repeat} passes")
+    print(f"{'encoding':<12}{'bytes/frame':>13}{'deflated':>10}{'encode us':>11}{'bytes vs v1':>13}")
+    for name, stats in results.items():
+        print(f"{name:<12}{stats['bytes_per_frame']:>13.1f}{stats['deflated_bytes_per_frame']:>10.1f}"
+              f"{stats['encode_us_per_frame']:>11.2f}"
+              f"{100 * (stats['bytes_per_frame'] / baseline['bytes_per_frame'] - 1):>+12.1f}%")
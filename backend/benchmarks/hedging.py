@@ -0,0 +1,139 @@
+"""
+Tail latency of LLM calls with and without hedging (services/llm_routing.py), fully offline.
+
+Sends the same stream of follow-up calls through llm_service twice: once plain, once hedged.
+Both runs use the in-process stub provider with the same seeded latency distribution and an
+injected tail (a few percent of responses take seconds instead of hundreds of milliseconds).
+Reports latency percentiles and how many extra upstream requests the hedges cost:
+
+    python -m backend.benchmarks.hedging --calls 2000 --concurrency 16 --tail-probability 0.03
+
+--stream hedges streamed replies instead and measures time to the first text delta. The first
+--warmup calls of each run fill the latency window the hedge delay is computed from and are left
+out of the percentiles.
+"""
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from backend.benchmarks.llm_concurrency import percentile
+from backend.services import llm_service
+from backend.services.llm_provider import LatencyDistribution, StubProvider, set_provider
+from backend.services.llm_routing import HedgeRouter, set_router
+from backend.services.metrics import LLM_HEDGES
+
+
+async def _timed_call(stream: bool) -> float:
+    started = time.perf_counter()
+    if not stream:
+        result = await llm_service.get_ai_response_follow_up(response_id="resp_bench", instructions="bench", curr_message="next")
+        if result.get("response_id") is None:
+            raise RuntimeError(result.get("ai_message"))
+        return time.perf_counter() - started
+    first = None
+    async for event in llm_service.stream_ai_response_follow_up(response_id="resp_bench", instructions="bench", curr_message="next"):
+        if event["type"] == "delta" and first is None:
+            first = time.perf_counter() - started
+        elif event["type"] == "error":
+            raise RuntimeError(event["error"])
+    return first if first is not None else time.perf_counter() - started
+
+
+async def run_once(args, hedged: bool) -> Dict:
+    provider = StubProvider(
+        latency=LatencyDistribution(
+            kind="lognormal", median_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+            tail_probability=args.tail_probability, tail_ms=args.tail_ms,
+        ),
+        token_ms=args.token_ms,
+        seed=args.seed,
+    )
+    provider.latency.rng.seed(args.seed)
+    set_provider(provider)
+    set_router(HedgeRouter(tiers={"default": ["stub"]}, enabled=hedged, budget=args.budget))
+    key = "follow_up_stream" if args.stream else "follow_up"
+    hedges_before = {outcome: LLM_HEDGES.value(kind=key, outcome=outcome) for outcome in ("sent", "won")}
+
+    latencies: List[float] = []
+    errors = 0
+    users = asyncio.Semaphore(args.concurrency)
+
+    async def one(index: int) -> None:
+        nonlocal errors
+        async with users:
+            try:
+                seconds = await _timed_call(args.stream)
+            except RuntimeError:
+                errors += 1
+                return
+            if index >= args.warmup:
+                latencies.append(seconds)
+
+    served_before = provider.requests_served
+    wall_started = time.perf_counter()
+    # warm-up calls complete first so the measured ones all see an adaptive delay
+    await asyncio.gather(*(one(index) for index in range(args.warmup)))
+    await asyncio.gather(*(one(index) for index in range(args.warmup, args.warmup + args.calls)))
+    wall = time.perf_counter() - wall_started
+    calls = args.warmup + args.calls
+    report = {
+        "hedged": hedged,
+        "calls": len(latencies),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "upstream_requests_per_call": round((provider.requests_served - served_before) / calls, 3),
+        "hedges_sent": int(LLM_HEDGES.value(kind=key, outcome="sent") - hedges_before["sent"]),
+        "hedges_won": int(LLM_HEDGES.value(kind=key, outcome="won") - hedges_before["won"]),
+    }
+    for pct in (50, 95, 99, 99.9):
+        report[f"p{pct:g}_ms"] = round(percentile(latencies, pct) * 1000, 1)
+    report["max_ms"] = round(max(latencies, default=0.0) * 1000, 1)
+    return report
+
+
+async def run(args) -> List[Dict]:
+    reports = [await run_once(args, hedged=False), await run_once(args, hedged=True)]
+    set_provider(None)
+    set_router(None)
+    return reports
+
+
+def print_reports(args, reports: List[Dict]) -> None:
+    measured = "time to first delta" if args.stream else "call latency"
+    print(f"{args.calls} calls ({args.warmup} warm-up), concurrency {args.concurrency}, {measured}; stub median "
+          f"{args.latency_ms:.0f} ms, {args.tail_probability:.1%} of calls ~{args.tail_ms:.0f} ms")
+    print(f"{'':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'p99.9 ms':>10}{'max ms':>9}{'req/call':>10}{'hedges':>8}{'won':>6}")
+    for report in reports:
+        print(f"{'hedged' if report['hedged'] else 'plain':>8}{report['p50_ms']:>9.1f}{report['p95_ms']:>9.1f}"
+              f"{report['p99_ms']:>9.1f}{report['p99.9_ms']:>10.1f}{report['max_ms']:>9.1f}"
+              f"{report['upstream_requests_per_call']:>10.3f}{report['hedges_sent']:>8}{report['hedges_won']:>6}")
+    plain, hedged = reports
+    if plain["p99_ms"]:
+        print(f"p99 change: {100 * (hedged['p99_ms'] / plain['p99_ms'] - 1):+.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16, help="calls in flight at once (below LLM_MAX_CONCURRENCY)")
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=60.0)
+    parser.add_argument("--tail-probability", type=float, default=0.03)
+    parser.add_argument("--tail-ms", type=float, default=3000.0)
+    parser.add_argument("--token-ms", type=float, default=0.0, help="stub delay between generated tokens")
+    parser.add_argument("--budget", type=float, default=0.1, help="LLM_HEDGE_BUDGET for the hedged run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--stream", action="store_true", help="hedge streamed replies, measure time to first delta")
+    parser.add_argument("--out", default=None, help="write the JSON reports here")
+    args = parser.parse_args()
+
+    reports = asyncio.run(run(args))
+    print_reports(args, reports)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(reports, indent=2))
+        print(f"report written to {args.out}")
@@ -0,0 +1,196 @@
+"""
+Bulk case ingestion (backend/database/ingest.py) on a generated library, fully offline.
+
+Writes --cases synthetic cases into a temporary directory as a mix of JSON (single cases and
+lists of 10), YAML and Markdown files, with a share of exact duplicates (the same case again in
+another file and format) and of broken files. Then imports the directory once per --workers
+setting and reports files/s, cases/s and the catalogue size, and finally compares how long the API's
+case store takes to load the catalogue against loading the directory itself:
+
+    python -m backend.benchmarks.ingest --cases 10000 --workers 1,4
+
+Every run must produce the same catalogue version; the benchmark checks it.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import yaml
+
+from backend.database.case_store import CaseStore
+from backend.database.db import cases as seed_cases
+from backend.database.ingest import ingest
+
+_WORDS = (
+    "market customer revenue margin growth channel pricing retail digital cost segment supply "
+    "competitor brand volume share strategy investment payback churn loyalty operations region"
+).split()
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def synthetic_case(rng: random.Random, number: int) -> Dict:
+    seed = seed_cases[0]
+    questions = [
+        {
+            "text": f"{_sentence(rng, 20)} {_sentence(rng, 12)}?",
+            "hints": [_sentence(rng, 10) for _ in range(rng.randint(0, 2))],
+            "reveal_answer": "\n".join(f"- {_sentence(rng, 14)}" for _ in range(4)),
+        }
+        for _ in range(rng.randint(2, 5))
+    ]
+    return {
+        "name": f"Case {number}",
+        "company": f"Company {number % 500}",
+        "source": rng.choice(("McKinsey Study", "BCG Casebook", "Bain Practice", "Club Casebook")),
+        "url": f"https://example.com/cases/{number}",
+        "description": {
+            "client_name": f"Client {number}",
+            "client_goal": _sentence(rng, 18),
+            "client_description": seed.description.client_description + "\n\n" + _sentence(rng, 40),
+            "situation_description": _sentence(rng, 40),
+            "company_study": _sentence(rng, 60) if rng.random() < 0.5 else "",
+            "global_hints": list(seed.description.global_hints or []),
+            "questions": questions,
+        },
+    }
+
+
+def to_markdown(case: Dict) -> str:
+    description = case["description"]
+    front = {key: case[key] for key in ("name", "company", "source", "url")}
+    front.update(client_name=description["client_name"], client_goal=description["client_goal"])
+    lines = ["---", yaml.safe_dump(front, sort_keys=False, allow_unicode=True).strip(), "---",
+             "# Client description", description["client_description"], "",
+             "# Situation", description["situation_description"], ""]
+    if description["company_study"]:
+        lines += ["# Company study", description["company_study"], ""]
+    lines += ["# Hints"] + [f"- {hint}" for hint in description["global_hints"]] + [""]
+    for question in description["questions"]:
+        lines += ["# Question", question["text"]]
+        if question["hints"]:
+            lines += ["## Hints"] + [f"- {hint}" for hint in question["hints"]]
+        lines += ["## Answer", question["reveal_answer"], ""]
+    return "\n".join(lines)
+
+
+def write_library(directory: Path, count: int, duplicate_rate: float, broken_rate: float, seed: int) -> Dict[str, int]:
+    rng = random.Random(seed)
+    written: List[Dict] = []
+    stats = {"files": 0, "cases": 0, "duplicates": 0, "broken": 0}
+    number = 0
+    while number < count:
+        shard = directory / f"shard{stats['files'] % 50:02d}"
+        shard.mkdir(exist_ok=True)
+        name = shard / f"case{stats['files']:06d}"
+        stats["files"] += 1
+        if rng.random() < broken_rate:
+            name.with_suffix(".json").write_text('{"name": "broken", "description": {', encoding="utf-8")
+            stats["broken"] += 1
+            continue
+        if written and rng.random() < duplicate_rate:
+            case = rng.choice(written)
+            stats["duplicates"] += 1
+        else:
+            case = synthetic_case(rng, number)
+            written.append(case)
+            number += 1
+        kind = rng.random()
+        if kind < 0.1 and count - number >= 9:
+            batch = [case] + [synthetic_case(rng, number + offset) for offset in range(9)]
+            written += batch[1:]
+            number += 9
+            name.with_suffix(".json").write_text(json.dumps(batch), encoding="utf-8")
+        elif kind < 0.4:
+            name.with_suffix(".json").write_text(json.dumps(case), encoding="utf-8")
+        elif kind < 0.7:
+            name.with_suffix(".yaml").write_text(yaml.safe_dump(case, allow_unicode=True), encoding="utf-8")
+        else:
+            name.with_suffix(".md").write_text(to_markdown(case), encoding="utf-8")
+    stats["cases"] = number
+    return stats
+
+
+def _load_seconds(path: str) -> float:
+    started = time.perf_counter()
+    CaseStore(path)
+    return time.perf_counter() - started
+
+
+def run(args) -> Dict:
+    with tempfile.TemporaryDirectory(prefix="case-ingest-") as tmp:
+        library = Path(tmp) / "library"
+        library.mkdir()
+        started = time.perf_counter()
+        stats = write_library(library, args.cases, args.duplicate_rate, args.broken_rate, args.seed)
+        print(f"generated {stats['cases']} cases in {stats['files']} files ({stats['duplicates']} duplicates, "
+              f"{stats['broken']} broken) in {time.perf_counter() - started:.1f}s")
+
+        runs = []
+        versions = set()
+        for workers in args.workers:
+            catalogue = Path(tmp) / f"cases-{workers}.catalogue"
+            report = ingest(str(library), str(catalogue), workers=workers, chunk_size=args.chunk_size)
+            versions.add(report.version)
+            runs.append({
+                "workers": workers,
+                "seconds": round(report.seconds, 3),
+                "files_per_second": round(report.files / report.seconds, 1),
+                "cases_per_second": round(report.cases / report.seconds, 1),
+                "cases": report.cases,
+                "duplicates": report.duplicates,
+                "failed_files": report.failed_files,
+                "catalogue_mb": round(catalogue.stat().st_size / 1e6, 2),
+            })
+        if len(versions) != 1:
+            raise RuntimeError(f"catalogues differ between worker counts: {versions}")
+
+        load = {"catalogue_seconds": round(_load_seconds(str(catalogue)), 3)}
+        if not args.skip_directory_load:
+            # the directory store only reads the top level, so point it at a flattened copy
+            flat = Path(tmp) / "flat"
+            flat.mkdir()
+            for path in library.rglob("*.*"):
+                os.link(path, flat / path.name)
+            load["directory_seconds"] = round(_load_seconds(str(flat)), 3)
+    return {"library": stats, "runs": runs, "load": load, "cpus": os.cpu_count()}
+
+
+def print_report(result: Dict) -> None:
+    print(f"{'workers':>8}{'seconds':>10}{'files/s':>10}{'cases/s':>10}{'cases':>8}{'dups':>7}{'failed':>8}{'MB':>8}")
+    for row in result["runs"]:
+        print(f"{row['workers']:>8}{row['seconds']:>10.2f}{row['files_per_second']:>10.0f}{row['cases_per_second']:>10.0f}"
+              f"{row['cases']:>8}{row['duplicates']:>7}{row['failed_files']:>8}{row['catalogue_mb']:>8.1f}")
+    load = result["load"]
+    line = f"case store load: catalogue {load['catalogue_seconds']:.2f}s"
+    if "directory_seconds" in load:
+        line += f", directory of files {load['directory_seconds']:.2f}s"
+    print(f"{line} ({result['cpus']} CPU(s))")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=10000)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="comma-separated worker counts to compare")
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--duplicate-rate", type=float, default=0.02)
+    parser.add_argument("--broken-rate", type=float, default=0.005)
+    parser.add_argument("--skip-directory-load", action="store_true", help="only time loading the catalogue")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    args = parser.parse_args()
+    args.workers = [int(value) for value in args.workers.split(",")]
+
+    result = run(args)
+    print_report(result)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(result, indent=2))
+        print(f"report written to {args.out}")
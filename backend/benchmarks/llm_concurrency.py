@@ -0,0 +1,143 @@
+"""
+Drives N concurrent interview sessions through llm_service against the local stub server and
+reports per-call latency percentiles, throughput and event-loop lag.
+
+Each session makes one initial call followed by --turns follow-up calls chained on the
+returned response_id, the same pattern as /chat/initiate_chat + the chat websocket.
+
+    python -m backend.benchmarks.llm_concurrency --sessions 200 --turns 3 --latency-ms 500
+
+--blocking reproduces the old behaviour (synchronous OpenAI client inside async def) so the
+two can be compared on the same machine. --stream sends the follow-ups through the streaming
+path (with websocket-style coalescing) and adds time-to-first-token and frames per reply.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import List
+
+from backend.benchmarks.stub_openai_server import StubOpenAIServer
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def _probe_loop_lag(stop: asyncio.Event, lags: List[float], interval: float = 0.01) -> None:
+    """Measures how late a short sleep wakes up; large values mean something blocked the loop."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run(args) -> None:
+    server = StubOpenAIServer(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, token_ms=args.token_ms
+    ).start_in_thread()
+    # llm_service reads these at import time
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.concurrency)
+    from backend.services import llm_service
+    from backend.services.streaming import coalesce_deltas
+
+    if args.blocking:
+        from openai import OpenAI
+
+        sync_client = OpenAI(base_url=server.base_url, api_key="stub-key")
+
+        async def call(**kwargs):
+            response = sync_client.responses.create(**kwargs)
+            return {"response_id": response.id, "ai_message": response.output_text}
+
+        async def initial():
+            return await call(model="gpt-4o-mini", input="Current case context: bench", instructions="bench")
+
+        async def follow_up(response_id):
+            return await call(model="gpt-4o-mini", previous_response_id=response_id,
+                              input=[{"role": "user", "content": "next"}], instructions="bench")
+    else:
+        async def initial():
+            return await llm_service.get_ai_response_initial(instructions="bench", current_case_context="bench")
+
+        async def follow_up(response_id):
+            if not args.stream:
+                return await llm_service.get_ai_response_follow_up(
+                    response_id=response_id, instructions="bench", curr_message="next"
+                )
+            started = time.perf_counter()
+            new_response_id, sent = None, 0
+            async for event in coalesce_deltas(llm_service.stream_ai_response_follow_up(
+                response_id=response_id, instructions="bench", curr_message="next"
+            )):
+                sent += 1
+                if sent == 1:
+                    ttfts.append(time.perf_counter() - started)
+                if event["type"] == "done":
+                    new_response_id = event["response_id"]
+            frames.append(sent)
+            return {"response_id": new_response_id}
+
+    ttfts: List[float] = []
+    frames: List[int] = []
+    latencies: List[float] = []
+    errors = 0
+
+    async def session() -> None:
+        nonlocal errors
+        started = time.perf_counter()
+        result = await initial()
+        latencies.append(time.perf_counter() - started)
+        response_id = result.get("response_id")
+        for _ in range(args.turns):
+            if response_id is None:
+                errors += 1
+                return
+            started = time.perf_counter()
+            result = await follow_up(response_id)
+            latencies.append(time.perf_counter() - started)
+            response_id = result.get("response_id")
+
+    lags: List[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe_loop_lag(stop, lags))
+    wall_started = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(args.sessions)))
+    wall = time.perf_counter() - wall_started
+    stop.set()
+    await probe
+
+    if not args.blocking:
+        await llm_service.aclose()
+
+    calls = len(latencies)
+    print(f"mode              : {'blocking (sync client)' if args.blocking else 'async pooled client'}")
+    print(f"sessions x calls  : {args.sessions} x {args.turns + 1}  (stub latency {args.latency_ms:.0f} ms)")
+    print(f"calls completed   : {calls}  errors: {errors}")
+    print(f"wall time         : {wall:.2f} s")
+    print(f"throughput        : {calls / wall:.1f} calls/s")
+    print(f"latency p50 / p99 : {percentile(latencies, 50) * 1000:.1f} / {percentile(latencies, 99) * 1000:.1f} ms")
+    if ttfts:
+        print(f"ttft p50 / p99    : {percentile(ttfts, 50) * 1000:.1f} / {percentile(ttfts, 99) * 1000:.1f} ms")
+        print(f"frames per reply  : {statistics.fmean(frames):.1f}")
+    print(f"loop lag max      : {max(lags, default=0.0) * 1000:.1f} ms  (mean {statistics.fmean(lags) * 1000 if lags else 0.0:.2f} ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=3, help="follow-up calls per session after the initial one")
+    parser.add_argument("--concurrency", type=int, default=64, help="LLM_MAX_CONCURRENCY for the run")
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--token-ms", type=float, default=20.0, help="stub delay between generated tokens")
+    parser.add_argument("--stream", action="store_true", help="stream follow-ups and report time-to-first-token")
+    parser.add_argument("--blocking", action="store_true", help="use the synchronous client like the old code did")
+    asyncio.run(run(parser.parse_args()))
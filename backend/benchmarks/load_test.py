@@ -0,0 +1,271 @@
+"""
+End-to-end load test of the whole backend, fully offline.
+
+Starts the app under uvicorn in a child process with LLM_PROVIDER=stub (see services/llm_provider.py),
+then simulates --users users. Each one lists the cases, opens one, calls /chat/initiate_chat and
+plays --turns turns over the chat websocket. Latency percentiles and throughput per step go to a
+JSON report that can be diffed against an earlier run:
+
+    python -m backend.benchmarks.load_test --users 2000 --turns 3 --out bench/after.json
+    python -m backend.benchmarks.load_test --users 2000 --compare bench/before.json
+
+The child inherits the environment, so LLM_STUB_* (stub latency, errors), CHAT_* (rate limits) and
+the other tunables apply as usual. The process-wide chat turn budget is lifted unless set explicitly,
+because otherwise the run measures the rate limiter. --url points the users at a server that is
+already running instead. --protocol 2 speaks the compact frame protocol (services/frames.py) and
+--no-deflate turns permessage-deflate off on both ends, to compare the wire formats end to end.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+from backend.benchmarks.llm_concurrency import percentile
+from backend.services.frames import SUBPROTOCOL_JSON, TYPES
+
+TYPE_NAMES = {code: name for name, code in TYPES.items()}
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+WS_ORIGIN = "http://localhost:3000"  # the chat websocket only accepts the frontend's origin
+
+STEPS = ("list_cases", "get_case", "initiate_chat", "ws_connect", "ws_turn", "ws_first_frame")
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {step: [] for step in STEPS}
+        self.errors: Dict[str, int] = {step: 0 for step in STEPS}
+        self.throttled = 0
+
+    def ok(self, step: str, seconds: float) -> None:
+        self.latencies[step].append(seconds)
+
+    def error(self, step: str) -> None:
+        self.errors[step] += 1
+
+    def report(self, wall: float) -> Dict[str, Dict[str, float]]:
+        steps = {}
+        for step in STEPS:
+            samples = self.latencies[step]
+            steps[step] = {
+                "count": len(samples),
+                "errors": self.errors[step],
+                "throughput_per_s": round(len(samples) / wall, 2) if wall else 0.0,
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 2) if samples else 0.0,
+                **{f"p{pct}_ms": round(percentile(samples, pct) * 1000, 2) for pct in (50, 90, 99)},
+                "max_ms": round(max(samples, default=0.0) * 1000, 2),
+            }
+        return steps
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int, deflate: bool = True) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["LLM_PROVIDER"] = "stub"
+    env.setdefault("CHAT_GLOBAL_TURNS_PER_SECOND", "1000000")
+    env.setdefault("CHAT_GLOBAL_BURST", "1000000")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--ws", "websockets", "--workers", str(workers), "--log-level", "warning", "--backlog", "4096",
+         "--ws-per-message-deflate", str(deflate).lower()],
+        cwd=REPO_ROOT,
+        env=env,
+    )
+
+
+async def wait_until_ready(base_url: str, server: Optional[subprocess.Popen], timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if server is not None and server.poll() is not None:
+                raise RuntimeError(f"server exited with code {server.returncode}")
+            try:
+                if (await client.get(f"{base_url}/cases/", params={"view": "summary"})).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not become ready within {timeout:.0f}s")
+
+
+async def simulate_user(index: int, args, client: httpx.AsyncClient, recorder: Recorder) -> None:
+    base_url = args.url
+
+    started = time.perf_counter()
+    response = await client.get(f"{base_url}/cases/", params={"view": "summary"})
+    if response.status_code != 200:
+        recorder.error("list_cases")
+        return
+    recorder.ok("list_cases", time.perf_counter() - started)
+    cases = response.json()
+    if not cases:
+        recorder.error("list_cases")
+        return
+    case_id = cases[index % len(cases)]["id"]
+
+    started = time.perf_counter()
+    response = await client.get(f"{base_url}/cases/{case_id}")
+    if response.status_code != 200:
+        recorder.error("get_case")
+        return
+    recorder.ok("get_case", time.perf_counter() - started)
+
+    started = time.perf_counter()
+    response = await client.post(f"{base_url}/chat/initiate_chat", json={"case_id": case_id})
+    body = response.json() if response.status_code == 200 else {}
+    if not body.get("response_id"):
+        recorder.error("initiate_chat")
+        return
+    recorder.ok("initiate_chat", time.perf_counter() - started)
+
+    ws_url = base_url.replace("http", "ws", 1) + f"/ws/chat/{case_id}/{body['response_id']}"
+    ws_url += "?stream=1" if args.stream else ""
+    started = time.perf_counter()
+    try:
+        socket_ = await websockets.connect(
+            ws_url, origin=WS_ORIGIN, open_timeout=args.timeout, max_size=None,
+            subprotocols=[SUBPROTOCOL_JSON] if args.protocol == 2 else None,
+            compression=None if args.no_deflate else "deflate",
+        )
+    except Exception:
+        recorder.error("ws_connect")
+        return
+    recorder.ok("ws_connect", time.perf_counter() - started)
+
+    async with socket_:
+        for turn in range(args.turns):
+            if args.think_ms:
+                await asyncio.sleep(args.think_ms / 1000)
+            started = time.perf_counter()
+            first_frame: Optional[float] = None
+            try:
+                await socket_.send(f"user {index} turn {turn}: what should I look at next?")
+                while True:
+                    frame = json.loads(await asyncio.wait_for(socket_.recv(), timeout=args.timeout))
+                    kind = frame.get("type", TYPE_NAMES.get(frame.get("t")))
+                    if kind == "session":
+                        continue  # protocol 2 opens every connection with one
+                    if kind == "throttled":
+                        recorder.throttled += 1
+                        continue
+                    if first_frame is None:
+                        first_frame = time.perf_counter() - started
+                    if "error" in frame or kind == "error":
+                        raise RuntimeError(frame.get("error", frame.get("e")))
+                    if kind == "delta":
+                        continue
+                    break  # "done" when streaming, the whole reply otherwise
+            except Exception:
+                recorder.error("ws_turn")
+                return
+            recorder.ok("ws_first_frame", first_frame)
+            recorder.ok("ws_turn", time.perf_counter() - started)
+
+
+async def run(args) -> Dict:
+    server = None
+    if args.url is None:
+        port = _free_port()
+        args.url = f"http://127.0.0.1:{port}"
+        server = start_server(port, args.workers, deflate=not args.no_deflate)
+    try:
+        await wait_until_ready(args.url, server)
+        recorder = Recorder()
+        limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+        async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+            ramp = args.ramp_seconds / max(1, args.users)
+
+            async def user(index: int) -> None:
+                await asyncio.sleep(index * ramp)
+                await simulate_user(index, args, client, recorder)
+
+            wall_started = time.perf_counter()
+            await asyncio.gather(*(user(index) for index in range(args.users)))
+            wall = time.perf_counter() - wall_started
+            metrics = (await client.get(f"{args.url}/metrics")).text
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "config": {
+            "users": args.users, "turns": args.turns, "stream": args.stream, "workers": args.workers,
+            "think_ms": args.think_ms, "ramp_seconds": args.ramp_seconds,
+            "protocol": args.protocol, "deflate": not args.no_deflate,
+            "stub": {name: value for name, value in os.environ.items() if name.startswith("LLM_STUB_")},
+        },
+        "wall_seconds": round(wall, 3),
+        "throttled_frames": recorder.throttled,
+        "steps": recorder.report(wall),
+        "server_llm_calls": sum(
+            float(line.rsplit(" ", 1)[1]) for line in metrics.splitlines() if line.startswith("llm_call_seconds_count")
+        ),
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: Dict, baseline: Optional[Dict] = None) -> None:
+    config = report["config"]
+    print(f"users x turns : {config['users']} x {config['turns']}  stream={config['stream']}  workers={config['workers']}")
+    print(f"wall time     : {report['wall_seconds']:.2f} s   throttled frames: {report['throttled_frames']}")
+    print(f"{'step':<16}{'count':>8}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for step, stats in report["steps"].items():
+        line = (f"{step:<16}{stats['count']:>8}{stats['errors']:>8}{stats['throughput_per_s']:>10.1f}"
+                f"{stats['p50_ms']:>10.1f}{stats['p90_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+        before = (baseline or {}).get("steps", {}).get(step)
+        if before and before["p99_ms"]:
+            line += f"   p99 {100 * (stats['p99_ms'] - before['p99_ms']) / before['p99_ms']:+.1f}% vs baseline"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=3, help="websocket turns per user")
+    parser.add_argument("--stream", action="store_true", help="use the streaming websocket mode")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause before each turn")
+    parser.add_argument("--ramp-seconds", type=float, default=2.0, help="spread user start times over this long")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the spawned server")
+    parser.add_argument("--protocol", type=int, choices=(1, 2), default=1, help="chat websocket frame protocol")
+    parser.add_argument("--no-deflate", action="store_true", help="disable permessage-deflate on both ends")
+    parser.add_argument("--connections", type=int, default=512, help="HTTP connection pool size of the load client")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--url", default=None, help="use an already running server instead of spawning one")
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    parser.add_argument("--compare", default=None, help="an earlier JSON report to show p99 changes against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(report, baseline)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(report, indent=2))
+        print(f"report written to {args.out}")
@@ -0,0 +1,81 @@
+"""
+Throughput scaling across uvicorn workers, fully offline.
+
+Runs the load test (load_test.py) once per worker count with the stub LLM and a fresh SQLite shared
+state (SHARED_STATE_PATH, see services/shared_state.py), so sessions, greetings and the global chat
+budget go through the multi-process backend the way they would in production. Prints throughput
+per worker count and the scaling efficiency against one worker:
+
+    python -m backend.benchmarks.multi_worker --workers 1 2 4 8 --users 2000 --out bench/scaling.json
+
+Scaling can only be near-linear up to the number of cores, which is printed alongside; past that
+the workers share CPUs. The --users are spread over --ramp-seconds, so raise both together when
+the server is not saturated.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+from backend.benchmarks import load_test
+
+
+async def run_scaling(args) -> Dict:
+    runs: List[Dict] = []
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ["SHARED_STATE_PATH"] = str(Path(directory) / "shared_state.db")
+            run_args = argparse.Namespace(
+                users=args.users, turns=args.turns, stream=args.stream, think_ms=0.0,
+                ramp_seconds=args.ramp_seconds, workers=workers, connections=args.connections,
+                timeout=args.timeout, url=None, protocol=1, no_deflate=False,
+            )
+            report = await load_test.run(run_args)
+        turns = report["steps"]["ws_turn"]
+        runs.append({
+            "workers": workers,
+            "wall_seconds": report["wall_seconds"],
+            "turns_per_s": round(turns["count"] / report["wall_seconds"], 2) if report["wall_seconds"] else 0.0,
+            "errors": sum(step["errors"] for step in report["steps"].values()),
+            "ws_turn_p50_ms": turns["p50_ms"],
+            "ws_turn_p99_ms": turns["p99_ms"],
+        })
+        print(f"{workers} worker(s): {runs[-1]['turns_per_s']:.1f} turns/s, p99 {turns['p99_ms']:.0f} ms")
+
+    base = runs[0]["turns_per_s"] / runs[0]["workers"] if runs and runs[0]["turns_per_s"] else 0.0
+    for entry in runs:
+        entry["efficiency"] = round(entry["turns_per_s"] / (base * entry["workers"]), 3) if base else 0.0
+    return {"cpu_count": os.cpu_count(), "users": args.users, "turns": args.turns, "runs": runs}
+
+
+def print_scaling(report: Dict) -> None:
+    print(f"cpus: {report['cpu_count']}   users x turns: {report['users']} x {report['turns']}")
+    print(f"{'workers':>8}{'turns/s':>10}{'speedup':>10}{'efficiency':>12}{'p99 ms':>10}{'errors':>8}")
+    first = report["runs"][0]["turns_per_s"] if report["runs"] else 0.0
+    for entry in report["runs"]:
+        speedup = entry["turns_per_s"] / first if first else 0.0
+        print(f"{entry['workers']:>8}{entry['turns_per_s']:>10.1f}{speedup:>10.2f}"
+              f"{entry['efficiency']:>12.2f}{entry['ws_turn_p99_ms']:>10.1f}{entry['errors']:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--ramp-seconds", type=float, default=1.0)
+    parser.add_argument("--connections", type=int, default=512)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_scaling(args))
+    print_scaling(report)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(report, indent=2))
+        print(f"report written to {args.out}")
@@ -0,0 +1,149 @@
+"""
+Turn latency through an upstream outage, with and without the circuit breaker (services/llm_resilience.py).
+
+Sends follow-up calls through llm_service at a steady rate against the in-process stub provider,
+which is healthy for --healthy seconds, then fails every request for --outage seconds (503s with
+--mode error, requests that never answer with --mode hang), then is healthy again for --recovered
+seconds. The run is repeated with the breaker off and on. Each call has a --timeout deadline, the
+way a chat turn does; retries (LLM_RETRY_ATTEMPTS) and the per-attempt timeout
+(LLM_ATTEMPT_TIMEOUT_SECONDS, without which a hung request is only noticed at the deadline) are the
+same in both runs.
+
+    python -m backend.benchmarks.outage --rate 20 --healthy 5 --outage 10 --recovered 10 --mode hang
+
+Reports, per phase, latency percentiles and the error codes the callers saw, the upstream requests
+sent during the outage, and how long after the outage ended the first call succeeded again.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from backend.benchmarks.llm_concurrency import percentile
+from backend.services import llm_service
+from backend.services.llm_provider import LatencyDistribution, StubProvider, set_provider
+from backend.services.llm_resilience import CircuitBreaker, Resilience, set_resilience
+from backend.services.llm_routing import HedgeRouter, set_router
+
+PHASES = ("healthy", "outage", "recovered")
+
+
+async def run_once(args, breaker: bool) -> Dict:
+    provider = StubProvider(
+        latency=LatencyDistribution(kind="lognormal", median_ms=args.latency_ms, jitter_ms=args.jitter_ms),
+        token_ms=args.token_ms,
+        seed=args.seed,
+    )
+    provider.latency.rng.seed(args.seed)
+    set_provider(provider)
+    set_router(HedgeRouter(tiers={"default": ["stub"]}, enabled=False))
+    set_resilience(Resilience(
+        breaker=CircuitBreaker(
+            enabled=breaker, window_seconds=args.window, min_calls=args.min_calls, open_seconds=args.open_seconds,
+        ),
+        attempts=args.attempts,
+        attempt_timeout=args.attempt_timeout,
+    ))
+
+    results: List[Tuple[str, float, float, str]] = []  # (phase, started at, seconds, code)
+    outage_started = args.healthy
+    outage_ended = args.healthy + args.outage
+    served_before = served_during = None  # upstream requests counted when the outage starts / ends
+
+    async def one(phase: str, at: float) -> None:
+        started = time.perf_counter()
+        result = await llm_service.get_ai_response_follow_up(
+            response_id="resp_bench", instructions="bench", curr_message="next", timeout=args.timeout,
+        )
+        code = "ok" if result.get("response_id") is not None else result.get("code", "unknown")
+        results.append((phase, at, time.perf_counter() - started, code))
+
+    calls = []
+    run_started = time.perf_counter()
+    total = args.healthy + args.outage + args.recovered
+    index = 0
+    while True:
+        at = index / args.rate
+        if at >= total:
+            break
+        delay = run_started + at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        phase = "healthy" if at < outage_started else "outage" if at < outage_ended else "recovered"
+        if phase == "outage" and served_before is None:
+            served_before = provider.requests_served
+            provider.outage(args.outage, mode=args.mode)
+        elif phase == "recovered" and served_during is None:
+            served_during = provider.requests_served - served_before
+        calls.append(asyncio.create_task(one(phase, at)))
+        index += 1
+    await asyncio.gather(*calls)
+
+    report: Dict = {"breaker": breaker, "upstream_requests_during_outage": served_during or 0}
+    for phase in PHASES:
+        seconds = [latency for name, _, latency, _ in results if name == phase]
+        report[phase] = {
+            "calls": len(seconds),
+            "p50_ms": round(percentile(seconds, 50) * 1000, 1),
+            "p99_ms": round(percentile(seconds, 99) * 1000, 1),
+            "max_ms": round(max(seconds, default=0.0) * 1000, 1),
+            "codes": dict(Counter(code for name, _, _, code in results if name == phase)),
+        }
+    first_ok = min((at for name, at, _, code in results if name == "recovered" and code == "ok"), default=None)
+    report["recovered_after_seconds"] = round(first_ok - outage_ended, 2) if first_ok is not None else None
+    return report
+
+
+async def run(args) -> List[Dict]:
+    reports = [await run_once(args, breaker=False), await run_once(args, breaker=True)]
+    set_provider(None)
+    set_router(None)
+    set_resilience(None)
+    return reports
+
+
+def print_reports(args, reports: List[Dict]) -> None:
+    print(f"{args.rate:g} calls/s, {args.timeout:g}s deadline, {args.attempts} attempts of at most "
+          f"{args.attempt_timeout or args.timeout:g}s; {args.healthy:g}s healthy, "
+          f"{args.outage:g}s outage ({args.mode}), {args.recovered:g}s recovered; stub median {args.latency_ms:.0f} ms")
+    print(f"{'':>9}{'phase':>11}{'calls':>7}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}  codes")
+    for report in reports:
+        label = "breaker" if report["breaker"] else "plain"
+        for phase in PHASES:
+            row = report[phase]
+            codes = ", ".join(f"{code} {count}" for code, count in sorted(row["codes"].items()))
+            print(f"{label:>9}{phase:>11}{row['calls']:>7}{row['p50_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}  {codes}")
+            label = ""
+        print(f"{'':>9}upstream requests during the outage: {report['upstream_requests_during_outage']}, "
+              f"first success {report['recovered_after_seconds']}s after it ended")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=20.0, help="calls started per second")
+    parser.add_argument("--healthy", type=float, default=5.0, help="seconds before the outage")
+    parser.add_argument("--outage", type=float, default=10.0, help="seconds the stub fails every request")
+    parser.add_argument("--recovered", type=float, default=10.0, help="seconds after the outage")
+    parser.add_argument("--mode", choices=("error", "hang"), default="hang")
+    parser.add_argument("--timeout", type=float, default=5.0, help="deadline of each call, seconds")
+    parser.add_argument("--attempts", type=int, default=3, help="LLM_RETRY_ATTEMPTS")
+    parser.add_argument("--attempt-timeout", type=float, default=2.0, help="LLM_ATTEMPT_TIMEOUT_SECONDS (0 = the deadline)")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=40.0)
+    parser.add_argument("--token-ms", type=float, default=0.0, help="stub delay between generated tokens")
+    parser.add_argument("--window", type=float, default=5.0, help="LLM_BREAKER_WINDOW_SECONDS")
+    parser.add_argument("--min-calls", type=int, default=10, help="LLM_BREAKER_MIN_CALLS")
+    parser.add_argument("--open-seconds", type=float, default=2.0, help="LLM_BREAKER_OPEN_SECONDS")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=None, help="write the JSON reports here")
+    args = parser.parse_args()
+
+    reports = asyncio.run(run(args))
+    print_reports(args, reports)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(reports, indent=2))
+        print(f"report written to {args.out}")
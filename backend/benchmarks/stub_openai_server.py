@@ -0,0 +1,198 @@
+"""
+A tiny local stand-in for the OpenAI Responses API, used by the benchmarks so they can run
+without network access or an API key.
+
+It speaks just enough HTTP/1.1 (keep-alive, Content-Length bodies, chunked SSE) for the openai
+client. Every POST /v1/responses waits --latency-ms before the first token and --token-ms per
+token after that; "stream": true requests get the reply as server-sent events.
+
+Run standalone:
+    python -m backend.benchmarks.stub_openai_server --port 8765 --latency-ms 500
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+from typing import Optional, Tuple
+
+
+def make_response_body(text: str, model: str = "gpt-4o-mini") -> dict:
+    """A minimal Responses API object that the openai client can parse (id + output_text)."""
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": model,
+        "output": [
+            {
+                "id": f"msg_{uuid.uuid4().hex}",
+                "type": "message",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }
+        ],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": 120,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": len(text.split()),
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": 120 + len(text.split()),
+        },
+    }
+
+
+STUB_REPLY = (
+    "Thanks, that is a good start. Let's structure this: think about the customer, the "
+    "consultants, the retailers and the economics. Which of these would you look at first?"
+)
+
+
+def _sse(event: dict) -> bytes:
+    data = f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+    # one HTTP chunk per event
+    return f"{len(data):x}\r\n".encode() + data + b"\r\n"
+
+
+class StubOpenAIServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 500.0,
+        jitter_ms: float = 0.0,
+        token_ms: float = 0.0,
+    ):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.token_ms = token_ms
+        self.requests_served = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self) -> "StubOpenAIServer":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def start_in_thread(self) -> "StubOpenAIServer":
+        """
+        Runs the server on its own loop in a daemon thread. Benchmarks use this so that a client
+        which blocks its event loop cannot also stall the server it is measuring.
+        """
+        started = threading.Event()
+        loop = asyncio.new_event_loop()
+
+        def _run() -> None:
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=_run, name="stub-openai-server", daemon=True).start()
+        started.wait()
+        return self
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, bytes]]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return None
+        lines = head.decode("latin-1").split("\r\n")
+        method, path, _ = lines[0].split(" ", 2)
+        length = 0
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip())
+        body = await reader.readexactly(length) if length else b""
+        return method, path, body
+
+    async def _stream_reply(self, writer: asyncio.StreamWriter, model: str) -> None:
+        response = make_response_body(STUB_REPLY, model)
+        item_id = response["output"][0]["id"]
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+            b"Transfer-Encoding: chunked\r\nConnection: keep-alive\r\n\r\n"
+        )
+        writer.write(_sse({"type": "response.created", "sequence_number": 0,
+                           "response": {**response, "status": "in_progress", "output": []}}))
+        await writer.drain()
+        tokens = STUB_REPLY.split(" ")
+        for index, token in enumerate(tokens):
+            if index and self.token_ms:
+                await asyncio.sleep(self.token_ms / 1000)
+            writer.write(_sse({
+                "type": "response.output_text.delta", "sequence_number": index + 1, "item_id": item_id,
+                "output_index": 0, "content_index": 0, "delta": token if index == 0 else f" {token}",
+            }))
+            await writer.drain()
+        writer.write(_sse({"type": "response.completed", "sequence_number": len(tokens) + 1, "response": response}))
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, body = request
+                if method == "POST" and path.endswith("/responses"):
+                    request_json = json.loads(body or b"{}")
+                    model = request_json.get("model", "gpt-4o-mini")
+                    delay = max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+                    await asyncio.sleep(delay)
+                    self.requests_served += 1
+                    if request_json.get("stream"):
+                        await self._stream_reply(writer, model)
+                        continue
+                    tokens = STUB_REPLY.split(" ")
+                    await asyncio.sleep(len(tokens) * self.token_ms / 1000)
+                    payload = json.dumps(make_response_body(STUB_REPLY, model)).encode()
+                    status = "200 OK"
+                else:
+                    payload = json.dumps({"error": {"message": f"unknown route {path}"}}).encode()
+                    status = "404 Not Found"
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\nConnection: keep-alive\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def _serve_forever(args) -> None:
+    server = await StubOpenAIServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.token_ms).start()
+    print(f"Stub OpenAI server listening on {server.base_url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--token-ms", type=float, default=0.0, help="delay between streamed tokens")
+    asyncio.run(_serve_forever(parser.parse_args()))
@@ -0,0 +1,114 @@
+"""
+Cases written as Markdown, one case per *.md file, for case books that are easier to edit as prose.
+
+    ---
+    name: Practice Case
+    company: Beautify
+    source: McKinsey Study
+    url: https://www.mckinsey.com/careers/interviewing/beautify
+    client_name: Beautify
+    client_goal: Beautify has approached McKinsey for help with exploring new ways to approach its customers.
+    ---
+    # Client description
+    Beautify is a global prestige cosmetics company ...
+
+    # Situation
+    Beautify's president and COO engaged McKinsey to ...
+
+    # Company study                  (optional)
+    # Hints                          (optional, a bullet list)
+    - Write down important information.
+
+    # Question                       (one section per question, in order)
+    What possible factors should Beautify consider ...
+    ## Hints                         (optional, a bullet list)
+    - Develop an overall approach before diving into details.
+    ## Answer
+    Some of the factors you might discuss: ...
+
+The front matter is YAML and may also pin an `id`. Headings are matched case-insensitively and a
+question heading may carry a title ("# Question 2: payback"). Anything else in the file is an error,
+so a typo in a heading is reported instead of silently dropping a section.
+"""
+import re
+from typing import Dict, List, Tuple
+
+import yaml
+
+_SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+_HEADING = re.compile(r"^(#{1,2})\s+(.*?)\s*#*\s*$")
+_BULLET = re.compile(r"^\s*[-*+]\s+(.*)$")
+
+_SECTIONS = {
+    "client description": "client_description",
+    "situation": "situation_description",
+    "company study": "company_study",
+    "hints": "global_hints",
+}
+_FRONT_MATTER_FIELDS = ("id", "name", "company", "source", "url", "client_name", "client_goal")
+
+
+def _bullets(lines: List[str], where: str) -> List[str]:
+    items: List[str] = []
+    for line in lines:
+        match = _BULLET.match(line)
+        if match:
+            items.append(match.group(1).strip())
+        elif line.strip():
+            if not items:
+                raise ValueError(f"{where}: expected a bullet list")
+            items[-1] += " " + line.strip()  # a wrapped bullet
+    return items
+
+
+def _text(lines: List[str]) -> str:
+    return "\n".join(lines).strip()
+
+
+def _split(body: str) -> List[Tuple[int, str, int, List[str]]]:
+    """(heading level, heading, line number, lines under it) for every heading; text before the first one is an error."""
+    sections: List[Tuple[int, str, int, List[str]]] = []
+    for number, line in enumerate(body.splitlines(), 1):
+        match = _HEADING.match(line)
+        if match:
+            sections.append((len(match.group(1)), match.group(2), number, []))
+        elif sections:
+            sections[-1][3].append(line)
+        elif line.strip():
+            raise ValueError(f"line {number}: text before the first heading")
+    return sections
+
+
+def parse_markdown_case(text: str) -> Dict:
+    """The case as the dict CaseInterview validates. Raises ValueError naming the line at fault."""
+    if not text.startswith("---"):
+        raise ValueError("missing the --- front matter block")
+    _, front, body = (text.split("---", 2) + ["", ""])[:3]
+    meta = yaml.load(front, Loader=_SafeLoader) or {}
+    if not isinstance(meta, dict):
+        raise ValueError("the front matter must be a mapping")
+    unknown = set(meta) - set(_FRONT_MATTER_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown front matter field(s): {', '.join(sorted(unknown))}")
+    front_lines = front.count("\n")  # body line 1 is the closing --- line, so line numbers count from the top of the file
+
+    description: Dict = {key: meta.pop(key) for key in ("client_name", "client_goal") if key in meta}
+    questions: List[Dict] = []
+    for level, heading, number, lines in _split(body):
+        where = f"line {number + front_lines}"
+        name = heading.lower()
+        if level == 1 and (name == "question" or name.startswith(("question ", "question:"))):
+            questions.append({"text": _text(lines), "hints": [], "reveal_answer": ""})
+        elif level == 2 and questions and name in ("hints", "answer"):
+            if name == "hints":
+                questions[-1]["hints"] = _bullets(lines, where)
+            else:
+                questions[-1]["reveal_answer"] = _text(lines)
+        elif level == 1 and name in _SECTIONS:
+            key = _SECTIONS[name]
+            description[key] = _bullets(lines, where) if key == "global_hints" else _text(lines)
+        else:
+            raise ValueError(f"{where}: unexpected heading {'#' * level} {heading}")
+    description["questions"] = questions
+    return {**meta, "description": description}
@@ -0,0 +1,483 @@
+"""
+Case repository: where the API looks cases up.
+
+Cases come from one of four sources, picked with CASE_STORE_PATH:
+    unset                 -> the built-in seed list in backend/database/db.py
+    a directory           -> every *.json / *.yaml / *.yml file in it (one case or a list of cases per
+                             file) and every *.md file (one case each, see case_markdown.py)
+    a *.db / *.sqlite file -> rows of a `cases(id, data, content_hash)` table, data being the case as JSON
+    a *.catalogue file    -> a compact catalogue built by the ingestion command (ingest.py, catalogue.py)
+
+Every case gets a stable id derived from its identity (company, source, name, url), so the same
+case has the same id in every worker and across restarts. A file or row may still pin its own id.
+Lookups go through dict indexes (by id, company and source) instead of scanning a list, text
+search goes through an inverted index (search_index.py) that is updated as cases load, and the
+source is re-checked at most every CASE_STORE_REFRESH_SECONDS; only changed files/rows are re-parsed.
+
+A catalogue is not loaded into models at all. The store keeps its mapping (catalogue.py) and on the
+heap only the ids, positions and company/source indexes; case texts stay in the shared mapping.
+get() builds the CaseInterview from the record without re-validating it (trusted_case: ingest
+validated it) and keeps the last CASE_STORE_MODEL_CACHE of them; the listing endpoints never build
+models, they serve case_json()/summary_json(), which are slices of the file. The search index is
+built on the first text search instead of at load.
+
+To move the seed cases out of code:
+    python -m backend.database.case_store export cases/        # or cases.db
+To import a library of case files (validated in parallel, deduplicated) into one catalogue:
+    python -m backend.database.ingest cases/ cases.catalogue
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import yaml
+from pydantic import ValidationError
+
+from backend.database.case_markdown import parse_markdown_case
+from backend.database.catalogue import CATALOGUE_SUFFIX, CatalogueReader
+from backend.database.models import CaseInterview, CaseSummary, Description, Question
+from backend.database.search_index import CaseSearchIndex, tokenize
+
+try:
+    import orjson  # optional: faster parsing of catalogue records
+except ImportError:
+    orjson = None
+
+CASE_STORE_PATH = os.getenv("CASE_STORE_PATH")
+CASE_STORE_REFRESH_SECONDS = float(os.getenv("CASE_STORE_REFRESH_SECONDS", "2"))
+# Catalogue stores: how many built CaseInterview objects to keep for repeated get()s
+CASE_STORE_MODEL_CACHE = int(os.getenv("CASE_STORE_MODEL_CACHE", "256"))
+
+CASE_FILE_SUFFIXES = (".json", ".yaml", ".yml", ".md")
+_SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+logger = logging.getLogger(__name__)
+
+
+def _canonical_json(data) -> bytes:
+    return json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def stable_case_id(case: CaseInterview) -> str:
+    """Id derived from what makes a case *that* case, so fixing a typo in a description keeps the id."""
+    identity = [case.company.strip().lower(), case.source.strip().lower(), case.name.strip().lower(), case.url.strip()]
+    return hashlib.sha256(_canonical_json(identity)).hexdigest()[:16]
+
+
+def case_content_hash(case: CaseInterview) -> str:
+    """Hash of everything except the id; changes whenever any text in the case changes."""
+    return hashlib.sha256(_canonical_json(case.model_dump(exclude={"id"}))).hexdigest()
+
+
+def _with_stable_id(raw: dict) -> CaseInterview:
+    pinned_id = raw.get("id")
+    case = CaseInterview.model_validate({**raw, "id": pinned_id or ""})
+    return case.model_copy(update={"id": pinned_id or stable_case_id(case)})
+
+
+def trusted_case(data: dict) -> CaseInterview:
+    """CaseInterview from already-validated data (a catalogue record), built without validation."""
+    description = dict(data["description"])
+    description["questions"] = [Question.model_construct(**question) for question in description["questions"]]
+    return CaseInterview.model_construct(**{**data, "description": Description.model_construct(**description)})
+
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+# libyaml's loader when PyYAML was built with it: several times faster on large case books
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def parse_case_file(path: Path) -> List[CaseInterview]:
+    """The validated cases in a .json / .yaml / .yml / .md file. Raises on anything invalid."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix == ".json":
+            data = json.load(f)
+        elif path.suffix == ".md":
+            data = parse_markdown_case(f.read())
+        else:
+            data = yaml.load(f, Loader=_YamlLoader)
+    if data is None:
+        return []
+    items = data if isinstance(data, list) else [data]
+    return [_with_stable_id(item) for item in items]
+
+
+class CaseStore:
+    """
+    In-memory index over the case source. All lookups are dict hits; list_cases() keeps the
+    source order (seed order, then file name order, then rowid order).
+    """
+
+    def __init__(self, path: Optional[str] = None, refresh_seconds: float = CASE_STORE_REFRESH_SECONDS):
+        self.path = Path(path).resolve() if path else None
+        self.refresh_seconds = refresh_seconds
+        self.version = ""
+
+        self._by_id: Dict[str, CaseInterview] = {}
+        self._content_hashes: Dict[str, str] = {}
+        self._by_company: Dict[str, List[str]] = {}
+        self._by_source: Dict[str, List[str]] = {}
+        self._order: List[str] = []
+        self._position: Dict[str, int] = {}
+        self._search = CaseSearchIndex()
+
+        # what was loaded from where, so a refresh only re-reads what changed
+        self._file_stamps: Dict[Path, Tuple[int, int]] = {}
+        self._file_cases: Dict[Path, List[str]] = {}
+        self._sqlite_hashes: Dict[str, str] = {}
+        self._sqlite_data_version: Optional[int] = None
+        # PRAGMA data_version only moves for commits made by *other* connections, so keep one open
+        self._sqlite_conn: Optional[sqlite3.Connection] = None
+        self._checked_at = 0.0
+
+        # catalogue sources: the open catalogue (ids and positions are all that is on the heap),
+        # recently built models, and whether the search index still has to be built
+        self._catalogue: Optional[CatalogueReader] = None
+        self._models: "OrderedDict[str, CaseInterview]" = OrderedDict()
+        self._search_pending = False
+
+        self.refresh(force=True)
+
+    # ---- lookups -----------------------------------------------------------------------------
+
+    def get(self, case_id: str) -> Optional[CaseInterview]:
+        self.maybe_refresh()
+        return self._case(case_id)
+
+    def list_cases(self) -> List[CaseInterview]:
+        """Every case as a model; for a catalogue this builds them all, so listings use case_json()."""
+        self.maybe_refresh()
+        return [self._case(case_id, keep=False) for case_id in self._order]
+
+    def by_company(self, company: str) -> List[CaseInterview]:
+        self.maybe_refresh()
+        return [self._case(case_id) for case_id in self._by_company.get(company.strip().lower(), [])]
+
+    def by_source(self, source: str) -> List[CaseInterview]:
+        self.maybe_refresh()
+        return [self._case(case_id) for case_id in self._by_source.get(source.strip().lower(), [])]
+
+    def case_json(self, case_id: str) -> Optional[bytes]:
+        """The case as compact JSON (what CaseInterview.model_dump_json gives), without building a model when it can."""
+        self.maybe_refresh()
+        if self._catalogue is not None:
+            number = self._position.get(case_id)
+            return None if number is None else self._catalogue.record(number)
+        case = self._by_id.get(case_id)
+        return None if case is None else case.model_dump_json().encode("utf-8")
+
+    def summary_json(self, case_id: str) -> Optional[bytes]:
+        """The case's CaseSummary as compact JSON."""
+        self.maybe_refresh()
+        if self._catalogue is not None:
+            number = self._position.get(case_id)
+            return None if number is None else self._catalogue.summary(number)
+        case = self._by_id.get(case_id)
+        return None if case is None else CaseSummary.from_case(case).model_dump_json().encode("utf-8")
+
+    def json_items(self, view: str = "full") -> Iterator[bytes]:
+        """
+        Every case's JSON ("full") or summary JSON ("summary") in catalogue order. What to serialize is
+        captured when this is called; iterating never touches the store, so it may run in a thread.
+        """
+        self.maybe_refresh()
+        catalogue = self._catalogue
+        if catalogue is not None:
+            read = catalogue.summary if view == "summary" else catalogue.record
+            return (read(number) for number in range(len(catalogue)))
+        cases = [self._by_id[case_id] for case_id in self._order]
+        if view == "summary":
+            return (CaseSummary.from_case(case).model_dump_json().encode("utf-8") for case in cases)
+        return (case.model_dump_json().encode("utf-8") for case in cases)
+
+    @property
+    def memory_mapped(self) -> bool:
+        """True when cases are served from a catalogue mapping rather than held as models."""
+        return self._catalogue is not None
+
+    def find(self, company: Optional[str] = None, source: Optional[str] = None, text: Optional[str] = None) -> List[str]:
+        """
+        Ids of the cases matching every given filter. Text matches come best first; otherwise
+        the catalogue order is kept. Filters are intersected starting from the narrowest.
+        Text with no searchable words (blank, or only stopwords) matches nothing.
+        """
+        self.maybe_refresh()
+        if text is not None and not tokenize(text):
+            return []
+        candidates: List[Set[str]] = []
+        if company is not None:
+            candidates.append(set(self._by_company.get(company.strip().lower(), ())))
+        if source is not None:
+            candidates.append(set(self._by_source.get(source.strip().lower(), ())))
+        scores: Dict[str, int] = {}
+        if text is not None:
+            if self._search_pending:
+                self._build_search_index()
+            scores = self._search.search(text)
+            candidates.append(set(scores))
+        if not candidates:
+            return list(self._order)
+        candidates.sort(key=len)
+        matches = candidates[0].intersection(*candidates[1:])
+        return sorted(matches, key=lambda case_id: (-scores.get(case_id, 0), self._position[case_id]))
+
+    def position(self, case_id: str) -> Optional[int]:
+        """Index of the case in catalogue order; used for keyset pagination."""
+        return self._position.get(case_id)
+
+    def content_hash(self, case_id: str) -> Optional[str]:
+        if self._catalogue is not None:
+            number = self._position.get(case_id)
+            return None if number is None else self._catalogue.content_hash(number)
+        return self._content_hashes.get(case_id)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def _case(self, case_id: str, keep: bool = True) -> Optional[CaseInterview]:
+        if self._catalogue is None:
+            return self._by_id.get(case_id)
+        case = self._models.get(case_id)
+        if case is not None:
+            self._models.move_to_end(case_id)
+            return case
+        number = self._position.get(case_id)
+        if number is None:
+            return None
+        row = self._catalogue.row(number)
+        data = _loads(self._catalogue.record(number))
+        # the interned strings, so every model of a company shares one copy
+        data["company"], data["source"] = row.company, row.source
+        case = trusted_case(data)
+        if keep and CASE_STORE_MODEL_CACHE > 0:
+            self._models[case_id] = case
+            if len(self._models) > CASE_STORE_MODEL_CACHE:
+                self._models.popitem(last=False)
+        return case
+
+    # ---- loading -----------------------------------------------------------------------------
+
+    def maybe_refresh(self) -> None:
+        if self.path is not None and time.monotonic() - self._checked_at >= self.refresh_seconds:
+            self.refresh()
+
+    def refresh(self, force: bool = False) -> bool:
+        """Re-reads whatever changed in the source. Returns True if the catalogue changed."""
+        self._checked_at = time.monotonic()
+        if self.path is None:
+            if not force:
+                return False
+            from backend.database.db import cases as seed_cases
+
+            loaded = [_with_stable_id(case.model_dump(exclude={"id"})) for case in seed_cases]
+            changed = self._replace_all(loaded)
+        elif self.path.suffix in _SQLITE_SUFFIXES:
+            changed = self._refresh_sqlite(force)
+        elif self.path.suffix == CATALOGUE_SUFFIX:
+            changed = self._refresh_catalogue()
+        elif self.path.is_dir():
+            changed = self._refresh_directory()
+        else:
+            changed = self._refresh_file()
+        if changed:
+            self._rebuild_indexes()
+        return changed
+
+    def _file_changed(self, path: Path) -> bool:
+        stat = path.stat()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if self._file_stamps.get(path) == stamp:
+            return False
+        self._file_stamps[path] = stamp
+        return True
+
+    def _replace_all(self, loaded: Iterable[CaseInterview]) -> bool:
+        self._by_id = {}
+        self._content_hashes = {}
+        self._order = []
+        self._search.clear()
+        for case in loaded:
+            self._put(case)
+        return True
+
+    def _put(self, case: CaseInterview) -> None:
+        if case.id not in self._by_id:
+            self._order.append(case.id)
+        self._by_id[case.id] = case
+        self._content_hashes[case.id] = case_content_hash(case)
+        self._search.add(case)
+
+    def _drop(self, case_ids: Iterable[str]) -> None:
+        dropped = set(case_ids)
+        if not dropped:
+            return
+        for case_id in dropped:
+            self._by_id.pop(case_id, None)
+            self._content_hashes.pop(case_id, None)
+            self._search.remove(case_id)
+        self._order = [case_id for case_id in self._order if case_id not in dropped]
+
+    def _refresh_file(self) -> bool:
+        try:
+            if not self._file_changed(self.path):
+                return False
+            loaded = parse_case_file(self.path)
+        except (OSError, ValueError, ValidationError, yaml.YAMLError) as e:
+            # keep serving the last good version; the file is read again once it changes
+            logger.warning("Skipping case file %s: %s", self.path, e)
+            return False
+        return self._replace_all(loaded)
+
+    def _refresh_directory(self) -> bool:
+        present = sorted(p for p in self.path.iterdir() if p.is_file() and p.suffix in CASE_FILE_SUFFIXES)
+        changed = False
+        for gone in set(self._file_cases) - set(present):
+            self._drop(self._file_cases.pop(gone))
+            self._file_stamps.pop(gone, None)
+            changed = True
+        for path in present:
+            if not self._file_changed(path):
+                continue
+            try:
+                loaded = parse_case_file(path)
+            except Exception as e:
+                # keep serving the last good version of this file
+                logger.warning("Skipping case file %s: %s", path, e)
+                continue
+            self._drop(set(self._file_cases.get(path, [])) - {case.id for case in loaded})
+            for case in loaded:
+                self._put(case)
+            self._file_cases[path] = [case.id for case in loaded]
+            changed = True
+        if changed:
+            # keep list order stable: by file name, then position within the file
+            self._order = list(dict.fromkeys(
+                case_id for path in present for case_id in self._file_cases.get(path, [])
+            ))
+        return changed
+
+    def _refresh_catalogue(self) -> bool:
+        # A catalogue is replaced whole by the ingestion command, so a change means a full reload.
+        # The previous mapping is not closed here: it goes away once nothing references it.
+        try:
+            if not self._file_changed(self.path):
+                return False
+            catalogue = CatalogueReader(self.path)
+        except (OSError, ValueError) as e:
+            # keep serving the previous catalogue; the file is read again once it changes
+            logger.warning("Skipping case catalogue %s: %s", self.path, e)
+            return False
+        self._catalogue = catalogue
+        self._order = self._catalogue.ids
+        self._models = OrderedDict()
+        self._search.clear()
+        self._search_pending = True
+        return True
+
+    def _build_search_index(self) -> None:
+        # Reads every record once; the mapping's pages stay in the shared page cache, not this heap
+        self._search_pending = False
+        for case_id in self._order:
+            self._search.add(self._case(case_id, keep=False))
+
+    def _refresh_sqlite(self, force: bool) -> bool:
+        if self._sqlite_conn is None:
+            self._sqlite_conn = sqlite3.connect(self.path, check_same_thread=False)
+            _ensure_sqlite_schema(self._sqlite_conn)
+            self._sqlite_conn.commit()
+        conn = self._sqlite_conn
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if not force and data_version == self._sqlite_data_version:
+            return False
+        self._sqlite_data_version = data_version
+        rows = conn.execute("SELECT id, content_hash FROM cases ORDER BY rowid").fetchall()
+        current = {case_id: content_hash for case_id, content_hash in rows}
+        stale = [case_id for case_id, content_hash in rows if self._sqlite_hashes.get(case_id) != content_hash]
+        removed = set(self._sqlite_hashes) - set(current)
+        if not stale and not removed:
+            return False
+        self._drop(removed)
+        for case_id in stale:
+            (data,) = conn.execute("SELECT data FROM cases WHERE id = ?", (case_id,)).fetchone()
+            self._put(_with_stable_id({**json.loads(data), "id": case_id}))
+        self._sqlite_hashes = current
+        self._order = [case_id for case_id, _ in rows]
+        return True
+
+    def _rebuild_indexes(self) -> None:
+        by_company: Dict[str, List[str]] = {}
+        by_source: Dict[str, List[str]] = {}
+        if self._catalogue is not None:
+            keys = [value.strip().lower() for value in self._catalogue.strings]
+            labels = ((keys[company], keys[source]) for company, source in self._catalogue.rows())
+        else:
+            labels = ((case.company.strip().lower(), case.source.strip().lower())
+                      for case in map(self._by_id.__getitem__, self._order))
+        for case_id, (company, source) in zip(self._order, labels):
+            by_company.setdefault(company, []).append(case_id)
+            by_source.setdefault(source, []).append(case_id)
+        self._by_company = by_company
+        self._by_source = by_source
+        self._position = {case_id: index for index, case_id in enumerate(self._order)}
+        if self._catalogue is not None:
+            self.version = self._catalogue.version  # computed the same way when it was written
+            return
+        # Derived from content only, so every worker serving the same catalogue reports the same version
+        self.version = hashlib.sha256(
+            _canonical_json([[case_id, self._content_hashes[case_id]] for case_id in self._order])
+        ).hexdigest()[:16]
+
+
+def _ensure_sqlite_schema(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS cases (id TEXT PRIMARY KEY, data TEXT NOT NULL, content_hash TEXT NOT NULL)"
+    )
+
+
+def export_cases(cases: Iterable[CaseInterview], destination: str) -> int:
+    """Writes cases to a directory (one JSON file per case) or to a SQLite file. Returns the count."""
+    target = Path(destination)
+    count = 0
+    if target.suffix in _SQLITE_SUFFIXES:
+        with sqlite3.connect(target) as conn:
+            _ensure_sqlite_schema(conn)
+            for case in cases:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cases (id, data, content_hash) VALUES (?, ?, ?)",
+                    (case.id, case.model_dump_json(exclude={"id"}), case_content_hash(case)),
+                )
+                count += 1
+        return count
+    target.mkdir(parents=True, exist_ok=True)
+    for case in cases:
+        (target / f"{case.id}.json").write_text(case.model_dump_json(indent=2), encoding="utf-8")
+        count += 1
+    return count
+
+
+_store: Optional[CaseStore] = None
+
+
+def get_case_store() -> CaseStore:
+    """The process-wide store, built on first use."""
+    global _store
+    if _store is None:
+        _store = CaseStore(CASE_STORE_PATH)
+    return _store
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "export":
+        print("usage: python -m backend.database.case_store export <directory | file.db>")
+        sys.exit(2)
+    written = export_cases(CaseStore(None).list_cases(), sys.argv[2])
+    print(f"Exported {written} case(s) to {sys.argv[2]}")
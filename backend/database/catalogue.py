@@ -0,0 +1,213 @@
+"""
+Case catalogue file: a whole case library in one compact file the API opens quickly.
+
+Written by the ingestion command (backend/database/ingest.py), read by the case store when
+CASE_STORE_PATH points at a *.catalogue file. Layout:
+    header   MAGIC (8 bytes) | format (uint32) | index offset (uint64) | index length (uint64)
+    records  per case: the case as compact JSON, then its CaseSummary as compact JSON, back to back
+    index    JSON {"format", "version", "created_at", "count", "strings": [...], "ids": [...]}
+    rows     `count` fixed-size rows right after the index, one per case in catalogue order:
+             record offset (uint64) | record length (uint32) | summary length (uint32) |
+             company, source (uint32 positions in "strings") | content hash (32 raw bytes)
+Readers mmap the file and parse only the index up front: the ids and the distinct companies and
+sources (each stored once, interned on load). Rows, records and summaries stay in the mapping and
+are sliced out when needed, so a worker's heap does not grow with the size of the case texts, and
+every worker on the machine shares the same pages through the OS page cache.
+The version is computed from the ids and content hashes the same way as CaseStore.version, so a
+catalogue and a store serving the same cases report the same version.
+
+Files are written to a temporary name and renamed into place, so a reader never sees a partial
+catalogue, and bumping CATALOGUE_FORMAT makes older readers refuse newer files instead of misreading them.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+CATALOGUE_SUFFIX = ".catalogue"
+CATALOGUE_FORMAT = 2
+MAGIC = b"CPCATLG\x00"
+_HEADER = struct.Struct("<8sIQQ")
+_ROW = struct.Struct("<QIIII32s")
+
+
+class CatalogueRow(NamedTuple):
+    offset: int
+    length: int
+    summary_length: int
+    company: str
+    source: str
+    content_hash: str
+
+
+class CatalogueError(ValueError):
+    """The file is not a catalogue this code can read."""
+
+
+def catalogue_version(pairs: Iterable[Tuple[str, str]]) -> str:
+    """Version of a catalogue from its (case id, content hash) pairs in order."""
+    material = json.dumps([[case_id, content_hash] for case_id, content_hash in pairs], sort_keys=True,
+                          ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+class CatalogueWriter:
+    """Appends case records and writes the index and rows on close(); use as a context manager."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        self._file = open(self._tmp, "wb")
+        self._file.write(b"\x00" * _HEADER.size)  # filled in once the index offset is known
+        self._offset = _HEADER.size
+        self._strings: Dict[str, int] = {}
+        self._rows = bytearray()
+        self.ids: List[str] = []
+        self.content_hashes: List[str] = []
+
+    def _string(self, value: str) -> int:
+        return self._strings.setdefault(value, len(self._strings))
+
+    def add(self, case_id: str, content_hash: str, record: bytes, summary: bytes, company: str, source: str) -> None:
+        self._file.write(record)
+        self._file.write(summary)
+        self._rows += _ROW.pack(self._offset, len(record), len(summary), self._string(company),
+                                self._string(source), bytes.fromhex(content_hash))
+        self._offset += len(record) + len(summary)
+        self.ids.append(case_id)
+        self.content_hashes.append(content_hash)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def close(self) -> str:
+        """Writes the index and rows and moves the file into place. Returns the catalogue version."""
+        version = catalogue_version(zip(self.ids, self.content_hashes))
+        index = json.dumps({
+            "format": CATALOGUE_FORMAT,
+            "version": version,
+            "created_at": time.time(),
+            "count": len(self.ids),
+            "strings": list(self._strings),
+            "ids": self.ids,
+        }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._file.write(index)
+        self._file.write(self._rows)
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, CATALOGUE_FORMAT, self._offset, len(index)))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp, self.path)
+        return version
+
+    def abort(self) -> None:
+        self._file.close()
+        self._tmp.unlink(missing_ok=True)
+
+    def __enter__(self) -> "CatalogueWriter":
+        return self
+
+    def __exit__(self, kind, error, traceback) -> None:
+        if kind is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class CatalogueReader:
+    """
+    A memory-mapped catalogue. Cases are addressed by number (their position in catalogue order);
+    ids[number] is the case id. Only the ids and the string table live on the heap.
+
+    Touching a mapping past the end of a file that was truncated under it kills the process
+    (SIGBUS), which is what overwriting a catalogue in place instead of renaming a new one over it
+    does. So every read first checks the file still has its size and raises CatalogueError if not.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._map: Optional[mmap.mmap] = None
+        self._file = open(self.path, "rb")
+        try:
+            self._size = os.fstat(self._file.fileno()).st_size
+            if self._size < _HEADER.size:
+                raise CatalogueError(f"{self.path} is too short to be a catalogue")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, file_format, index_offset, index_length = _HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC:
+                raise CatalogueError(f"{self.path} is not a case catalogue")
+            if file_format != CATALOGUE_FORMAT:
+                raise CatalogueError(f"{self.path} has catalogue format {file_format}, expected {CATALOGUE_FORMAT}")
+            if index_offset + index_length > self._size:
+                raise CatalogueError(f"{self.path} is truncated")
+            index = json.loads(self._map[index_offset:index_offset + index_length])
+            self.version: str = index["version"]
+            self.created_at: float = index["created_at"]
+            self.strings: List[str] = [sys.intern(value) for value in index["strings"]]
+            self.ids: List[str] = index["ids"]
+            self._rows_offset = index_offset + index_length
+            if self._rows_offset + _ROW.size * len(self.ids) > self._size:
+                raise CatalogueError(f"{self.path} is truncated")
+        except CatalogueError:
+            self.close()
+            raise
+        except (ValueError, KeyError, TypeError) as e:
+            self.close()
+            raise CatalogueError(f"{self.path} has a corrupt index: {e}") from e
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _check(self) -> None:
+        if self._map is None:
+            raise CatalogueError(f"{self.path} is closed")
+        if os.fstat(self._file.fileno()).st_size < self._size:
+            raise CatalogueError(f"{self.path} was truncated while in use; replace catalogues by renaming")
+
+    def _row(self, number: int) -> Tuple[int, int, int, int, int, bytes]:
+        self._check()
+        return _ROW.unpack_from(self._map, self._rows_offset + number * _ROW.size)
+
+    def row(self, number: int) -> CatalogueRow:
+        offset, length, summary_length, company, source, digest = self._row(number)
+        return CatalogueRow(offset, length, summary_length, self.strings[company], self.strings[source], digest.hex())
+
+    def rows(self) -> Iterator[Tuple[int, int]]:
+        """(company, source) string positions for every case in order; cheap enough to scan at load."""
+        self._check()
+        table = memoryview(self._map)[self._rows_offset:self._rows_offset + _ROW.size * len(self.ids)]
+        try:
+            for _, _, _, company, source, _ in _ROW.iter_unpack(table):
+                yield company, source
+        finally:
+            table.release()
+
+    def record(self, number: int) -> bytes:
+        offset, length = self._row(number)[:2]
+        return self._map[offset:offset + length]
+
+    def summary(self, number: int) -> bytes:
+        offset, length, summary_length = self._row(number)[:3]
+        return self._map[offset + length:offset + length + summary_length]
+
+    def content_hash(self, number: int) -> str:
+        return self._row(number)[5].hex()
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self) -> "CatalogueReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,246 @@
+"""
+Bulk import of case files into one catalogue file (catalogue.py) the API loads quickly.
+
+    python -m backend.database.ingest cases/ cases.catalogue [--workers 8] [--strict]
+    CASE_STORE_PATH=cases.catalogue uvicorn backend.main:app
+
+Every *.json / *.yaml / *.yml / *.md file under the source directory (recursively) is handled in a
+process pool of CASE_INGEST_WORKERS processes (default: one per CPU), CASE_INGEST_CHUNK files at a
+time. Per file, a worker:
+  * parses it (json, libyaml when available, or case_markdown.py for Markdown)
+  * validates it into CaseInterview -> Description -> Question and checks what the models cannot
+    (validate_case: blank names, cases without questions, questions without an answer)
+  * gives each case its stable id (case_store.stable_case_id) unless the file pins one, and
+    returns it as compact JSON, with its CaseSummary and content hash (case_record)
+The parent deduplicates: the same content under different files (same content hash, ids aside)
+is imported once, and a different case with an id already taken is reported and skipped. Results
+are written in path order as chunks complete, so the catalogue is identical for any number of
+workers and only the chunks in flight are held in memory.
+
+Progress lines go to stdout about twice a second; every problem is reported on stderr as its
+chunk is written, as `error <path>: <reason>`. A file that cannot be parsed is left out. In a file
+that parses, invalid cases are skipped and the rest of the file is imported; such a file still
+counts as failed. The exit status is 1 if any file failed, and with --strict nothing is written then. backend/benchmarks/ingest.py imports 10k
+generated cases.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from backend.database.case_store import CASE_FILE_SUFFIXES, case_content_hash, parse_case_file
+from backend.database.catalogue import CatalogueWriter
+from backend.database.models import CaseInterview, CaseSummary
+
+CASE_INGEST_WORKERS = int(os.getenv("CASE_INGEST_WORKERS", "0"))  # 0 = one per CPU
+CASE_INGEST_CHUNK = int(os.getenv("CASE_INGEST_CHUNK", "64"))
+
+# What CatalogueWriter.add takes for one case: (id, content hash, record, summary, company, source)
+CaseRecord = Tuple[str, str, bytes, bytes, str, str]
+# (path, [case record, ...], [error, ...], invalid cases) for one file; no records and one error
+# with 0 invalid cases means the file could not be parsed
+FileResult = Tuple[str, List[CaseRecord], List[str], int]
+
+
+def validate_case(case: CaseInterview) -> List[str]:
+    """Problems the models accept but an interview cannot run with."""
+    problems = []
+    for name in ("name", "company"):
+        if not getattr(case, name).strip():
+            problems.append(f"{name} is empty")
+    description = case.description
+    if not description.client_name.strip():
+        problems.append("client_name is empty")
+    if not description.questions:
+        problems.append("no questions")
+    for number, question in enumerate(description.questions, 1):
+        if not question.text.strip():
+            problems.append(f"question {number} has no text")
+        if not question.reveal_answer.strip():
+            problems.append(f"question {number} has no answer")
+    return problems
+
+
+def case_record(case: CaseInterview) -> CaseRecord:
+    return (
+        case.id,
+        case_content_hash(case),
+        case.model_dump_json().encode("utf-8"),
+        CaseSummary.from_case(case).model_dump_json().encode("utf-8"),
+        case.company,
+        case.source,
+    )
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        details = [f"{'.'.join(map(str, item['loc'])) or 'case'}: {item['msg']}" for item in error.errors()[:3]]
+        more = error.error_count() - len(details)
+        return "; ".join(details) + (f" (+{more} more)" if more > 0 else "")
+    return f"{type(error).__name__}: {error}"
+
+
+def ingest_files(paths: List[str]) -> List[FileResult]:
+    """Worker side: parse, validate and serialize a chunk of files."""
+    results: List[FileResult] = []
+    for path in paths:
+        try:
+            cases = parse_case_file(Path(path))
+        except Exception as e:
+            results.append((path, [], [_describe(e)], 0))
+            continue
+        records, errors = [], []
+        for case in cases:
+            problems = validate_case(case)
+            if problems:
+                errors.append(f"case {case.name!r}: {'; '.join(problems)}")
+            else:
+                records.append(case_record(case))
+        results.append((path, records, errors, len(errors)))
+    return results
+
+
+def find_case_files(source: Path) -> List[Path]:
+    if source.is_file():
+        return [source]
+    return sorted(path for path in source.rglob("*") if path.is_file() and path.suffix in CASE_FILE_SUFFIXES)
+
+
+@dataclass
+class IngestReport:
+    files: int = 0
+    files_done: int = 0
+    cases: int = 0
+    duplicates: int = 0
+    id_conflicts: int = 0
+    invalid_cases: int = 0
+    failed_files: int = 0  # files that could not be parsed or had invalid cases
+    bytes_written: int = 0
+    version: Optional[str] = None
+    seconds: float = 0.0
+    errors: List[Tuple[str, str]] = field(default_factory=list)
+
+    def progress_line(self) -> str:
+        rate = self.files_done / self.seconds if self.seconds else 0.0
+        return (f"{self.files_done}/{self.files} files, {self.cases} cases, {self.duplicates} duplicates, "
+                f"{self.invalid_cases} invalid cases, {self.failed_files} failed files, {rate:.0f} files/s")
+
+
+def ingest(
+    source: str,
+    destination: str,
+    workers: int = CASE_INGEST_WORKERS,
+    chunk_size: int = CASE_INGEST_CHUNK,
+    strict: bool = False,
+    progress: Optional[Callable[[IngestReport], None]] = None,
+    on_error: Optional[Callable[[str, str], None]] = None,
+) -> IngestReport:
+    """
+    Imports every case file under `source` into the catalogue at `destination`.
+    workers <= 1 runs in this process (no pool); progress(report) is called about twice a second
+    and on_error(path, reason) once per failed file or case.
+    """
+    started = time.perf_counter()
+    paths = [str(path) for path in find_case_files(Path(source))]
+    report = IngestReport(files=len(paths))
+    workers = workers or os.cpu_count() or 1
+    chunks = [paths[start:start + chunk_size] for start in range(0, len(paths), max(1, chunk_size))]
+    seen_content: Dict[str, str] = {}  # content hash -> case id
+    seen_ids: Dict[str, str] = {}  # case id -> content hash
+    writer = CatalogueWriter(destination)
+    last_progress = 0.0
+
+    def take(results: List[FileResult]) -> None:
+        nonlocal last_progress
+        for path, records, errors, invalid in results:
+            report.files_done += 1
+            report.invalid_cases += invalid
+            if errors:
+                report.failed_files += 1
+                for reason in errors:
+                    report.errors.append((path, reason))
+                    if on_error is not None:
+                        on_error(path, reason)
+            for record in records:
+                case_id, content_hash = record[:2]
+                if content_hash in seen_content:
+                    report.duplicates += 1
+                    continue
+                if case_id in seen_ids:
+                    report.id_conflicts += 1
+                    reason = f"id {case_id} is already used by a different case"
+                    report.errors.append((path, reason))
+                    if on_error is not None:
+                        on_error(path, reason)
+                    continue
+                seen_content[content_hash] = case_id
+                seen_ids[case_id] = content_hash
+                writer.add(*record)
+                report.cases += 1
+                report.bytes_written += len(record[2]) + len(record[3])
+        report.seconds = time.perf_counter() - started
+        if progress is not None and report.seconds - last_progress >= 0.5:
+            last_progress = report.seconds
+            progress(report)
+
+    try:
+        if workers <= 1:
+            for chunk in chunks:
+                take(ingest_files(chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # At most a few chunks per worker in flight; completed ones are written in order
+                pending = {}
+                ready: Dict[int, List[FileResult]] = {}
+                next_submit = next_write = 0
+                while next_write < len(chunks):
+                    while next_submit < len(chunks) and len(pending) + len(ready) < workers * 4:
+                        pending[pool.submit(ingest_files, chunks[next_submit])] = next_submit
+                        next_submit += 1
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        ready[pending.pop(future)] = future.result()
+                    while next_write in ready:
+                        take(ready.pop(next_write))
+                        next_write += 1
+        if strict and report.errors:
+            writer.abort()
+        else:
+            report.version = writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    report.seconds = time.perf_counter() - started
+    if progress is not None:
+        progress(report)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory of case files (or a single file)")
+    parser.add_argument("destination", help="catalogue file to write, e.g. cases.catalogue")
+    parser.add_argument("--workers", type=int, default=CASE_INGEST_WORKERS, help="processes (0 = one per CPU, 1 = no pool)")
+    parser.add_argument("--chunk-size", type=int, default=CASE_INGEST_CHUNK, help="files per task")
+    parser.add_argument("--strict", action="store_true", help="write nothing if any file fails")
+    args = parser.parse_args()
+
+    result = ingest(
+        args.source, args.destination, workers=args.workers, chunk_size=args.chunk_size, strict=args.strict,
+        progress=lambda report: print(report.progress_line(), flush=True),
+        on_error=lambda path, reason: print(f"error {path}: {reason}", file=sys.stderr, flush=True),
+    )
+    if result.version is None:
+        print(f"Nothing written: {len(result.errors)} error(s)")
+    else:
+        print(f"Wrote {result.cases} case(s) to {args.destination} (version {result.version}, "
+              f"{result.bytes_written / 1e6:.1f} MB of records) in {result.seconds:.2f}s; "
+              f"{result.duplicates} duplicate(s), {result.id_conflicts} id conflict(s), {result.invalid_cases} invalid case(s) "
+              f"skipped, {result.failed_files} failed file(s)")
+    sys.exit(1 if result.errors else 0)
@@ -7,6 +7,7 @@ import uuid
 class Question(BaseModel):
     text: str
     reveal_answer: str
+    hints: Optional[List[str]] = []  # the author's hints, from gentle to specific
 
 
 class Description(BaseModel):
@@ -29,6 +30,31 @@ class CaseInterview(BaseModel):
     description: Description
 
 
+class CaseSummary(BaseModel):
+    """Listing projection of a case: no descriptions, questions or answers."""
+    id: str
+    name: str
+    company: str
+    source: str
+    url: str
+    client_name: str
+    client_goal: str
+    question_count: int
+
+    @classmethod
+    def from_case(cls, case: CaseInterview) -> "CaseSummary":
+        return cls(
+            id=case.id,
+            name=case.name,
+            company=case.company,
+            source=case.source,
+            url=case.url,
+            client_name=case.description.client_name,
+            client_goal=case.description.client_goal,
+            question_count=len(case.description.questions),
+        )
+
+
 class ChatMessage(BaseModel):
     role: str  # "user", "assistant", or "system"
     content: str
@@ -45,4 +71,23 @@ class FollowUpChatRequest(BaseModel):
 class AIResponseMessage(BaseModel):
     response_id: Optional[str] = None # The new ID from the LLM for follow-up
     ai_message: str
+    session_id: Optional[str] = None # Pass to the chat websocket as ?session_id= to make it resumable
+
 
+
+class AnalysisItemResult(BaseModel):
+    question_index: int
+    question: str
+    status: str  # "queued" | "running" | "complete" | "failed"
+    attempts: int
+    analysis: Optional[str] = None
+    error: Optional[str] = None
+
+class AnalysisReport(BaseModel):
+    job_id: str
+    session_id: str
+    case_id: str
+    status: str  # "queued" | "running" | "complete" | "failed"
+    created_at: float
+    updated_at: float
+    items: List[AnalysisItemResult]
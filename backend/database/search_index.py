@@ -0,0 +1,74 @@
+"""
+In-process inverted index for full-text search over the case catalogue.
+
+Indexed text: Description.client_goal, client_description, situation_description and every
+Question.text. The index is kept up to date by the case store as cases are added, changed or
+removed, so a query is a few dict lookups and a set intersection, never a scan of the catalogue.
+"""
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Set
+
+from backend.database.models import CaseInterview
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Too common to narrow anything down; skipping them also keeps the postings lists short
+_STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have how if in into is it its of on or our so that the "
+    "their them they this to was we what when which who will with would you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def searchable_text(case: CaseInterview) -> Iterable[str]:
+    description = case.description
+    yield description.client_goal
+    yield description.client_description
+    yield description.situation_description
+    for question in description.questions:
+        yield question.text
+
+
+class CaseSearchIndex:
+    def __init__(self):
+        # token -> {case_id: term frequency}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        # case_id -> tokens it was indexed under, so removal does not need the old case
+        self._tokens_by_case: Dict[str, Set[str]] = {}
+
+    def add(self, case: CaseInterview) -> None:
+        self.remove(case.id)
+        counts = Counter(token for text in searchable_text(case) for token in tokenize(text))
+        for token, count in counts.items():
+            self._postings.setdefault(token, {})[case.id] = count
+        self._tokens_by_case[case.id] = set(counts)
+
+    def remove(self, case_id: str) -> None:
+        for token in self._tokens_by_case.pop(case_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(case_id, None)
+            if not postings:
+                del self._postings[token]
+
+    def clear(self) -> None:
+        self._postings.clear()
+        self._tokens_by_case.clear()
+
+    def search(self, query: str) -> Dict[str, int]:
+        """Case ids containing every query term, mapped to a relevance score (summed term frequency)."""
+        terms = set(tokenize(query))
+        if not terms:
+            return {}
+        postings = sorted((self._postings.get(term, {}) for term in terms), key=len)
+        matches = set(postings[0])
+        for other in postings[1:]:
+            if not matches:
+                break
+            matches.intersection_update(other)
+        return {case_id: sum(p[case_id] for p in postings) for case_id in matches}
@@ -1,23 +1,76 @@
+import asyncio
+import logging
+from collections import deque
+from contextlib import aclosing, asynccontextmanager
+import time
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from backend.routers import chat, cases # chat router will still be used for /initiate_chat
-from backend.services.llm_service import get_ai_response_follow_up # For the moved WS endpoint
-import yaml # For loading prompts
+from backend.routers import analysis, chat, cases # chat router will still be used for /initiate_chat
+from backend.services import llm_service
+from backend.services.llm_service import get_ai_response_follow_up, stream_ai_response_follow_up # For the moved WS endpoint
+from backend.services.llm_resilience import error_fields
+from backend.services.streaming import coalesce_deltas
+from backend.services.frames import WS_HEARTBEAT_SECONDS, FrameProtocol, choose_subprotocol
+from backend.services.connections import CloseRequest, Connection, get_connection_manager, install_drain_on_sigterm
+from backend.services.session_store import get_session_store
+from backend.services.interview import ANSWER, INTRO, InterviewError, InterviewOrchestrator, parse_frame
+from backend.database.case_store import get_case_store
+from backend.database.models import CaseInterview
+from backend.services.analysis_jobs import get_analysis_queue
+from backend.services.compaction import compact, estimate_tokens, needs_compaction
+from backend.services.greeting_cache import GREETING_CACHE_PREWARM
+from backend.services.prompts import get_prompts
+from backend.services.prompt_assembly import AssembledPrompt, get_prompt_assembler
+from backend.services.response_cache import get_response_cache
+from backend.services.rate_limit import CHAT_MAX_PENDING_MESSAGES, ChatTurnLimiter
+from backend.services.metrics import (
+    CHAT_COMPACTION_TOKENS_SAVED, CHAT_CONTEXT_TOKENS, CHAT_ERRORS, CHAT_TURN_SECONDS,
+    log_sampled, render_latest,
+)
+from typing import Awaitable, Deque, Dict, List, Optional
+
+# Per-connection events go through log_sampled; errors nothing expects are always logged here
+logger = logging.getLogger(__name__)
+
 
-app = FastAPI(title="Case Interviews API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Prompts are read once per worker here, not at import (see services/prompts.py)
+    get_prompts().load()
+    get_response_cache()  # a bad RESPONSE_CACHE_SIMILARITY fails the boot, not the first chat
+    sessions = get_session_store()
+    write_behind = asyncio.create_task(sessions.run_write_behind())
+    prewarm = asyncio.create_task(chat.prewarm_greetings()) if GREETING_CACHE_PREWARM else None
+    analysis_workers = asyncio.create_task(get_analysis_queue().run())
+    connections = get_connection_manager()
+    reaper = asyncio.create_task(connections.run())
+    # SIGTERM first drains the chat sockets, then lets uvicorn shut down as usual
+    install_drain_on_sigterm(connections)
+    yield
+    reaper.cancel()
+    if prewarm is not None:
+        prewarm.cancel()
+    analysis_workers.cancel()
+    await get_analysis_queue().flush()
+    write_behind.cancel()
+    await sessions.flush()
+    # Release the pooled upstream connections so workers shut down cleanly
+    await llm_service.aclose()
+
+
+app = FastAPI(title="Case Interviews API", lifespan=lifespan)
 origins = [
     "http://localhost:3000",
     "http://172.28.16.1:3000",     # <-- add your Docker/host IP here
 ]
-# Load prompts for WebSocket endpoint if they are not globally accessible
-# This duplicates loading from chat.py, consider a shared config/loader later
-with open("backend/prompts.yaml", 'r') as f:
-    prompts_config = yaml.safe_load(f)
-
-follow_up_instructions_for_ws = prompts_config.get(
-    'follow_up_prompt',
-    prompts_config.get('default_system_prompt')
-)
+
+
+def interview_prompts(case: CaseInterview) -> Dict[str, AssembledPrompt]:
+    """Instructions for the interview phases driven by services/interview.py, as currently loaded, with the case prefix."""
+    assembler = get_prompt_assembler()
+    return {phase: assembler.assemble(f"{phase}_prompt", case) for phase in ("question", "answer", "analysis")}
+
 
 # Allow all origins during development
 app.add_middleware(
@@ -31,6 +84,20 @@ app.add_middleware(
 
 app.include_router(cases.router, prefix="/cases", tags=["cases"])
 app.include_router(chat.router, prefix="/chat", tags=["chat"])
+app.include_router(analysis.router, prefix="/analysis", tags=["analysis"])
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of this worker's metrics (see services/metrics.py)."""
+    return PlainTextResponse(render_latest(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/connections", include_in_schema=False)
+async def connections_status():
+    """This worker's chat websockets: how many, how busy, how old, and why they closed."""
+    return get_connection_manager().stats()
+
 
 @app.websocket("/ws_test")
 async def websocket_test_endpoint(websocket: WebSocket):
@@ -51,6 +118,142 @@ async def websocket_test_endpoint(websocket: WebSocket):
     finally:
         print("Test WebSocket connection closed.")
 
+async def _pump_messages(out: FrameProtocol, inbox: asyncio.Queue, dropped: Dict[str, int], connection: Connection) -> None:
+    """
+    Reads frames off the socket into the inbox so the chat loop can notice a disconnect
+    while it is still waiting on the LLM. A None in the inbox means the client is gone.
+    Past CHAT_MAX_PENDING_MESSAGES queued messages, new ones are dropped and counted.
+    Heartbeat pings (protocol version 2) are answered here, so they never wait behind a turn;
+    they do not count as activity for the idle timeout, everything else does.
+    """
+    try:
+        while True:
+            message = await out.receive()
+            if out.is_ping(message):
+                await out.send({"type": "pong"})
+                continue
+            get_connection_manager().touch(connection)
+            if inbox.qsize() >= CHAT_MAX_PENDING_MESSAGES:
+                dropped["count"] += 1
+                continue
+            inbox.put_nowait(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        inbox.put_nowait(None)
+
+
+def _merge_pending(inbox: asyncio.Queue, first: str, held: Deque[Optional[str]]) -> str:
+    """
+    Folds every chat message already waiting in the inbox into one turn, so a burst costs one LLM call.
+    Stops at a control frame, a close request or the disconnect marker, which are left in `held` for the main loop.
+    """
+    parts = [first]
+    while not held:
+        try:
+            raw = inbox.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+        _, message = parse_frame(raw) if isinstance(raw, str) else (None, None)
+        if message is None:
+            held.append(raw)
+            break
+        parts.append(message)
+    return "\n\n".join(parts)
+
+
+async def _reply_whole(
+    out: FrameProtocol,
+    prompt: AssembledPrompt,
+    response_id: Optional[str],
+    user_message: str,
+    context: Optional[str] = None,
+    history: Optional[List[Dict[str, str]]] = None,
+) -> Optional[Dict[str, str]]:
+    """
+    Legacy mode: one frame with the full ai_message.
+    Returns {"response_id", "ai_message"} (plus "input_tokens" when known) for the new turn, or None on failure.
+    With a compacted `context` and no response_id the turn starts a fresh chain; `history` is what
+    the chain is missing (replies served from the response cache). `prompt` is follow_up_prompt with
+    the case prefix (services/prompt_assembly.py).
+    """
+    llm_response = await get_ai_response_follow_up(
+        response_id=response_id,
+        instructions=prompt.instructions,
+        curr_message=user_message,
+        context=context,
+        history=history,
+        prompt_cache_key=prompt.cache_key,
+    )
+
+    ai_message = llm_response.get("ai_message")
+    new_response_id = llm_response.get("response_id")
+
+    if ai_message is None or new_response_id is None:
+        await out.send({"error": "Failed to get AI response or response_id.", **error_fields(llm_response)})
+        return None
+    await out.send({
+        "ai_message": ai_message,
+        "response_id": new_response_id
+    })
+    result = {"response_id": new_response_id, "ai_message": ai_message}
+    if llm_response.get("input_tokens"):
+        result["input_tokens"] = llm_response["input_tokens"]
+    return result
+
+
+async def _reply_phase(out: FrameProtocol, streamed: bool, produce: Awaitable[Optional[Dict[str, str]]]) -> Optional[Dict[str, str]]:
+    """
+    Sends an interview-phase reply (services/interview.py) as one frame in the socket's mode: the
+    legacy {"ai_message", "response_id"} frame, or {"type": "done", ...} for streaming clients.
+    A phase change without an LLM call (produce returns None) sends nothing. Replies served from
+    the precomputed artifact keep their "precomputed" flag (and "hint", "hint_count" for hints).
+    """
+    llm_response = await produce
+    if llm_response is None:
+        return None
+    ai_message = llm_response.get("ai_message")
+    new_response_id = llm_response.get("response_id")
+    if ai_message is None or new_response_id is None:
+        error = {"error": ai_message or "Failed to get AI response or response_id.", **error_fields(llm_response)}
+        await out.send({"type": "error", **error} if streamed else error)
+        return None
+    frame = {"ai_message": ai_message, "response_id": new_response_id}
+    frame.update((key, llm_response[key]) for key in ("precomputed", "hint", "hint_count") if key in llm_response)
+    await out.send({"type": "done", **frame} if streamed else frame)
+    return frame
+
+
+async def _reply_streamed(
+    out: FrameProtocol,
+    prompt: AssembledPrompt,
+    response_id: Optional[str],
+    user_message: str,
+    context: Optional[str] = None,
+    history: Optional[List[Dict[str, str]]] = None,
+) -> Optional[Dict[str, str]]:
+    """
+    Streaming mode: coalesced {"type": "delta"} frames, then a {"type": "done"} frame carrying the
+    new response_id and the full ai_message, or a {"type": "error"} frame.
+    """
+    events = coalesce_deltas(stream_ai_response_follow_up(
+        response_id=response_id,
+        instructions=prompt.instructions,
+        curr_message=user_message,
+        context=context,
+        history=history,
+        prompt_cache_key=prompt.cache_key,
+    ))
+    async with aclosing(events):
+        async for event in events:
+            input_tokens = event.pop("input_tokens", None) if event["type"] == "done" else None
+            await out.send(event)
+            if event["type"] == "done":
+                result = {"response_id": event["response_id"], "ai_message": event["ai_message"]}
+                return {**result, "input_tokens": input_tokens} if input_tokens else result
+    return None
+
+
 @app.websocket("/ws/chat/{case_id}/{initial_response_id}")
 async def websocket_chat_endpoint_main( # Renamed to avoid conflict if chat.py is imported with its own
     websocket: WebSocket,
@@ -58,64 +261,236 @@ async def websocket_chat_endpoint_main( # Renamed to avoid conflict if chat.py i
     initial_response_id: str
 ):
     client_origin = websocket.headers.get("origin")
-    print(f"MAIN APP WebSocket connection attempt for case {case_id} from Origin: {client_origin}")
-    print("All headers (main app):")
-    for name, value in websocket.headers.items():
-        print(f"  {name}: {value}")
+    log_sampled("chat_ws_connect", case_id=case_id, origin=client_origin, headers=dict(websocket.headers))
 
     allowed_origins = [
         "http://localhost:3000",
     ]
 
     if client_origin not in allowed_origins:
-        print(f"Origin '{client_origin}' not in allowed list {allowed_origins}. Rejecting WebSocket from main app.")
+        log_sampled("chat_ws_rejected", case_id=case_id, origin=client_origin)
         await websocket.close(code=4003)
         return
 
+    # Wire format: version 1 unless the client offers a version 2 subprotocol (services/frames.py)
+    subprotocol = choose_subprotocol(websocket)
+    out = FrameProtocol(websocket, subprotocol)
     try:
-        await websocket.accept()
-        print(f"MAIN APP WebSocket connection accepted for case {case_id} from origin {client_origin}.")
+        await websocket.accept(subprotocol=subprotocol)
     except Exception as e:
-        print(f"Error during MAIN APP WebSocket accept for case {case_id}: {e}")
+        logger.warning("WebSocket accept failed for case %s: %r", case_id, e)
         await websocket.close(code=1011)
         return
         
-    current_response_id = initial_response_id
+    # Admission before any work is done for the socket: past the connection cap, or while this
+    # worker drains for a restart, the client is told to come back (services/connections.py)
+    connections = get_connection_manager()
+    inbox: asyncio.Queue = asyncio.Queue()
+    connection, refused = connections.admit(case_id, inbox)
+    if connection is None:
+        await out.send(refused.frame(None))
+        await websocket.close(code=refused.code)
+        return
+
+    try:
+        # ?stream=1 opts into incremental delta/done/error frames, otherwise one frame per reply
+        streamed = websocket.query_params.get("stream") in ("1", "true")
+        reply = _reply_streamed if streamed else _reply_whole
+        mode = "stream" if streamed else "whole"
+
+        # Resume handshake: a client that passes ?session_id= gets a {"type": "session"} frame first and
+        # continues from the server's copy of the chain, which also covers a reply that was generated
+        # after the old socket dropped. Legacy clients get a fresh session silently.
+        sessions = get_session_store()
+        requested_session_id = websocket.query_params.get("session_id")
+        session = await sessions.get(requested_session_id) if requested_session_id else None
+        resumed = session is not None and session.case_id == case_id
+        if not resumed:
+            session = sessions.create(case_id, initial_response_id if initial_response_id else None)
+        # Version 2 clients always get it: the session id is their handle for the conversation
+        if requested_session_id is not None or out.version >= 2:
+            session_frame = {
+                "type": "session",
+                "session_id": session.session_id,
+                "resumed": resumed,
+                "response_id": session.current_response_id,
+                "question_index": session.question_index,
+                "last_ai_message": session.last_ai_message,
+            }
+            if out.version >= 2:
+                session_frame.update(protocol=out.version, heartbeat=WS_HEARTBEAT_SECONDS)
+            await out.send(session_frame)
+
+        # Interview phases (start/next/done/end control frames); a case that no longer exists only gets chat
+        case = get_case_store().get(case_id)
+        orchestrator = InterviewOrchestrator(session, case, interview_prompts(case)) if case is not None else None
+        if orchestrator is not None:
+            # Have the upcoming question's explanation ready by the time the client asks for it
+            orchestrator.prefetch(0 if session.phase == INTRO else session.question_index + 1)
+
+        # Summarises a long follow-up conversation in the background between turns (services/compaction.py)
+        compaction: Optional[asyncio.Task] = None
+
+        response_cache = get_response_cache()
+        limiter = ChatTurnLimiter(session.session_id)
+        dropped = {"count": 0}
+        held: Deque[Optional[str]] = deque()
+        connection.session_id = session.session_id
+        reader = asyncio.create_task(_pump_messages(out, inbox, dropped, connection))
+    except BaseException:
+        connections.release(connection)
+        raise
 
     try:
         while True:
-            user_message = await websocket.receive_text()
-            
-            if not current_response_id:
-                await websocket.send_json({"error": "Cannot process message: AI context (response_id) is missing."})
+            raw = held.popleft() if held else await inbox.get()
+            if raw is None:
+                raise WebSocketDisconnect()
+            if isinstance(raw, CloseRequest):
+                # Idle, too old or draining: the session is saved so the client can resume it
+                sessions.save(session)
+                await out.send(raw.frame(session.session_id))
+                await websocket.close(code=raw.code)
+                break
+            control, user_message = parse_frame(raw)
+            if control is None:
+                # Whatever was sent while the previous turn was in flight is answered in one go
+                user_message = _merge_pending(inbox, user_message, held)
+            elif orchestrator is None:
+                await out.send({"type": "error", "error": "Case not found: interview controls are unavailable."})
                 continue
+            elif control == "end":
+                await orchestrator.control("end")
+                sessions.save(session)
+                # The report is produced in the background; the client polls GET /analysis/{job_id}
+                job = get_analysis_queue().submit(session, case)
+                await out.send({**orchestrator.phase_frame(), "analysis_job_id": job.job_id})
+                await websocket.close(code=1000)
+                break
+
+            # Follow-up chat (as opposed to phase changes and answer coaching) is what gets compacted and cached
+            follow_up = control is None and not (session.phase == ANSWER and orchestrator is not None)
+            cache_scope = None
+            if follow_up and response_cache is not None and session.current_response_id:
+                cache_scope = (case_id, session.phase, session.question_index, get_prompts().version)
+                cached = response_cache.lookup(cache_scope, user_message)
+                if cached is not None:
+                    # Someone already asked this here: no LLM call and no rate-limit budget spent
+                    frame = {"ai_message": cached, "response_id": session.current_response_id, "cached": True}
+                    await out.send({"type": "done", **frame} if streamed else frame)
+                    session.record_cached_turn(user_message, cached)
+                    sessions.save(session)
+                    continue
 
-            llm_response = await get_ai_response_follow_up(
-                response_id=current_response_id,
-                instructions=follow_up_instructions_for_ws,
-                curr_message=user_message
-            )
+            # Backpressure: wait out the session/global budgets, telling the client why it is waiting.
+            # Messages that arrive meanwhile are merged into this same turn. Replies served from
+            # local data (hints, precomputed explanations) cost no LLM call and skip it.
+            local = control is not None and orchestrator.is_local(control)
+            while not local:
+                wait, scope = await limiter.try_acquire()
+                if not wait:
+                    break
+                await out.send({"type": "throttled", "scope": scope, "retry_after": round(wait, 2)})
+                done, _ = await asyncio.wait({reader}, timeout=wait)
+                if done:
+                    raise WebSocketDisconnect()
+                if control is None:
+                    user_message = _merge_pending(inbox, user_message, held)
+            if dropped["count"]:
+                CHAT_ERRORS.inc(dropped["count"], reason="dropped_message")
+                await out.send({"type": "throttled", "scope": "session", "dropped": dropped["count"]})
+                dropped["count"] = 0
+            
+            if not session.current_response_id:
+                CHAT_ERRORS.inc(reason="missing_response_id")
+                await out.send({"error": "Cannot process message: AI context (response_id) is missing."})
+                continue
 
-            ai_message = llm_response.get("ai_message")
-            new_response_id = llm_response.get("response_id")
+            if compaction is not None:
+                if follow_up:
+                    # Usually finished while the user was reading the last reply; otherwise the turn waits for it
+                    done, _ = await asyncio.wait({compaction, reader}, return_when=asyncio.FIRST_COMPLETED)
+                    if compaction not in done:
+                        raise WebSocketDisconnect()
+                elif not compaction.done():
+                    compaction.cancel()  # the phase is about to move on; its summary would be stale
+                compaction = None
 
-            if ai_message is None or new_response_id is None:
-                await websocket.send_json({"error": "Failed to get AI response or response_id."})
+            turn_started = time.perf_counter()
+            connection.busy = True
+            phase_before = (session.phase, session.question_index)
+            compacted_context = session.compact_state if follow_up else None
+            follow_up_prompt = get_prompt_assembler().assemble("follow_up_prompt", case)
+            chain = "compacted" if session.compactions or compacted_context else "original"
+            if control is not None:
+                session.compact_state = None
+                turn = asyncio.create_task(_reply_phase(out, streamed, orchestrator.control(control)))
+            elif not follow_up:
+                turn = asyncio.create_task(_reply_phase(out, streamed, orchestrator.answer(user_message)))
+            elif compacted_context is not None:
+                # Fresh chain from the compacted state instead of the long one
+                turn = asyncio.create_task(reply(out, follow_up_prompt, None, user_message, compacted_context, session.unchained or None))
             else:
-                current_response_id = new_response_id
-                await websocket.send_json({
-                    "ai_message": ai_message,
-                    "response_id": current_response_id
-                })
+                turn = asyncio.create_task(reply(
+                    out, follow_up_prompt, session.current_response_id, user_message, None, session.unchained or None
+                ))
+            # Wait for the reply or the disconnect, whichever comes first. Nobody is left to read
+            # the reply once the client is gone, so the upstream request is cancelled.
+            await asyncio.wait({turn, reader}, return_when=asyncio.FIRST_COMPLETED)
+            if not turn.done():
+                turn.cancel()
+                raise WebSocketDisconnect()
+            try:
+                result = turn.result()
+            except InterviewError as e:
+                await out.send({"type": "error", "error": str(e)})
+                continue
+            finally:
+                connection.busy = False
+                connections.touch(connection)
+            CHAT_TURN_SECONDS.observe(time.perf_counter() - turn_started, mode=mode, chain=chain)
+            if result is not None and result.get("precomputed"):
+                # Served locally: not in the response chain, so it goes along with the next call
+                session.record_local_turn(result["ai_message"], result["response_id"])
+            elif result is not None:
+                session.record_turn(user_message, result["ai_message"], result["response_id"])
+                session.context_tokens = result.get("input_tokens") or session.context_tokens + estimate_tokens(
+                    (user_message or "") + result["ai_message"]
+                )
+                CHAT_CONTEXT_TOKENS.observe(session.context_tokens, chain=chain)
+                if compacted_context is not None:
+                    session.compact_state = None
+                    session.compactions += 1
+                    CHAT_COMPACTION_TOKENS_SAVED.inc(max(0, session.tokens_before_compaction - session.context_tokens))
+                if control is None and phase_before[0] == ANSWER:
+                    session.record_answer(phase_before[1], user_message)
+                if cache_scope is not None:
+                    response_cache.store(cache_scope, user_message, result["ai_message"])
+            elif control is None or (session.phase, session.question_index) == phase_before:
+                CHAT_ERRORS.inc(reason="llm")
+            sessions.save(session)
+            if (session.phase, session.question_index) != phase_before:
+                await out.send(orchestrator.phase_frame())
+            elif follow_up and result is not None and needs_compaction(session):
+                compaction = asyncio.create_task(compact(session, case, get_prompts().get("compaction_prompt")))
 
     except WebSocketDisconnect:
-        print(f"Client disconnected from MAIN APP WebSocket chat for case {case_id}")
+        log_sampled("chat_ws_disconnect", case_id=case_id)
     except Exception as e:
-        print(f"Error in MAIN APP WebSocket chat for case {case_id}: {e}")
+        logger.exception("Error in the WebSocket chat for case %s", case_id)
+        CHAT_ERRORS.inc(reason="server")
         try:
-            await websocket.send_json({"error": f"An server error occurred: {str(e)}"})
+            await out.send({"error": f"An server error occurred: {str(e)}", "code": "internal", "retryable": False})
         except Exception:
             pass
     finally:
-        print(f"Closing MAIN APP WebSocket connection for case {case_id}")
+        reader.cancel()
+        # A reconnect may land on another worker; make this one's latest state visible to it now
+        sessions.flush_soon()
+        if compaction is not None:
+            compaction.cancel()
+        if orchestrator is not None:
+            orchestrator.close()
+        connections.release(connection)
+        log_sampled("chat_ws_close", case_id=case_id)
 
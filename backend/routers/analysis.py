@@ -0,0 +1,36 @@
+from fastapi import APIRouter, HTTPException, Query
+from backend.database.models import AnalysisReport
+from backend.database.case_store import get_case_store
+from backend.services.analysis_jobs import get_analysis_queue
+from backend.services.session_store import get_session_store
+
+router = APIRouter()
+
+MAX_WAIT_SECONDS = 30.0
+
+
+@router.post("/sessions/{session_id}", response_model=AnalysisReport, status_code=202)
+async def submit_analysis(session_id: str):
+    """
+    Queues analysis of every answered question in the session and returns the job straight away.
+    The chat websocket does this by itself on an "end" control frame; calling it again returns the same job.
+    """
+    session = await get_session_store().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    case = get_case_store().get(session.case_id)
+    if case is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return get_analysis_queue().submit(session, case).report()
+
+
+@router.get("/{job_id}", response_model=AnalysisReport)
+async def get_analysis(job_id: str, wait: float = Query(0.0, ge=0.0, le=MAX_WAIT_SECONDS)):
+    """
+    Returns the analysis report. With ?wait=N the request is held until the job finishes or N seconds
+    pass, so a client can long-poll instead of polling in a tight loop.
+    """
+    job = await get_analysis_queue().wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    return job.report()
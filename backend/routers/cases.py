@@ -1,20 +1,58 @@
-from fastapi import APIRouter
-from backend.database.models import CaseInterview
-from backend.database.db import cases
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request
+from backend.database.models import CaseInterview, CaseSummary
+from backend.services.catalogue_cache import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CursorExpired, cached_json_response, get_catalogue_cache, page_json_response,
+)
+from typing import List, Literal, Optional, Union
 
 router = APIRouter()
 
-@router.get("/", response_model=List[CaseInterview])
-async def get_cases():
+# Both routes return pre-serialized bytes from the catalogue cache (pages are gzipped per request at a
+# fast level); response_model is kept for the docs.
+
+@router.get("/", response_model=Union[List[CaseInterview], List[CaseSummary]])
+async def get_cases(
+    request: Request,
+    view: Literal["full", "summary"] = Query("full"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    company: Optional[str] = Query(None),
+    source: Optional[str] = Query(None),
+    q: Optional[str] = Query(None, description="Full-text search over the case descriptions and questions"),
+):
     """
     Returns a list of McKinsey case interviews with detailed descriptions.
+    view=summary returns only the listing fields (no descriptions, questions or answers).
+
+    Without any of limit/cursor/company/source/q this is the whole catalogue. With them it is one page:
+    the body is still a list, X-Total-Count has the number of matches and X-Next-Cursor (when present)
+    is passed back as ?cursor= to get the next page. A cursor that was not issued here is a 400; one
+    whose last case has since been removed is a 410. A q with no searchable words matches nothing.
     """
-    return cases
+    catalogue = get_catalogue_cache()
+    if limit is None and cursor is None and company is None and source is None and q is None:
+        return cached_json_response(request, await catalogue.case_list(view))
+
+    try:
+        page = catalogue.page(
+            view=view, limit=limit or DEFAULT_PAGE_SIZE, cursor=cursor, company=company, source=source, q=q
+        )
+    except CursorExpired:
+        raise HTTPException(status_code=410, detail="Cursor expired: its case was removed, start again without a cursor")
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    response = await page_json_response(request, page.body)
+    response.headers["X-Total-Count"] = str(page.total)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return response
 
 @router.get("/{case_id}", response_model=CaseInterview)
-async def get_case(case_id: str):
+async def get_case(request: Request, case_id: str):
     """
     Returns a specific McKinsey case interview by ID.
     """
-    return next((case for case in cases if case.id == case_id), None)
+    cached = await get_catalogue_cache().case(case_id)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return cached_json_response(request, cached)
@@ -1,50 +1,77 @@
+import asyncio
+import logging
 from fastapi import APIRouter, HTTPException # WebSocket, WebSocketDisconnect removed
 from typing import List, Dict, Optional
 from pydantic import BaseModel
 from backend.database.models import ChatMessage, CaseInterview
-from backend.database.db import cases
+from backend.database.case_store import get_case_store
+from backend.services.session_store import get_session_store
+from backend.services.greeting_cache import GREETING_PREWARM_CONCURRENCY, get_greeting_cache, greeting_key
+from backend.services.metrics import log_sampled
 from backend.services.llm_service import get_ai_response_initial # get_ai_response_follow_up removed
-import yaml
+from backend.services.prompt_assembly import get_prompt_assembler
+from backend.services.llm_routing import get_router
 from backend.database.models import InitialChatRequest, AIResponseMessage
 
-with open("backend/prompts.yaml", 'r') as f:
-    prompts = yaml.safe_load(f)
-initial_instructions = prompts.get(
-    'initial_interaction_prompt',
-    prompts.get('default_system_prompt')
-)
-# follow_up_instructions loading removed as it's now in main.py for the WS endpoint
-
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
+
+# The greeting is cached per case (see services/greeting_cache.py), so the temperature and the model
+# (the "initial" tier from services/llm_routing.py) are part of the cache key
+GREETING_TEMPERATURE = 0.5
+
+
+async def get_initial_greeting(current_case: CaseInterview) -> Dict[str, str]:
+    """
+    Returns {"response_id", "ai_message"} for the case's opening message, from the greeting cache
+    when possible. The response_id is shared by everyone who opens the case; each session branches
+    its own follow-ups off it.
+    """
+    # The whole case goes into the instructions as the stable, cacheable prefix every later turn repeats
+    prompt = get_prompt_assembler().assemble("initial_interaction_prompt", current_case, case_name=current_case.name)
+    model = get_router().models("initial")[0]
 
+    key = greeting_key(
+        get_case_store().content_hash(current_case.id) or "",
+        prompt.instructions,
+        "",
+        model,
+        GREETING_TEMPERATURE,
+    )
+    # get_ai_response_initial returns a Dict {"response_id": ..., "ai_message": ...}
+    return await get_greeting_cache().get_or_create(key, lambda: get_ai_response_initial(
+        instructions=prompt.instructions,
+        model=model,
+        temperature=GREETING_TEMPERATURE,
+        prompt_cache_key=prompt.cache_key,
+    ))
+
+
+async def prewarm_greetings() -> None:
+    """Fills the greeting cache for every case; run in the background at startup when GREETING_CACHE_PREWARM=1."""
+    limit = asyncio.Semaphore(GREETING_PREWARM_CONCURRENCY)
 
-# In backend/routers/chat.py
+    async def warm(case: CaseInterview) -> None:
+        async with limit:
+            result = await get_initial_greeting(case)
+            if result.get("response_id") is None:
+                logger.warning("Could not prewarm greeting for case %s: %s", case.id, result.get("ai_message"))
 
-# You'll need to load prompts from your prompts.yaml
-# For example:
+    cases = get_case_store().list_cases()
+    await asyncio.gather(*(warm(case) for case in cases))
+    logger.info("Prewarmed greetings for %d case(s)", len(cases))
 
 
 @router.post("/initiate_chat", response_model=AIResponseMessage)
 async def initiate_chat_session(request_data: InitialChatRequest):
     case_id = request_data.case_id
-    current_case = next((case for case in cases if case.id == case_id), None)
+    current_case = get_case_store().get(case_id)
     if not current_case:
         raise HTTPException(status_code=404, detail="Case not found")
-    
-    # Construct a meaningful context for the initial call
-    case_context_for_llm = f"Client: {current_case.description.client_name}. Goal: {current_case.description.client_goal}. Situation: {current_case.description.situation_description}"
-    
-    # Format the initial instructions using the case name
-    # The global 'initial_instructions' is the template string from prompts.yaml
-    formatted_initial_instructions = initial_instructions.replace("{{case_name}}", current_case.name)
-
-    # Call the LLM service to get the initial response
-    # get_ai_response_initial is expected to return a Dict {"response_id": ..., "ai_message": ...}
-    llm_response = await get_ai_response_initial(
-        instructions=formatted_initial_instructions,
-        current_case_context=case_context_for_llm
-    )
+
+    llm_response = await get_initial_greeting(current_case)
 
     response_id = llm_response.get("response_id")
     ai_message = llm_response.get("ai_message")
@@ -54,8 +81,11 @@ async def initiate_chat_session(request_data: InitialChatRequest):
         # This could be due to an error in llm_service.py or an unexpected API response
         raise HTTPException(status_code=500, detail="Failed to get AI message from LLM service")
 
-    print(f"LLM Response ID: {response_id}, AI Message: {ai_message}")
-    return AIResponseMessage(response_id=response_id, ai_message=ai_message)
+    log_sampled("initiate_chat", case_id=case_id, response_id=response_id, ai_message_chars=len(ai_message))
+    session_id = None
+    if response_id is not None:
+        session_id = get_session_store().create(case_id, response_id, ai_message).session_id
+    return AIResponseMessage(response_id=response_id, ai_message=ai_message, session_id=session_id)
 
 # The WebSocket endpoint has been moved to main.py
 # Remove the old HTTP follow_up endpoint (already commented out)
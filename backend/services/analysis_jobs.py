@@ -0,0 +1,449 @@
+"""
+Background analysis of finished interviews.
+
+When an interview ends, every question the user answered becomes one analysis item of a job.
+The items run on the event loop through ANALYSIS_CONCURRENCY worker tasks (the llm_service
+concurrency limit still applies on top), each retried up to ANALYSIS_MAX_ATTEMPTS times with
+jittered exponential backoff. The user gets the "interview complete" screen immediately and polls
+GET /analysis/{job_id} (optionally long-polling with ?wait=) for the report.
+
+A job carries everything its items need (question, reference answer, the user's answer, and the
+case anchor response to chain from), so it does not depend on the session still being around.
+Jobs are kept in memory; with ANALYSIS_DB_PATH (or else SHARED_STATE_PATH) set they are also stored
+in SQLite, which lets any worker answer a poll and lets unfinished jobs be picked up again after a
+restart. A stored job is leased by the worker running it: the row names its owner and carries a
+heartbeat the owner renews every ANALYSIS_LEASE_SECONDS / 3. Workers only take over unfinished jobs
+whose heartbeat is older than ANALYSIS_LEASE_SECONDS, claiming each with a conditional UPDATE so
+exactly one of them wins, and an owner whose lease was taken over stops saving that job.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import secrets
+import socket
+import sqlite3
+import time
+from contextlib import closing
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from backend.database.models import CaseInterview
+from backend.services.llm_service import gen_ai_response_analysis
+from backend.database.case_store import get_case_store
+from backend.services.prompt_assembly import get_prompt_assembler
+from backend.services.session_store import ChatSession
+from backend.services.shared_state import SHARED_STATE_PATH
+
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "4"))
+ANALYSIS_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "4"))
+ANALYSIS_RETRY_BASE_SECONDS = float(os.getenv("ANALYSIS_RETRY_BASE_SECONDS", "1"))
+ANALYSIS_RETRY_MAX_SECONDS = float(os.getenv("ANALYSIS_RETRY_MAX_SECONDS", "30"))
+ANALYSIS_JOB_TTL_SECONDS = float(os.getenv("ANALYSIS_JOB_TTL_SECONDS", str(24 * 60 * 60)))
+ANALYSIS_DB_PATH = os.getenv("ANALYSIS_DB_PATH") or SHARED_STATE_PATH
+ANALYSIS_LEASE_SECONDS = float(os.getenv("ANALYSIS_LEASE_SECONDS", "60"))
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETE = "complete"
+FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AnalysisItem:
+    question_index: int
+    question: str
+    reference_answer: str
+    user_answer: str
+    status: str = QUEUED
+    attempts: int = 0
+    analysis: Optional[str] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class AnalysisJob:
+    job_id: str
+    session_id: str
+    case_id: str
+    anchor_response_id: Optional[str]
+    items: List[AnalysisItem] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def status(self) -> str:
+        statuses = {item.status for item in self.items}
+        if not statuses & {QUEUED, RUNNING}:
+            return FAILED if statuses == {FAILED} else COMPLETE
+        return QUEUED if statuses == {QUEUED} else RUNNING
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (COMPLETE, FAILED)
+
+    def report(self) -> Dict:
+        """What the poll endpoint returns (no reference answers)."""
+        return {
+            "job_id": self.job_id,
+            "session_id": self.session_id,
+            "case_id": self.case_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "items": [
+                {
+                    "question_index": item.question_index,
+                    "question": item.question,
+                    "status": item.status,
+                    "attempts": item.attempts,
+                    "analysis": item.analysis,
+                    "error": item.error,
+                }
+                for item in self.items
+            ],
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "AnalysisJob":
+        raw = json.loads(data)
+        raw["items"] = [AnalysisItem(**item) for item in raw["items"]]
+        return cls(**raw)
+
+
+class StoredJob(NamedTuple):
+    """A job as it was when a save was requested; taken on the event loop, written off it."""
+    job_id: str
+    session_id: str
+    data: str
+    finished: bool
+    updated_at: float
+
+    @classmethod
+    def of(cls, job: AnalysisJob) -> "StoredJob":
+        return cls(job.job_id, job.session_id, job.to_json(), job.finished, job.updated_at)
+
+
+class SqliteAnalysisBackend:
+    """Durable copy of the jobs. Only called off the event loop (asyncio.to_thread)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_jobs "
+                "(job_id TEXT PRIMARY KEY, session_id TEXT NOT NULL, data TEXT NOT NULL, "
+                "finished INTEGER NOT NULL, updated_at REAL NOT NULL, owner TEXT, heartbeat REAL NOT NULL DEFAULT 0)"
+            )
+            # tables created before leases existed
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(analysis_jobs)")}
+            if "owner" not in columns:
+                conn.execute("ALTER TABLE analysis_jobs ADD COLUMN owner TEXT")
+                conn.execute("ALTER TABLE analysis_jobs ADD COLUMN heartbeat REAL NOT NULL DEFAULT 0")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def load(self, job_id: str) -> Optional[AnalysisJob]:
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT data FROM analysis_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return AnalysisJob.from_json(row[0]) if row else None
+
+    def load_stale(self, stale_before: float) -> List[AnalysisJob]:
+        """Unfinished jobs nobody holds a live lease on."""
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                "SELECT data FROM analysis_jobs WHERE finished = 0 AND (owner IS NULL OR heartbeat < ?)",
+                (stale_before,),
+            ).fetchall()
+        return [AnalysisJob.from_json(row[0]) for row in rows]
+
+    def claim(self, job_id: str, owner: str, stale_before: float) -> bool:
+        """Takes the lease on an unfinished job if it is free or stale. True if this owner got it."""
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "UPDATE analysis_jobs SET owner = ?, heartbeat = ? "
+                "WHERE job_id = ? AND finished = 0 AND (owner IS NULL OR heartbeat < ?)",
+                (owner, time.time(), job_id, stale_before),
+            )
+        return cursor.rowcount == 1
+
+    def renew(self, owner: str) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE analysis_jobs SET heartbeat = ? WHERE owner = ? AND finished = 0", (time.time(), owner)
+            )
+
+    def save(self, job: StoredJob, owner: str) -> bool:
+        """Writes the job unless another owner holds it. False means the lease was lost."""
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO analysis_jobs (job_id, session_id, data, finished, updated_at, owner, heartbeat) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET data = excluded.data, finished = excluded.finished, "
+                "updated_at = excluded.updated_at, heartbeat = excluded.heartbeat "
+                "WHERE analysis_jobs.owner = excluded.owner",
+                (job.job_id, job.session_id, job.data, int(job.finished), job.updated_at, owner, time.time()),
+            )
+        return cursor.rowcount == 1
+
+    def delete_older_than(self, cutoff: float) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM analysis_jobs WHERE finished = 1 AND updated_at < ?", (cutoff,))
+
+
+class AnalysisQueue:
+    def __init__(
+        self,
+        concurrency: int = ANALYSIS_CONCURRENCY,
+        max_attempts: int = ANALYSIS_MAX_ATTEMPTS,
+        retry_base_seconds: float = ANALYSIS_RETRY_BASE_SECONDS,
+        retry_max_seconds: float = ANALYSIS_RETRY_MAX_SECONDS,
+        ttl_seconds: float = ANALYSIS_JOB_TTL_SECONDS,
+        lease_seconds: float = ANALYSIS_LEASE_SECONDS,
+        backend: Optional[SqliteAnalysisBackend] = None,
+    ):
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.backend = backend
+        # names this worker's leases in the shared table
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+        self._jobs: Dict[str, AnalysisJob] = {}
+        self._by_session: Dict[str, str] = {}
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._pending: "asyncio.Queue[Tuple[str, int]]" = asyncio.Queue()
+        # Saves: the newest unsaved snapshot per job, and one writer task per job draining it, so
+        # saves of a job never overlap and an older snapshot cannot land after a newer one
+        self._unsaved: Dict[str, StoredJob] = {}
+        self._writers: Dict[str, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _event(self, job_id: str) -> asyncio.Event:
+        event = self._finished.get(job_id)
+        if event is None:
+            event = self._finished[job_id] = asyncio.Event()
+        return event
+
+    def _evict_expired(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and job.updated_at < cutoff:
+                del self._jobs[job_id]
+                self._finished.pop(job_id, None)
+                if self._by_session.get(job.session_id) == job_id:
+                    del self._by_session[job.session_id]
+
+    def _enqueue(self, job: AnalysisJob) -> None:
+        self._jobs[job.job_id] = job
+        self._by_session[job.session_id] = job.job_id
+        for index, item in enumerate(job.items):
+            if item.status in (QUEUED, RUNNING):
+                item.status = QUEUED
+                self._pending.put_nowait((job.job_id, index))
+        if job.finished:
+            self._event(job.job_id).set()
+
+    def submit(self, session: ChatSession, case: CaseInterview) -> AnalysisJob:
+        """
+        Queues analysis of every question the session has answers for and returns the job right away.
+        A session that already has a job gets that job back unless it failed completely.
+        """
+        self._evict_expired()
+        existing = self._jobs.get(self._by_session.get(session.session_id, ""))
+        if existing is not None and existing.status != FAILED:
+            return existing
+
+        questions = case.description.questions
+        items = [
+            AnalysisItem(
+                question_index=index,
+                question=questions[index].text,
+                reference_answer=questions[index].reveal_answer,
+                user_answer="\n\n".join(messages),
+            )
+            for index, messages in sorted((int(key), value) for key, value in session.answers.items())
+            if 0 <= index < len(questions) and messages
+        ]
+        job = AnalysisJob(
+            job_id=secrets.token_urlsafe(12),
+            session_id=session.session_id,
+            case_id=case.id,
+            anchor_response_id=session.response_ids[0] if session.response_ids else None,
+            items=items,
+        )
+        self._enqueue(job)
+        self._persist_soon(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[AnalysisJob]:
+        job = self._jobs.get(job_id)
+        if job is None and self.backend is not None:
+            job = await asyncio.to_thread(self.backend.load, job_id)
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[AnalysisJob]:
+        """Returns the job once it has finished or `timeout` seconds have passed, whichever is first."""
+        job = await self.get(job_id)
+        if job is None or job.finished or timeout <= 0:
+            return job
+        if job_id in self._jobs:
+            try:
+                await asyncio.wait_for(self._event(job_id).wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            return self._jobs.get(job_id, job)
+        # Another worker owns this job: all we can do is re-read its stored copy
+        deadline = time.monotonic() + timeout
+        while not job.finished and time.monotonic() < deadline:
+            await asyncio.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
+            job = await self.get(job_id) or job
+        return job
+
+    def _persist_soon(self, job: AnalysisJob) -> None:
+        if self.backend is None:
+            return
+        self._unsaved[job.job_id] = StoredJob.of(job)
+        if job.job_id not in self._writers:
+            task = asyncio.get_running_loop().create_task(self._write(job.job_id))
+            self._writers[job.job_id] = task
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, job_id: str) -> None:
+        failures = 0
+        try:
+            while job_id in self._unsaved:
+                stored = self._unsaved.pop(job_id)
+                try:
+                    saved = await asyncio.to_thread(self.backend.save, stored, self.owner)
+                except Exception as e:
+                    # Keep the snapshot (unless a newer one was queued meanwhile) and try again later
+                    self._unsaved.setdefault(job_id, stored)
+                    failures += 1
+                    logger.warning("Could not save analysis job %s (attempt %d): %r", job_id, failures, e)
+                    await asyncio.sleep(self._backoff(failures))
+                    continue
+                failures = 0
+                if not saved:
+                    self._lease_lost(job_id)
+        finally:
+            del self._writers[job_id]
+
+    def _lease_lost(self, job_id: str) -> None:
+        # Another worker took the job over (our heartbeat went stale); its items are no longer ours to run
+        logger.warning("Analysis job %s was taken over by another worker; dropping it here", job_id)
+        self._unsaved.pop(job_id, None)
+        job = self._jobs.pop(job_id, None)
+        self._finished.pop(job_id, None)
+        if job is not None and self._by_session.get(job.session_id) == job_id:
+            del self._by_session[job.session_id]
+
+    async def _keep_leases(self) -> None:
+        """Renews this worker's leases and takes over jobs whose owner stopped renewing, forever."""
+        while True:
+            try:
+                await asyncio.to_thread(self.backend.renew, self.owner)
+                stale_before = time.time() - self.lease_seconds
+                for job in await asyncio.to_thread(self.backend.load_stale, stale_before):
+                    if job.job_id in self._jobs:
+                        continue
+                    if await asyncio.to_thread(self.backend.claim, job.job_id, self.owner, stale_before):
+                        logger.info("Resuming analysis job %s", job.job_id)
+                        self._enqueue(job)
+            except Exception as e:
+                logger.warning("Analysis lease check failed: %r", e)
+            await asyncio.sleep(self.lease_seconds / 3)
+
+    async def flush(self, timeout: Optional[float] = None) -> None:
+        """
+        Waits for every requested save to be written (used on shutdown), for at most `timeout` seconds
+        (default: one lease, after which another worker takes the jobs over from their last saved state).
+        """
+        deadline = time.monotonic() + (self.lease_seconds if timeout is None else timeout)
+        while self._tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.error("Gave up saving analysis jobs %s", ", ".join(sorted(self._unsaved)))
+                for task in list(self._tasks):
+                    task.cancel()
+                return
+            await asyncio.wait(list(self._tasks), timeout=remaining)
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (attempt - 1))
+        return delay * random.uniform(0.5, 1.5)
+
+    async def _analyse(self, job: AnalysisJob, item: AnalysisItem) -> None:
+        item.status = RUNNING
+        while True:
+            item.attempts += 1
+            # Every item of every job for this case shares the case prefix
+            prompt = get_prompt_assembler().assemble("analysis_prompt", get_case_store().get(job.case_id))
+            result = await gen_ai_response_analysis(
+                response_id=job.anchor_response_id,
+                question=item.question,
+                answer=item.reference_answer,
+                user_answer=item.user_answer,
+                instructions=prompt.instructions,
+                prompt_cache_key=prompt.cache_key,
+            )
+            if result.get("response_id") is not None:
+                item.status, item.analysis, item.error = COMPLETE, result.get("ai_message"), None
+                return
+            item.error = result.get("ai_message")
+            if item.attempts >= self.max_attempts:
+                item.status = FAILED
+                return
+            await asyncio.sleep(self._backoff(item.attempts))
+
+    async def _worker(self) -> None:
+        while True:
+            job_id, index = await self._pending.get()
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            try:
+                await self._analyse(job, job.items[index])
+            except Exception as e:
+                logger.exception("Analysis of job %s item %d failed", job_id, index)
+                job.items[index].status, job.items[index].error = FAILED, str(e)
+            job.updated_at = time.time()
+            self._persist_soon(job)
+            if job.finished:
+                self._event(job_id).set()
+
+    async def run(self) -> None:
+        """Background task started from the app lifespan: runs the workers and, with a database, the leases."""
+        if self.backend is not None:
+            await asyncio.to_thread(self.backend.delete_older_than, time.time() - self.ttl_seconds)
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        try:
+            if self.backend is not None:
+                await asyncio.gather(self._keep_leases(), *workers)
+            else:
+                await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+
+_queue: Optional[AnalysisQueue] = None
+
+
+def get_analysis_queue() -> AnalysisQueue:
+    global _queue
+    if _queue is None:
+        _queue = AnalysisQueue(backend=SqliteAnalysisBackend(ANALYSIS_DB_PATH) if ANALYSIS_DB_PATH else None)
+    return _queue
@@ -0,0 +1,270 @@
+"""
+Pre-serialized responses for the case catalogue endpoints.
+
+The catalogue only changes when the case store's version changes, so each representation
+(full list, summary list, single case) is serialized once per version into bytes, compressed once
+per supported encoding in a thread (so a cold cache does not stall the event loop), and tagged with a strong ETag derived from the bytes. Requests then cost a
+dict lookup plus an If-None-Match comparison instead of a pydantic validate/serialize pass.
+
+Every body is a join of the store's per-case JSON (CaseStore.case_json / summary_json), which is
+byte-for-byte what pydantic would produce. Filtered/paginated listings are assembled per request
+the same way, so a page costs a byte join rather than serializing models. Per-case bytes are
+memoized for stores that hold models; a catalogue store already has them in its mapping, so they
+are not copied onto the heap. Pages are not precompressed (nothing would reuse the work): they are
+gzipped at PAGE_GZIP_LEVEL in a thread, and only for clients that accept gzip.
+"""
+import asyncio
+import base64
+import binascii
+import gzip
+import hashlib
+import json
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+
+from backend.database.case_store import CaseStore, get_case_store
+
+try:
+    import brotli  # optional: only used when installed
+except ImportError:
+    brotli = None
+
+# Smaller bodies are not worth the compression header overhead
+COMPRESS_MIN_BYTES = 1024
+# Per-request page bodies are compressed once and thrown away, so favour speed over ratio
+PAGE_GZIP_LEVEL = 4
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+@dataclass
+class CachedBody:
+    body: bytes
+    etag: str
+    # content-coding -> (compressed body, etag for that coding)
+    encoded: Dict[str, Tuple[bytes, str]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, body: bytes, precompress: bool = True) -> "CachedBody":
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        cached = cls(body=body, etag=f'"{digest}"')
+        if precompress and len(body) >= COMPRESS_MIN_BYTES:
+            if brotli is not None:
+                cached.encoded["br"] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+            cached.encoded["gzip"] = (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gzip"')
+        return cached
+
+    def all_etags(self) -> List[str]:
+        # A coding's tag is derived from the identity tag, so it is known even before compressing
+        return [self.etag] + [f'{self.etag[:-1]}-{coding}"' for coding in ("br", "gzip")]
+
+
+def _accepted_encodings(accept_encoding: str) -> List[str]:
+    accepted = []
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q=") and quality[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.append(coding.strip().lower())
+    return accepted
+
+
+def _if_none_match_hits(request: Request, cached: CachedBody) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Any coding of the same bytes is the same version, so a gzip tag revalidates an identity request too
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return any(etag in candidates for etag in cached.all_etags())
+
+
+def cached_json_response(request: Request, cached: CachedBody) -> Response:
+    """Serves cached bytes with ETag/304 handling and the best encoding the client accepts."""
+    headers = {"Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if _if_none_match_hits(request, cached):
+        headers["ETag"] = cached.etag
+        return Response(status_code=304, headers=headers)
+
+    body, etag = cached.body, cached.etag
+    accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    for coding in ("br", "gzip"):
+        if coding in cached.encoded and coding in accepted:
+            body, etag = cached.encoded[coding]
+            headers["Content-Encoding"] = coding
+            break
+    headers["ETag"] = etag
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def page_json_response(request: Request, page: CachedBody) -> Response:
+    """cached_json_response for a body built for this request: gzipped off the event loop, only if accepted."""
+    if (
+        len(page.body) >= COMPRESS_MIN_BYTES
+        and not page.encoded
+        and not _if_none_match_hits(request, page)
+        and "gzip" in _accepted_encodings(request.headers.get("accept-encoding", ""))
+    ):
+        body = await asyncio.to_thread(gzip.compress, page.body, compresslevel=PAGE_GZIP_LEVEL, mtime=0)
+        page.encoded["gzip"] = (body, f'{page.etag[:-1]}-gzip"')
+    return cached_json_response(request, page)
+
+
+class CatalogueCache:
+    """Serialized catalogue bodies for one case store, thrown away whenever the store's version moves."""
+
+    def __init__(self, store: CaseStore):
+        self.store = store
+        self._version: Optional[str] = None
+        self._lists: Dict[str, CachedBody] = {}
+        self._cases: Dict[str, CachedBody] = {}
+        self._item_bytes: Dict[Tuple[str, str], bytes] = {}
+        self._building: Dict[Tuple[str, str, str], "asyncio.Task[CachedBody]"] = {}  # (version, kind, name) -> build
+
+    def _sync(self) -> None:
+        self.store.maybe_refresh()
+        if self._version != self.store.version:
+            self._version = self.store.version
+            self._lists = {}
+            self._cases = {}
+            self._item_bytes = {}
+
+    async def _build_once(self, key: Tuple[str, str], build: Callable[[], Awaitable[CachedBody]]) -> CachedBody:
+        """Runs build() once per (kind, name) and store version for all the requests that arrive meanwhile."""
+        key = (self._version, *key)
+        task = self._building.get(key)
+        if task is None:
+            task = self._building[key] = asyncio.ensure_future(build())
+            task.add_done_callback(lambda _: self._building.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def case_list(self, view: str = "full") -> CachedBody:
+        """
+        The whole catalogue. Joining and compressing it takes seconds for a large catalogue, so it is
+        built in a thread, once for all the requests that arrive meanwhile.
+        """
+        self._sync()
+        cached = self._lists.get(view)
+        if cached is not None:
+            return cached
+        return await self._build_once(("list", view), lambda: self._build_list(view))
+
+    async def _build_list(self, view: str) -> CachedBody:
+        version = self._version
+        items = self.store.json_items(view)
+        cached = await asyncio.to_thread(lambda: CachedBody.build(b"[" + b",".join(items) + b"]"))
+        if self._version == version:
+            self._lists[view] = cached
+        return cached
+
+    async def case(self, case_id: str) -> Optional[CachedBody]:
+        """One case. The first request for it compresses it (brotli 11, gzip 9) in a thread."""
+        self._sync()
+        cached = self._cases.get(case_id)
+        if cached is not None:
+            return cached
+        body = self.store.case_json(case_id)
+        if body is None:
+            return None
+        return await self._build_once(("case", case_id), lambda: self._build_case(case_id, body))
+
+    async def _build_case(self, case_id: str, body: bytes) -> CachedBody:
+        version = self._version
+        cached = await asyncio.to_thread(CachedBody.build, body)
+        if self._version == version:
+            self._cases[case_id] = cached
+        return cached
+
+    def _item(self, case_id: str, view: str) -> bytes:
+        key = (case_id, view)
+        body = self._item_bytes.get(key)
+        if body is None:
+            body = self.store.summary_json(case_id) if view == "summary" else self.store.case_json(case_id)
+            if not self.store.memory_mapped:
+                self._item_bytes[key] = body
+        return body
+
+    def page(
+        self,
+        view: str = "summary",
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        company: Optional[str] = None,
+        source: Optional[str] = None,
+        q: Optional[str] = None,
+    ) -> "CasePage":
+        """
+        One page of the (optionally filtered/searched) catalogue.
+        Browsing uses a keyset cursor (the id of the last case on the page), which stays correct when
+        other cases are added or removed between pages; if that case itself is removed, the cursor
+        raises CursorExpired. Search results are ranked, so their cursor is an offset into the ranking.
+        """
+        self._sync()
+        matches = self.store.find(company=company, source=source, text=q)
+        state = decode_cursor(cursor)
+        if q is not None:
+            start = state.get("offset", 0)
+            if type(start) is not int or start < 0:
+                raise ValueError("invalid cursor")
+        elif "after" in state:
+            after = state["after"]
+            if not isinstance(after, str):
+                raise ValueError("invalid cursor")
+            position = self.store.position(after)
+            if position is None:
+                raise CursorExpired(f"case {after} is no longer in the catalogue")
+            start = bisect_right(matches, position, key=self.store.position)
+        else:
+            start = 0
+        selected = matches[start:start + limit]
+        next_cursor = None
+        if start + limit < len(matches):
+            if q is not None:
+                next_cursor = encode_cursor({"offset": start + limit})
+            else:
+                next_cursor = encode_cursor({"after": selected[-1]})
+        body = b"[" + b",".join(self._item(case_id, view) for case_id in selected) + b"]"
+        return CasePage(body=CachedBody.build(body, precompress=False), next_cursor=next_cursor, total=len(matches))
+
+
+class CursorExpired(ValueError):
+    """The cursor is well formed but the case it continues after has been removed."""
+
+
+@dataclass
+class CasePage:
+    body: CachedBody
+    next_cursor: Optional[str]
+    total: int
+
+
+def encode_cursor(state: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> dict:
+    """Opaque cursor -> state dict. Raises ValueError on anything we did not issue."""
+    if not cursor:
+        return {}
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("invalid cursor") from e
+    if not isinstance(state, dict):
+        raise ValueError("invalid cursor")
+    return state
+
+
+_cache: Optional[CatalogueCache] = None
+
+
+def get_catalogue_cache() -> CatalogueCache:
+    global _cache
+    if _cache is None:
+        _cache = CatalogueCache(get_case_store())
+    return _cache
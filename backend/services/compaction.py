@@ -0,0 +1,69 @@
+"""
+Context compaction for long chat sessions.
+
+Every follow-up chains previous_response_id, so the context the model re-reads grows with the whole
+conversation. Once a turn's input passes CHAT_COMPACTION_TOKEN_BUDGET tokens, the conversation so
+far is summarised in the background (while the user is reading the reply) into a compact state:
+the current question and the summary (the case itself is in every turn's instructions, see
+prompt_assembly.py). The next follow-up then starts a fresh
+response chain from that state instead of chaining off the long one. Later compactions fold the
+previous summary and the turns since into a new summary.
+
+Only the follow-up chat path is compacted. The interview phases already branch per question off the
+case anchor (see interview.py), so their context is bounded by one question's worth of turns.
+Set CHAT_COMPACTION_TOKEN_BUDGET=0 to turn compaction off.
+"""
+import os
+from typing import Optional
+
+from backend.database.models import CaseInterview
+from backend.services.llm_service import gen_ai_response_summary
+from backend.services.metrics import CHAT_COMPACTIONS
+from backend.services.session_store import ChatSession
+
+CHAT_COMPACTION_TOKEN_BUDGET = int(os.getenv("CHAT_COMPACTION_TOKEN_BUDGET", "8000"))
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token; only used when the API does not report usage."""
+    return len(text) // 4 + 1
+
+
+def needs_compaction(session: ChatSession, budget: int = CHAT_COMPACTION_TOKEN_BUDGET) -> bool:
+    return budget > 0 and session.compact_state is None and session.context_tokens > budget
+
+
+def _case_context(case: Optional[CaseInterview], question_index: int) -> str:
+    if case is None or not 0 <= question_index < len(case.description.questions):
+        return ""
+    return f"Current question: {case.description.questions[question_index].text}"
+
+
+async def compact(session: ChatSession, case: Optional[CaseInterview], instructions: str) -> bool:
+    """
+    Summarises the session's conversation into session.compact_state, which the next follow-up turn
+    uses to start a fresh chain. Returns False (and leaves the session as it was) if the summary failed.
+    """
+    upto = len(session.transcript)
+    turns = session.transcript[session.compacted_upto:upto]
+    parts = []
+    if session.summary:
+        parts.append(f"Summary of the conversation before this point:\n{session.summary}")
+    parts.append("\n".join(f"{message['role']}: {message['content']}" for message in turns))
+
+    result = await gen_ai_response_summary(transcript="\n\n".join(parts), instructions=instructions)
+    if result.get("response_id") is None:
+        CHAT_COMPACTIONS.inc(outcome="error")
+        return False
+
+    case_context = _case_context(case, session.question_index)
+    session.summary = result["ai_message"]
+    session.compacted_upto = upto
+    session.compact_state = (
+        "The conversation so far has been summarised to keep it short. Continue the interview from this state.\n\n"
+        + (f"{case_context}\n\n" if case_context else "")
+        + f"Conversation summary:\n{session.summary}"
+    )
+    session.tokens_before_compaction = session.context_tokens
+    CHAT_COMPACTIONS.inc(outcome="ok")
+    return True
@@ -0,0 +1,222 @@
+"""
+Lifecycle of the chat websockets: admission, idle and absolute timeouts, and draining on shutdown.
+
+Every chat socket is admitted through the ConnectionManager and released when it ends:
+  * Past WS_MAX_CONNECTIONS live sockets in this worker (0 = no cap), or while draining, a new
+    socket gets a {"type": "closing"} frame and is closed with 1013 (try again later) or 1012
+    (service restart) before any work is done for it.
+  * A socket with no chat or control message for WS_IDLE_TIMEOUT_SECONDS, or open for longer than
+    WS_MAX_SESSION_SECONDS, is closed. Heartbeat pings do not count as activity, so an abandoned
+    tab that keeps pinging still times out. A turn in flight is never cut off: the close request
+    queues behind it.
+  * On SIGTERM the worker first drains: new sockets are refused, every open socket finishes the
+    turn it is on, gets a closing frame with resume=true and its session id (the client reconnects
+    with ?session_id= and lands on another worker) and is closed. After WS_DRAIN_SECONDS at the
+    latest, the signal is handed to the server's own handler, so uvicorn's normal shutdown follows.
+    The hook is needed because uvicorn fails open websockets with 1012 before the app's lifespan
+    shutdown runs.
+
+Close requests travel through the socket's inbox (the queue the chat loop reads), so the loop
+handles them between turns like any other frame. Live numbers are on GET /connections.
+"""
+import asyncio
+import logging
+import os
+import signal
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set, Tuple
+
+from backend.services.metrics import CHAT_ACTIVE_WEBSOCKETS, CHAT_WEBSOCKETS_CLOSED
+
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "2000"))
+WS_IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", str(15 * 60)))
+WS_MAX_SESSION_SECONDS = float(os.getenv("WS_MAX_SESSION_SECONDS", str(3 * 60 * 60)))
+WS_DRAIN_SECONDS = float(os.getenv("WS_DRAIN_SECONDS", "30"))
+
+logger = logging.getLogger(__name__)
+
+# close reason -> websocket close code
+CLOSE_CODES = {
+    "idle": 1000,
+    "max_duration": 1000,
+    "draining": 1012,  # service restart: reconnect, preferably elsewhere
+    "capacity": 1013,  # try again later
+}
+
+
+@dataclass(frozen=True)
+class CloseRequest:
+    """Put in a connection's inbox to have the chat loop close the socket between turns."""
+    reason: str
+
+    @property
+    def code(self) -> int:
+        return CLOSE_CODES.get(self.reason, 1000)
+
+    def frame(self, session_id: Optional[str]) -> Dict:
+        return {"type": "closing", "reason": self.reason, "resume": self.reason != "capacity", "session_id": session_id}
+
+
+@dataclass(eq=False)
+class Connection:
+    case_id: str
+    inbox: asyncio.Queue
+    session_id: Optional[str] = None
+    opened_at: float = field(default_factory=time.monotonic)
+    last_active: float = field(default_factory=time.monotonic)
+    busy: bool = False  # a turn is in flight
+    closing: Optional[str] = None  # reason, once a close has been requested
+
+
+class ConnectionManager:
+    def __init__(
+        self,
+        max_connections: int = WS_MAX_CONNECTIONS,
+        idle_timeout: float = WS_IDLE_TIMEOUT_SECONDS,
+        max_duration: float = WS_MAX_SESSION_SECONDS,
+        drain_seconds: float = WS_DRAIN_SECONDS,
+    ):
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.max_duration = max_duration
+        self.drain_seconds = drain_seconds
+        self.draining = False
+        self._live: Set[Connection] = set()
+        self.admitted = 0
+        self.closed: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def admit(self, case_id: str, inbox: asyncio.Queue) -> Tuple[Optional[Connection], Optional[CloseRequest]]:
+        """(connection, None) if the socket may proceed, else (None, why it is refused)."""
+        if self.draining:
+            return None, self._refuse("draining")
+        if self.max_connections and len(self._live) >= self.max_connections:
+            return None, self._refuse("capacity")
+        connection = Connection(case_id=case_id, inbox=inbox)
+        self._live.add(connection)
+        self.admitted += 1
+        CHAT_ACTIVE_WEBSOCKETS.inc()
+        return connection, None
+
+    def _refuse(self, reason: str) -> CloseRequest:
+        self.closed[reason] = self.closed.get(reason, 0) + 1
+        CHAT_WEBSOCKETS_CLOSED.inc(reason=reason)
+        return CloseRequest(reason)
+
+    def release(self, connection: Connection) -> None:
+        if connection in self._live:
+            self._live.discard(connection)
+            reason = connection.closing or "client"
+            self.closed[reason] = self.closed.get(reason, 0) + 1
+            CHAT_WEBSOCKETS_CLOSED.inc(reason=reason)
+            CHAT_ACTIVE_WEBSOCKETS.dec()
+
+    def touch(self, connection: Connection) -> None:
+        connection.last_active = time.monotonic()
+
+    def request_close(self, connection: Connection, reason: str) -> None:
+        if connection.closing is None:
+            connection.closing = reason
+            connection.inbox.put_nowait(CloseRequest(reason))
+
+    def sweep(self) -> None:
+        """Asks idle and over-age sockets to close."""
+        now = time.monotonic()
+        for connection in list(self._live):
+            if connection.closing is not None:
+                continue
+            if self.max_duration and now - connection.opened_at > self.max_duration:
+                self.request_close(connection, "max_duration")
+            elif self.idle_timeout and not connection.busy and now - connection.last_active > self.idle_timeout:
+                self.request_close(connection, "idle")
+
+    async def run(self) -> None:
+        """Background task started from the app lifespan: the timeout sweeps."""
+        limits = [limit for limit in (self.idle_timeout, self.max_duration) if limit]
+        interval = min(30.0, max(1.0, min(limits) / 10)) if limits else 30.0
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep()
+
+    async def drain(self, timeout: Optional[float] = None) -> int:
+        """
+        Stops admitting, asks every socket to close after its current turn and waits up to
+        `timeout` seconds (WS_DRAIN_SECONDS by default) for them. Returns how many were still open.
+        """
+        self.draining = True
+        for connection in list(self._live):
+            self.request_close(connection, "draining")
+        deadline = time.monotonic() + (self.drain_seconds if timeout is None else timeout)
+        while self._live and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self._live:
+            logger.warning("Drain timed out with %d chat websocket(s) still open", len(self._live))
+        return len(self._live)
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        live = list(self._live)
+        return {
+            "active": len(live),
+            "busy": sum(1 for connection in live if connection.busy),
+            "closing": sum(1 for connection in live if connection.closing is not None),
+            "max_connections": self.max_connections,
+            "draining": self.draining,
+            "oldest_seconds": round(max((now - connection.opened_at for connection in live), default=0.0), 1),
+            "longest_idle_seconds": round(max((now - connection.last_active for connection in live), default=0.0), 1),
+            "admitted_total": self.admitted,
+            "closed_total": dict(self.closed),
+        }
+
+
+def install_drain_on_sigterm(manager: "ConnectionManager") -> None:
+    """
+    Makes SIGTERM drain the chat sockets before the server's own SIGTERM handling runs.
+    Call from the app lifespan (the server has installed its handlers by then). Does nothing
+    outside the main thread, e.g. under a test client.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        previous = signal.getsignal(signal.SIGTERM)
+    except ValueError:
+        return
+
+    tasks: Set[asyncio.Task] = set()
+
+    def hand_over(signum: int, frame) -> None:
+        if callable(previous):
+            previous(signum, frame)
+        else:
+            signal.signal(signum, previous)
+            os.kill(os.getpid(), signum)
+
+    async def drain_then_hand_over(signum: int, frame) -> None:
+        await manager.drain()
+        hand_over(signum, frame)
+
+    def start_drain(signum: int, frame) -> None:
+        task = loop.create_task(drain_then_hand_over(signum, frame))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    def handler(signum: int, frame) -> None:
+        # a second SIGTERM while draining stops waiting for the sockets
+        loop.call_soon_threadsafe(hand_over if manager.draining else start_drain, signum, frame)
+
+    try:
+        signal.signal(signal.SIGTERM, handler)
+    except ValueError:
+        pass  # not the main thread
+
+
+_manager: Optional[ConnectionManager] = None
+
+
+def get_connection_manager() -> ConnectionManager:
+    global _manager
+    if _manager is None:
+        _manager = ConnectionManager()
+    return _manager
@@ -0,0 +1,148 @@
+"""
+Wire format of the chat websocket.
+
+The protocol is negotiated with the standard websocket subprotocol header, so existing clients
+that offer none keep getting exactly what they got before:
+    (none)                 -> version 1: JSON text frames with full key names, as sent by send_json
+    caseprep.v2.json       -> version 2, JSON text frames
+    caseprep.v2.msgpack    -> version 2, MessagePack binary frames (only offered when msgpack is installed)
+A browser asks with `new WebSocket(url, ["caseprep.v2.msgpack", "caseprep.v2.json"])` and reads
+the chosen one from ws.protocol; the first protocol in the client's list that the server supports wins.
+
+Version 2 frames:
+  * use one- or two-letter keys (KEYS) and type codes (TYPES), and are encoded with orjson when
+    it is installed
+  * replace the response id with a small per-connection integer ("r"). The session id sent
+    once in the opening session frame is the only handle a client needs, e.g. to resume
+  * open with a session frame on every connection, carrying the protocol version and the heartbeat
+    interval; {"type": "ping"} from the client is answered with a pong frame straight away, even
+    while a turn is running, so clients can tell a dead connection from a slow reply
+Client-to-server frames are the same in both versions (plain text, or the JSON frames described
+in services/interview.py); a msgpack client may also send those JSON objects as msgpack maps.
+
+permessage-deflate is negotiated by uvicorn (--ws-per-message-deflate, on by default with the
+websockets implementation) whenever the client offers it; it applies to either version.
+"""
+import asyncio
+import json
+import os
+from typing import Any, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from backend.services.metrics import CHAT_FRAME_BYTES
+
+try:
+    import orjson  # optional: faster JSON for protocol version 2
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack  # optional: enables the caseprep.v2.msgpack subprotocol
+except ImportError:
+    msgpack = None
+
+WS_HEARTBEAT_SECONDS = float(os.getenv("WS_HEARTBEAT_SECONDS", "25"))
+
+SUBPROTOCOL_JSON = "caseprep.v2.json"
+SUBPROTOCOL_MSGPACK = "caseprep.v2.msgpack"
+
+KEYS = {
+    "type": "t", "delta": "d", "ai_message": "m", "response_id": "r", "error": "e",
+    "session_id": "s", "resumed": "rs", "last_ai_message": "lm", "protocol": "v", "heartbeat": "hb",
+    "phase": "p", "question_index": "q", "question_count": "n", "analysis_job_id": "j",
+    "scope": "sc", "retry_after": "ra", "dropped": "dr", "cached": "c", "reason": "rn", "resume": "ru",
+    "code": "cd", "retryable": "rt", "precomputed": "pc", "hint": "h", "hint_count": "hc",
+}
+TYPES = {
+    "delta": "d", "done": "f", "error": "e", "session": "s", "phase": "p", "throttled": "t", "pong": "o", "closing": "x",
+}
+
+
+def supported_subprotocols() -> tuple:
+    return (SUBPROTOCOL_MSGPACK, SUBPROTOCOL_JSON) if msgpack is not None else (SUBPROTOCOL_JSON,)
+
+
+def choose_subprotocol(websocket: WebSocket) -> Optional[str]:
+    """The first subprotocol the client offered that the server supports, or None for version 1."""
+    offered = websocket.headers.get("sec-websocket-protocol", "")
+    supported = supported_subprotocols()
+    for name in (part.strip() for part in offered.split(",")):
+        if name in supported:
+            return name
+    return None
+
+
+def _dumps(frame: Dict[str, Any]) -> str:
+    if orjson is not None:
+        return orjson.dumps(frame).decode("utf-8")
+    return json.dumps(frame, separators=(",", ":"), ensure_ascii=False)
+
+
+class FrameProtocol:
+    """One per websocket: encodes outgoing frames for the negotiated version and decodes incoming ones."""
+
+    def __init__(self, websocket: WebSocket, subprotocol: Optional[str] = None):
+        self.websocket = websocket
+        self.subprotocol = subprotocol
+        self.version = 1 if subprotocol is None else 2
+        self.binary = subprotocol == SUBPROTOCOL_MSGPACK
+        self._handles: Dict[str, int] = {}
+        # the reader task answers pings while the chat loop may be streaming a reply
+        self._send_lock = asyncio.Lock()
+
+    def handle(self, response_id: Optional[str]) -> Optional[int]:
+        if response_id is None:
+            return None
+        handle = self._handles.get(response_id)
+        if handle is None:
+            handle = self._handles[response_id] = len(self._handles)
+        return handle
+
+    def compact(self, frame: Dict[str, Any]) -> Dict[str, Any]:
+        """The version 2 form of a version 1 frame."""
+        kind = frame.get("type")
+        if kind is None:  # version 1 whole-reply and error frames carry no type
+            kind = "error" if "error" in frame else "done"
+        out: Dict[str, Any] = {"t": TYPES.get(kind, kind)}
+        for key, value in frame.items():
+            if key == "type":
+                continue
+            if key == "response_id":
+                value = self.handle(value)
+            out[KEYS.get(key, key)] = value
+        return out
+
+    def encode(self, frame: Dict[str, Any]):
+        if self.version == 1:
+            return json.dumps(frame, separators=(",", ":"), ensure_ascii=False)  # byte-for-byte what send_json sent
+        frame = self.compact(frame)
+        return msgpack.packb(frame) if self.binary else _dumps(frame)
+
+    async def send(self, frame: Dict[str, Any]) -> None:
+        data = self.encode(frame)
+        message = {"type": "websocket.send", "bytes": data} if self.binary else {"type": "websocket.send", "text": data}
+        async with self._send_lock:
+            await self.websocket.send(message)
+        CHAT_FRAME_BYTES.inc(len(data) if self.binary else len(data.encode("utf-8")), protocol=str(self.version))
+
+    async def receive(self) -> str:
+        """The next client frame as text (raises WebSocketDisconnect like receive_text)."""
+        if not self.binary:
+            return await self.websocket.receive_text()
+        message = await self.websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+        if message.get("text") is not None:
+            return message["text"]
+        return json.dumps(msgpack.unpackb(message["bytes"]))
+
+    def is_ping(self, raw: str) -> bool:
+        """Version 2 only: a {"type": "ping"} heartbeat from the client."""
+        if self.version == 1 or not raw.startswith("{") or '"ping"' not in raw:
+            return False
+        try:
+            frame = json.loads(raw)
+        except ValueError:
+            return False
+        return isinstance(frame, dict) and frame.get("type") == "ping"
@@ -0,0 +1,173 @@
+"""
+Cache for the initial greeting produced by /chat/initiate_chat.
+
+The greeting input (case context + initial instructions with the case name filled in) is the same
+for every user of a case, so the reply is cached under a hash of everything that shapes it: case
+content, prompt text, input, model and temperature. Changing any of those changes the key.
+
+The cached response_id stays a valid conversation anchor: every session chains its follow-ups off
+it with previous_response_id, and the Responses API allows any number of branches from one stored
+response. Stored responses are only kept upstream for a limited time (30 days by default), which is
+why GREETING_CACHE_TTL_SECONDS defaults to a day and must stay well below that.
+
+Tiers: an in-memory LRU, plus JSON files under GREETING_CACHE_DIR when it is set (shared by every
+worker on the machine and survives restarts), or else the shared state when that is multi-process
+(services/shared_state.py). Concurrent misses on the same key share one LLM call.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from backend.services.shared_state import SharedState, get_shared_state
+
+GREETING_CACHE_MAX_ENTRIES = int(os.getenv("GREETING_CACHE_MAX_ENTRIES", "5000"))
+GREETING_CACHE_TTL_SECONDS = float(os.getenv("GREETING_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+GREETING_CACHE_DIR = os.getenv("GREETING_CACHE_DIR")
+GREETING_CACHE_PREWARM = os.getenv("GREETING_CACHE_PREWARM", "0") in ("1", "true")
+GREETING_PREWARM_CONCURRENCY = int(os.getenv("GREETING_PREWARM_CONCURRENCY", "4"))
+
+GREETING_NAMESPACE = "greetings"
+
+
+def greeting_key(case_content_hash: str, instructions: str, case_context: str, model: str, temperature: float) -> str:
+    material = json.dumps([case_content_hash, instructions, case_context, model, temperature], ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class GreetingCache:
+    def __init__(
+        self,
+        max_entries: int = GREETING_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = GREETING_CACHE_TTL_SECONDS,
+        directory: Optional[str] = GREETING_CACHE_DIR,
+        state: Optional[SharedState] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.directory = Path(directory) if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.state = state if self.directory is None else None
+        # key -> (stored_at, {"response_id", "ai_message"})
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, str]]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, stored_at: float) -> bool:
+        return time.time() - stored_at < self.ttl_seconds
+
+    def _remember(self, key: str, stored_at: float, value: Dict[str, str]) -> None:
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[Tuple[float, Dict[str, str]]]:
+        path = self.directory / f"{key}.json"
+        try:
+            record = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not self._fresh(record["stored_at"]):
+            path.unlink(missing_ok=True)
+            return None
+        return record["stored_at"], record["value"]
+
+    def _write_disk(self, key: str, stored_at: float, value: Dict[str, str]) -> None:
+        path = self.directory / f"{key}.json"
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"stored_at": stored_at, "value": value}), encoding="utf-8")
+        os.replace(tmp, path)  # atomic, so other workers never read half a file
+
+    def _read_shared(self, key: str) -> Optional[Tuple[float, Dict[str, str]]]:
+        data = self.state.get(GREETING_NAMESPACE, key)
+        if data is None:
+            return None  # the shared state drops it once the TTL has passed
+        record = json.loads(data)
+        return record["stored_at"], record["value"]
+
+    def _write_shared(self, key: str, stored_at: float, value: Dict[str, str]) -> None:
+        self.state.set(GREETING_NAMESPACE, key, json.dumps({"stored_at": stored_at, "value": value}), self.ttl_seconds)
+
+    async def lookup(self, key: str) -> Optional[Dict[str, str]]:
+        entry = self._entries.get(key)
+        if entry is not None and self._fresh(entry[0]):
+            self._entries.move_to_end(key)
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]
+        if self.directory is not None:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                self._remember(key, *entry)
+                return entry[1]
+        if self.state is not None:
+            entry = await self.state.run(self._read_shared, key)
+            if entry is not None:
+                self._remember(key, *entry)
+                return entry[1]
+        return None
+
+    async def get_or_create(self, key: str, create: Callable[[], Awaitable[Dict[str, str]]]) -> Dict[str, str]:
+        """
+        Returns the cached {"response_id", "ai_message"} or calls create() once for all concurrent
+        callers of the same key. Failed greetings (response_id None) are returned but not cached.
+        """
+        while True:
+            cached = await self.lookup(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            pending = self._in_flight.get(key)
+            if pending is None:
+                break
+            try:
+                value = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if pending.cancelled():
+                    continue  # the caller doing the work went away; take over
+                raise
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await create()
+            if value.get("response_id") is not None:
+                stored_at = time.time()
+                self._remember(key, stored_at, value)
+                if self.directory is not None:
+                    await asyncio.to_thread(self._write_disk, key, stored_at, value)
+                if self.state is not None:
+                    await self.state.run(self._write_shared, key, stored_at, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # waiters get the exception; don't also log "exception never retrieved" if there were none
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+
+_cache: Optional[GreetingCache] = None
+
+
+def get_greeting_cache() -> GreetingCache:
+    global _cache
+    if _cache is None:
+        state = get_shared_state()
+        _cache = GreetingCache(state=state if state.shared else None)
+    return _cache
@@ -0,0 +1,246 @@
+"""
+Interview phases on the chat websocket, driving the gen_ai_response_* functions in llm_service.
+
+The flow the llm_service docstrings describe (intro -> question -> answer -> analysis, repeated per
+question) runs on the one websocket instead of a new connection per phase. The client moves it on
+with control frames, sent as JSON text frames:
+    {"type": "start"}               intro -> explain question 0
+    {"type": "next"}                answer/analysis -> explain the next question (or "complete")
+    {"type": "done"}                answer -> analysis of the current question
+    {"type": "hint"}                answer -> the next hint of the current question's ladder
+    {"type": "end"}                 any phase -> "ended", the server closes the socket
+    {"type": "message", "text": s}  same as sending s as a plain text frame
+Plain text frames are chat turns in whatever phase the session is in: follow-ups in intro, answer
+coaching in answer, follow-ups on the feedback in analysis/complete.
+
+Chain layout: each question's explanation branches off the case anchor (the greeting response, the
+first entry of the session's chain), and that question's answers and analysis chain off the
+explanation. An explanation therefore only depends on the anchor and the question, which is what
+lets the next one be fetched speculatively while the user is still answering the current one
+(INTERVIEW_PREFETCH, on by default). It also keeps each question's context from growing with the
+whole interview.
+
+When the precomputed artifact (services/question_precompute.py) has a current explanation for a
+question, it is served from there with no LLM call (INTERVIEW_PRECOMPUTED, on by default): the
+question branches off the anchor as before and the explanation goes along, unchained, with the
+first answer. Hints come from the artifact's ladder, or the author's Question.hints without one,
+and are always local; replies served this way carry "precomputed": true.
+"""
+import asyncio
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+from backend.database.models import CaseInterview, Question
+from backend.services.llm_service import gen_ai_response_analysis, gen_ai_response_answer, gen_ai_response_question
+from backend.services.prompt_assembly import AssembledPrompt
+from backend.services.question_precompute import PrecomputedQuestions, get_precomputed_questions
+from backend.services.session_store import ChatSession
+
+INTERVIEW_PREFETCH = os.getenv("INTERVIEW_PREFETCH", "1") in ("1", "true")
+INTERVIEW_PRECOMPUTED = os.getenv("INTERVIEW_PRECOMPUTED", "1") in ("1", "true")
+
+CONTROL_TYPES = ("start", "next", "done", "hint", "end")
+
+# Phases stored on ChatSession.phase
+INTRO = "intro"
+ANSWER = "answer"
+ANALYSIS = "analysis"
+COMPLETE = "complete"
+ENDED = "ended"
+
+
+class InterviewError(Exception):
+    """A control frame that does not fit the current phase; reported to the client, the socket stays open."""
+
+
+def parse_frame(raw: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Returns (control, None) for a control frame and (None, text) for a chat message.
+    Anything that is not a JSON object with a known "type" is a chat message as-is.
+    """
+    if not raw.startswith("{"):
+        return None, raw
+    try:
+        frame = json.loads(raw)
+    except ValueError:
+        return None, raw
+    if not isinstance(frame, dict):
+        return None, raw
+    kind = frame.get("type")
+    if kind in CONTROL_TYPES:
+        return kind, None
+    if kind == "message" and isinstance(frame.get("text"), str):
+        return None, frame["text"]
+    return None, raw
+
+
+class InterviewOrchestrator:
+    """One per chat websocket. Runs the LLM call for each phase change and keeps session.phase current."""
+
+    def __init__(
+        self,
+        session: ChatSession,
+        case: CaseInterview,
+        prompts: Dict[str, AssembledPrompt],  # phase -> instructions with the case prefix (prompt_assembly.py)
+        prefetch: bool = INTERVIEW_PREFETCH,
+        precomputed: Optional[PrecomputedQuestions] = None,
+    ):
+        self.session = session
+        self.case = case
+        self.prompts = prompts
+        self.prefetch_enabled = prefetch
+        if precomputed is None and INTERVIEW_PRECOMPUTED:
+            precomputed = get_precomputed_questions()
+        self.precomputed = precomputed
+        # question index -> task producing that question's explanation
+        self._explanations: Dict[int, asyncio.Task] = {}
+
+    @property
+    def questions(self):
+        return self.case.description.questions
+
+    @property
+    def question(self) -> Optional[Question]:
+        index = self.session.question_index
+        return self.questions[index] if 0 <= index < len(self.questions) else None
+
+    @property
+    def anchor(self) -> Optional[str]:
+        return self.session.response_ids[0] if self.session.response_ids else None
+
+    def phase_frame(self) -> Dict:
+        return {
+            "type": "phase",
+            "phase": self.session.phase,
+            "question_index": self.session.question_index,
+            "question_count": len(self.questions),
+        }
+
+    def _explanation_task(self, index: int) -> asyncio.Task:
+        task = self._explanations.get(index)
+        if task is None or (task.done() and (
+            task.cancelled() or task.exception() is not None or task.result().get("response_id") is None
+        )):  # nothing fetched yet, or the last attempt failed: (re)fetch
+            question = self.questions[index]
+            task = asyncio.create_task(gen_ai_response_question(
+                response_id=self.anchor,
+                question=question.text,
+                answer=question.reveal_answer,
+                instructions=self.prompts["question"].instructions,
+                prompt_cache_key=self.prompts["question"].cache_key,
+            ))
+            self._explanations[index] = task
+        return task
+
+    def _precomputed_explanation(self, index: int) -> Optional[str]:
+        return self.precomputed.explanation(self.case, index) if self.precomputed is not None else None
+
+    def prefetch(self, index: int) -> None:
+        """Starts explaining question `index` in the background, if prefetching is on, it exists and is not precomputed."""
+        if self.prefetch_enabled and self.anchor and 0 <= index < len(self.questions):
+            if self._precomputed_explanation(index) is None:
+                self._explanation_task(index)
+
+    def is_local(self, kind: str) -> bool:
+        """Whether control(kind) is answered without an LLM call."""
+        if kind == "hint":
+            return True
+        if kind in ("start", "next"):
+            index = 0 if kind == "start" else self.session.question_index + 1
+            return index >= len(self.questions) or self._precomputed_explanation(index) is not None
+        return False
+
+    async def control(self, kind: str) -> Optional[Dict[str, str]]:
+        """
+        Applies a control frame. Returns the {"response_id", "ai_message"} reply for the new phase,
+        or None when the phase change needs no LLM call ("end", or "next" past the last question).
+        Raises InterviewError if the frame does not fit the current phase.
+        """
+        phase = self.session.phase
+        if kind == "end":
+            self.session.phase = ENDED
+            return None
+        if kind == "start":
+            if phase != INTRO:
+                raise InterviewError("The interview has already started.")
+            return await self._explain(0)
+        if kind == "next":
+            if phase not in (ANSWER, ANALYSIS):
+                raise InterviewError("There is no current question to move on from.")
+            return await self._explain(self.session.question_index + 1)
+        if kind == "done":
+            if phase != ANSWER:
+                raise InterviewError("There is no answer in progress to analyse.")
+            return await self._analyse()
+        if kind == "hint":
+            if phase != ANSWER:
+                raise InterviewError("Hints are only available while answering a question.")
+            return self._hint()
+        raise InterviewError(f"Unknown control frame {kind!r}.")
+
+    async def answer(self, message: str) -> Dict[str, str]:
+        """A chat message in the answer phase: coaching on the user's answer to the current question."""
+        question = self.question
+        return await gen_ai_response_answer(
+            response_id=self.session.current_response_id,
+            question=question.text,
+            answer=question.reveal_answer,
+            curr_message=message,
+            instructions=self.prompts["answer"].instructions,
+            history=self.session.unchained or None,
+            prompt_cache_key=self.prompts["answer"].cache_key,
+        )
+
+    async def _explain(self, index: int) -> Optional[Dict[str, str]]:
+        if index >= len(self.questions):
+            self.session.phase = COMPLETE
+            return None
+        if not self.anchor:
+            raise InterviewError("Cannot start the question: AI context (response_id) is missing.")
+        explanation = self._precomputed_explanation(index)
+        if explanation is not None:
+            result = {"response_id": self.anchor, "ai_message": explanation, "precomputed": True}
+        else:
+            result = await asyncio.shield(self._explanation_task(index))
+        if result.get("response_id") is not None:
+            self.session.question_index = index
+            self.session.phase = ANSWER
+            self.session.hints_given = 0
+            self.prefetch(index + 1)
+        return result
+
+    def _hint(self) -> Dict:
+        index = self.session.question_index
+        ladder = self.precomputed.hint_ladder(self.case, index) if self.precomputed is not None else None
+        ladder = ladder or self.question.hints or []
+        if self.session.hints_given >= len(ladder):
+            raise InterviewError("There are no more hints for this question.")
+        hint = ladder[self.session.hints_given]
+        self.session.hints_given += 1
+        return {
+            "response_id": self.session.current_response_id,
+            "ai_message": hint,
+            "precomputed": True,
+            "hint": self.session.hints_given,
+            "hint_count": len(ladder),
+        }
+
+    async def _analyse(self) -> Dict[str, str]:
+        question = self.question
+        result = await gen_ai_response_analysis(
+            response_id=self.session.current_response_id,
+            question=question.text,
+            answer=question.reveal_answer,
+            instructions=self.prompts["analysis"].instructions,
+            history=self.session.unchained or None,
+            prompt_cache_key=self.prompts["analysis"].cache_key,
+        )
+        if result.get("response_id") is not None:
+            self.session.phase = ANALYSIS
+        return result
+
+    def close(self) -> None:
+        """Cancels prefetches nobody will use."""
+        for task in self._explanations.values():
+            task.cancel()
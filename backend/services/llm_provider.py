@@ -0,0 +1,315 @@
+"""
+Where llm_service sends its Responses API calls.
+
+LLM_PROVIDER picks the backend:
+    openai (default) -> the real API through one pooled AsyncOpenAI client
+    stub             -> StubProvider, a deterministic in-process stand-in that needs no network or key
+
+Both expose the same two calls, shaped like client.responses.create: create(**kwargs) returns an
+object with .id, .output_text and .usage, and stream(**kwargs) returns an async-iterable of events
+with .type (response.created / response.output_text.delta / response.completed / response.failed)
+plus a close() method. llm_service keeps the concurrency limit, deadlines and metrics on top.
+
+The stub's latency is drawn from a configurable distribution (see LatencyDistribution) with a seeded
+RNG, its replies depend only on the input, and it can inject API errors, mid-stream failures and
+whole outages (StubProvider.outage, used by backend/benchmarks/outage.py).
+It mimics the provider's prompt cache for the instructions (the stable case prefix, see
+prompt_assembly.py), so cached_tokens in its usage shows whether prefixes are being reused:
+    LLM_STUB_LATENCY_MS, LLM_STUB_LATENCY_DIST (fixed | uniform | lognormal), LLM_STUB_JITTER_MS,
+    LLM_STUB_TAIL_PROBABILITY, LLM_STUB_TAIL_MS, LLM_STUB_TOKEN_MS, LLM_STUB_ERROR_RATE,
+    LLM_STUB_STREAM_FAILURE_RATE, LLM_STUB_SEED
+"""
+import asyncio
+import hashlib
+import math
+import os
+import random
+import time
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+import httpx
+from dotenv import load_dotenv
+from openai import APIError, AsyncOpenAI, InternalServerError
+
+# Load environment variables from .env file explicitly
+# Assumes .env file is in the 'backend' directory, one level up from 'services'
+load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / '.env')
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))  # hard deadline per call, queueing included
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "32"))
+
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "400"))
+LLM_STUB_LATENCY_DIST = os.getenv("LLM_STUB_LATENCY_DIST", "lognormal")
+LLM_STUB_JITTER_MS = float(os.getenv("LLM_STUB_JITTER_MS", "100"))
+LLM_STUB_TAIL_PROBABILITY = float(os.getenv("LLM_STUB_TAIL_PROBABILITY", "0"))
+LLM_STUB_TAIL_MS = float(os.getenv("LLM_STUB_TAIL_MS", "5000"))
+LLM_STUB_TOKEN_MS = float(os.getenv("LLM_STUB_TOKEN_MS", "15"))
+LLM_STUB_ERROR_RATE = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+LLM_STUB_STREAM_FAILURE_RATE = float(os.getenv("LLM_STUB_STREAM_FAILURE_RATE", "0"))
+LLM_STUB_SEED = int(os.getenv("LLM_STUB_SEED", "0"))
+
+
+class LLMProvider:
+    async def create(self, **kwargs) -> Any:
+        raise NotImplementedError
+
+    async def stream(self, **kwargs) -> Any:
+        """Returns an async-iterable of response events with an async close()."""
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        pass
+
+
+class OpenAIProvider(LLMProvider):
+    """The real Responses API. The client (and the key check) is created on first use, not at import."""
+
+    def __init__(self):
+        self._client: Optional[AsyncOpenAI] = None
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise ValueError("OPENAI_API_KEY not found in environment variables. Please set it in your .env file.")
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+                timeout=LLM_TIMEOUT_SECONDS,
+            )
+            self._client = AsyncOpenAI(api_key=api_key, http_client=http_client, timeout=LLM_TIMEOUT_SECONDS)
+        return self._client
+
+    @staticmethod
+    def _request(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        # prompt_cache_key is newer than the SDK's typed parameters, so it goes in the request body as is
+        prompt_cache_key = kwargs.pop("prompt_cache_key", None)
+        if prompt_cache_key is not None:
+            kwargs["extra_body"] = {**kwargs.get("extra_body", {}), "prompt_cache_key": prompt_cache_key}
+        return kwargs
+
+    async def create(self, **kwargs) -> Any:
+        return await self.client.responses.create(**self._request(kwargs))
+
+    async def stream(self, **kwargs) -> Any:
+        return await self.client.responses.create(stream=True, **self._request(kwargs))
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+
+
+class LatencyDistribution:
+    """
+    Samples a delay in seconds.
+        fixed      -> median_ms
+        uniform    -> median_ms +/- jitter_ms
+        lognormal  -> median median_ms, with jitter_ms as roughly one standard deviation (sigma <= 1)
+    With probability tail_probability the sample is replaced by tail_ms +/- 10%, which is how
+    benchmarks model the occasional very slow upstream response.
+    """
+
+    def __init__(
+        self,
+        kind: str = LLM_STUB_LATENCY_DIST,
+        median_ms: float = LLM_STUB_LATENCY_MS,
+        jitter_ms: float = LLM_STUB_JITTER_MS,
+        tail_probability: float = LLM_STUB_TAIL_PROBABILITY,
+        tail_ms: float = LLM_STUB_TAIL_MS,
+        rng: Optional[random.Random] = None,
+    ):
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution {kind!r}")
+        self.kind = kind
+        self.median_ms = median_ms
+        self.jitter_ms = jitter_ms
+        self.tail_probability = tail_probability
+        self.tail_ms = tail_ms
+        self.rng = rng or random.Random(LLM_STUB_SEED)
+
+    def sample(self) -> float:
+        if self.tail_probability and self.rng.random() < self.tail_probability:
+            return max(0.0, self.tail_ms * self.rng.uniform(0.9, 1.1)) / 1000
+        if self.kind == "fixed" or self.median_ms <= 0:
+            ms = self.median_ms
+        elif self.kind == "uniform":
+            ms = self.median_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+        else:
+            # jitter ~ one standard deviation while it is small next to the median; capped so a large
+            # jitter cannot turn a 5 ms median into multi-second outliers (use the tail for that)
+            sigma = min(1.0, self.jitter_ms / self.median_ms)
+            ms = self.median_ms * math.exp(self.rng.gauss(0.0, sigma))
+        return max(0.0, ms) / 1000
+
+
+_STUB_REPLIES = (
+    "Thanks, that is a good start. Let's structure this: think about the customer, the "
+    "consultants, the retailers and the economics. Which of these would you look at first?",
+    "Good question. For this case you can assume the market is stable and the client has no major "
+    "competitor moves planned. What would you like to explore next?",
+    "That makes sense. Before we go further, could you summarise your hypothesis in one sentence "
+    "and tell me which data you would need to test it?",
+)
+
+
+def _stub_reply(kwargs: Dict[str, Any]) -> str:
+    material = f"{kwargs.get('instructions')}|{kwargs.get('input')}".encode("utf-8")
+    return _STUB_REPLIES[int(hashlib.sha256(material).hexdigest(), 16) % len(_STUB_REPLIES)]
+
+
+def _stub_response(text: str, model: str, input_tokens: int, cached_tokens: int = 0) -> SimpleNamespace:
+    output_tokens = len(text.split())
+    usage = SimpleNamespace(
+        input_tokens=input_tokens,
+        input_tokens_details=SimpleNamespace(cached_tokens=cached_tokens),
+        output_tokens=output_tokens,
+        total_tokens=input_tokens + output_tokens,
+    )
+    return SimpleNamespace(id=f"resp_stub_{uuid.uuid4().hex}", model=model, output_text=text, usage=usage)
+
+
+def _stub_error(message: str) -> APIError:
+    """A 503 from the API, which llm_resilience treats as retryable and an upstream failure."""
+    request = httpx.Request("POST", "http://stub.invalid/v1/responses")
+    return InternalServerError(message, response=httpx.Response(503, request=request), body=None)
+
+
+class _StubStream:
+    def __init__(self, provider: "StubProvider", kwargs: Dict[str, Any]):
+        self._provider = provider
+        self._kwargs = kwargs
+        self._closed = False
+
+    def __aiter__(self) -> AsyncIterator[SimpleNamespace]:
+        return self._events()
+
+    async def _events(self) -> AsyncIterator[SimpleNamespace]:
+        provider = self._provider
+        text = _stub_reply(self._kwargs)
+        response = _stub_response(
+            text, self._kwargs.get("model", ""), provider.count_input_tokens(self._kwargs), provider.cached_tokens(self._kwargs)
+        )
+        yield SimpleNamespace(type="response.created", response=response)
+        tokens = text.split(" ")
+        fail_at = len(tokens) // 2 if provider.rng.random() < provider.stream_failure_rate else None
+        for index, token in enumerate(tokens):
+            if self._closed:
+                return
+            if index == fail_at:
+                yield SimpleNamespace(type="response.failed", response=response)
+                return
+            if index and provider.token_ms:
+                await asyncio.sleep(provider.token_ms / 1000)
+            yield SimpleNamespace(type="response.output_text.delta", delta=token if index == 0 else f" {token}")
+        yield SimpleNamespace(type="response.completed", response=response)
+
+    async def close(self) -> None:
+        self._closed = True
+
+
+class StubProvider(LLMProvider):
+    """
+    Offline stand-in for load tests and fault injection. Replies are picked from a few canned
+    texts by a hash of the instructions and input, so the same request always gets the same text.
+    """
+
+    def __init__(
+        self,
+        latency: Optional[LatencyDistribution] = None,
+        token_ms: float = LLM_STUB_TOKEN_MS,
+        error_rate: float = LLM_STUB_ERROR_RATE,
+        stream_failure_rate: float = LLM_STUB_STREAM_FAILURE_RATE,
+        seed: int = LLM_STUB_SEED,
+    ):
+        self.rng = random.Random(seed)
+        self.latency = latency or LatencyDistribution(rng=self.rng)
+        self.token_ms = token_ms
+        self.error_rate = error_rate
+        self.stream_failure_rate = stream_failure_rate
+        self.requests_served = 0
+        self._seen_instructions: Set[str] = set()
+        self._outage_until = 0.0
+        self._outage_mode = "error"
+
+    @staticmethod
+    def count_input_tokens(kwargs: Dict[str, Any]) -> int:
+        # ~4 characters per token is close enough for load numbers
+        return max(1, (len(str(kwargs.get("instructions") or "")) + len(str(kwargs.get("input") or ""))) // 4)
+
+    def cached_tokens(self, kwargs: Dict[str, Any]) -> int:
+        """
+        Like the real cache, but for the instructions only (the stub keeps no chains, so the real
+        1024-token minimum, which counts the chained conversation too, is not applied): from the
+        second time the same instructions are sent, their tokens count as cached in 128-token steps.
+        """
+        instructions = str(kwargs.get("instructions") or "")
+        tokens = len(instructions) // 4
+        digest = hashlib.sha256(instructions.encode("utf-8")).hexdigest()
+        seen = digest in self._seen_instructions
+        self._seen_instructions.add(digest)
+        return tokens // 128 * 128 if seen else 0
+
+    def outage(self, seconds: float, mode: str = "error") -> None:
+        """
+        For the next `seconds`, every request fails with a 503 (mode "error") or never answers
+        (mode "hang", until the caller's deadline cancels it).
+        """
+        if mode not in ("error", "hang"):
+            raise ValueError(f"Unknown outage mode {mode!r} (expected 'error' or 'hang')")
+        self._outage_until = time.monotonic() + seconds
+        self._outage_mode = mode
+
+    async def _first_byte(self) -> None:
+        self.requests_served += 1
+        if time.monotonic() < self._outage_until:
+            if self._outage_mode == "hang":
+                await asyncio.Event().wait()
+            await asyncio.sleep(self.latency.sample())
+            raise _stub_error("Injected stub outage")
+        await asyncio.sleep(self.latency.sample())
+        if self.error_rate and self.rng.random() < self.error_rate:
+            raise _stub_error("Injected stub error")
+
+    async def create(self, **kwargs) -> Any:
+        await self._first_byte()
+        text = _stub_reply(kwargs)
+        if self.token_ms:
+            await asyncio.sleep(len(text.split(" ")) * self.token_ms / 1000)
+        return _stub_response(text, kwargs.get("model", ""), self.count_input_tokens(kwargs), self.cached_tokens(kwargs))
+
+    async def stream(self, **kwargs) -> Any:
+        await self._first_byte()
+        return _StubStream(self, kwargs)
+
+
+_provider: Optional[LLMProvider] = None
+
+
+def make_provider(name: str = LLM_PROVIDER) -> LLMProvider:
+    if name == "openai":
+        return OpenAIProvider()
+    if name == "stub":
+        return StubProvider()
+    raise ValueError(f"Unknown LLM_PROVIDER {name!r} (expected 'openai' or 'stub')")
+
+
+def get_provider() -> LLMProvider:
+    global _provider
+    if _provider is None:
+        _provider = make_provider()
+    return _provider
+
+
+def set_provider(provider: Optional[LLMProvider]) -> None:
+    """Swaps the process-wide provider (benchmarks and fault-injection runs); None resets to LLM_PROVIDER."""
+    global _provider
+    _provider = provider
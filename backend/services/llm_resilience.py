@@ -0,0 +1,289 @@
+"""
+Resilience for the upstream LLM calls: a circuit breaker, bounded retries and typed errors.
+
+Every llm_service call runs through call() below (hedging, services/llm_routing.py, runs inside
+each attempt):
+  * Retries: an attempt that fails with a retryable error (connection errors and timeouts, HTTP
+    408/409/429/5xx) is retried up to LLM_RETRY_ATTEMPTS attempts in total, after a full-jitter
+    exponential backoff (LLM_RETRY_BASE_MS doubling up to LLM_RETRY_MAX_MS, or the server's
+    Retry-After when longer). Retries never extend the call's deadline: a backoff that would not
+    leave time for another attempt is not taken. LLM_ATTEMPT_TIMEOUT_SECONDS (0 = the whole
+    deadline) caps each attempt, so a hung upstream leaves room for a retry.
+  * Circuit breaker: attempts report to one breaker per process. When at least LLM_BREAKER_MIN_CALLS
+    attempts in the last LLM_BREAKER_WINDOW_SECONDS include LLM_BREAKER_FAILURE_RATIO failures, it
+    opens for LLM_BREAKER_OPEN_SECONDS: calls then fail immediately with LLMUnavailable instead of
+    each waiting out a failing request. After that one probe call is let through (half-open);
+    success closes the breaker, failure reopens it for twice as long (up to LLM_BREAKER_MAX_OPEN_SECONDS).
+    Errors that say nothing about upstream health (4xx other than 408/409/429, bugs, a client
+    hanging up) are not counted.
+  * Typed errors: error_info() turns any failure into {"code", "retryable", "retry_after"}, which
+    llm_service adds to its error results and the chat websocket adds to its error frames:
+        upstream_unavailable  breaker open, nothing was sent; retry after retry_after seconds
+        upstream_timeout      the deadline passed
+        rate_limited          HTTP 429 after the retries
+        upstream_error        5xx / connection errors after the retries
+        interrupted           a streamed reply failed part way
+        rejected              the request itself was refused (4xx); retrying will not help
+        internal              anything else
+
+State transitions are counted in llm_breaker_transitions_total, the state is the llm_breaker_state
+gauge (0 closed, 1 half-open, 2 open), retries are llm_retries_total and fast-fails show up as
+llm_errors_total{reason="circuit_open"}. backend/benchmarks/outage.py injects outages into the stub
+provider and shows turn latency staying bounded while they last.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from openai import APIConnectionError, APIError, APIStatusError
+
+from backend.services.metrics import LLM_BREAKER_STATE, LLM_BREAKER_TRANSITIONS, LLM_RETRIES
+
+LLM_RETRY_ATTEMPTS = int(os.getenv("LLM_RETRY_ATTEMPTS", "3"))
+LLM_RETRY_BASE_MS = float(os.getenv("LLM_RETRY_BASE_MS", "250"))
+LLM_RETRY_MAX_MS = float(os.getenv("LLM_RETRY_MAX_MS", "4000"))
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "0"))
+LLM_BREAKER_ENABLED = os.getenv("LLM_BREAKER_ENABLED", "1") in ("1", "true")
+LLM_BREAKER_WINDOW_SECONDS = float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", "30"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+LLM_BREAKER_FAILURE_RATIO = float(os.getenv("LLM_BREAKER_FAILURE_RATIO", "0.5"))
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "10"))
+LLM_BREAKER_MAX_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_MAX_OPEN_SECONDS", "60"))
+
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+logger = logging.getLogger(__name__)
+
+
+class LLMUnavailable(Exception):
+    """Raised instead of calling upstream while the circuit breaker is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM upstream unavailable, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+def _status(error: BaseException) -> Optional[int]:
+    return error.status_code if isinstance(error, APIStatusError) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, APIConnectionError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS
+    return isinstance(error, APIError)  # e.g. an error event on a stream
+
+
+def counts_as_failure(error: BaseException) -> bool:
+    """Whether the error says the upstream is unhealthy (as opposed to a bad request or a bug here)."""
+    return is_retryable(error)
+
+
+def _retry_after_header(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def error_info(error: BaseException) -> Dict[str, Any]:
+    """{"code", "retryable"} plus "retry_after" (seconds) when the client should wait before retrying."""
+    if isinstance(error, LLMUnavailable):
+        return {"code": "upstream_unavailable", "retryable": True, "retry_after": round(error.retry_after, 2)}
+    if isinstance(error, asyncio.TimeoutError):
+        return {"code": "upstream_timeout", "retryable": True}
+    status = _status(error)
+    if status == 429:
+        info = {"code": "rate_limited", "retryable": True}
+        retry_after = _retry_after_header(error)
+        return {**info, "retry_after": retry_after} if retry_after is not None else info
+    if isinstance(error, APIConnectionError) or status in RETRYABLE_STATUS:
+        return {"code": "upstream_error", "retryable": True}
+    if status is not None:
+        return {"code": "rejected", "retryable": False}
+    if isinstance(error, APIError):
+        return {"code": "upstream_error", "retryable": True}
+    return {"code": "internal", "retryable": False}
+
+
+INTERRUPTED = {"code": "interrupted", "retryable": True}
+
+
+def error_fields(result: Dict[str, Any]) -> Dict[str, Any]:
+    """The typed part ("code", "retryable", "retry_after") of an llm_service error result, for error frames."""
+    return {key: result[key] for key in ("code", "retryable", "retry_after") if key in result}
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        enabled: bool = LLM_BREAKER_ENABLED,
+        window_seconds: float = LLM_BREAKER_WINDOW_SECONDS,
+        min_calls: int = LLM_BREAKER_MIN_CALLS,
+        failure_ratio: float = LLM_BREAKER_FAILURE_RATIO,
+        open_seconds: float = LLM_BREAKER_OPEN_SECONDS,
+        max_open_seconds: float = LLM_BREAKER_MAX_OPEN_SECONDS,
+    ):
+        self.enabled = enabled
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.state = CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = deque()  # (time, failed)
+        self._failures = 0
+        self._opened_for = open_seconds
+        self._open_until = 0.0
+        self._probing = False
+        LLM_BREAKER_STATE.set(_STATE_VALUES[CLOSED])
+
+    def _move(self, state: str) -> None:
+        if state != self.state:
+            self.state = state
+            LLM_BREAKER_STATE.set(_STATE_VALUES[state])
+            LLM_BREAKER_TRANSITIONS.inc(state=state)
+            logger.warning("LLM circuit breaker %s", state)
+
+    def _open(self, seconds: float) -> None:
+        self._opened_for = seconds
+        self._open_until = time.monotonic() + seconds
+        self._outcomes.clear()
+        self._failures = 0
+        self._move(OPEN)
+
+    def before_call(self) -> bool:
+        """Raises LLMUnavailable while open. Returns True if this call is the half-open probe."""
+        if not self.enabled:
+            return False
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now < self._open_until:
+                raise LLMUnavailable(self._open_until - now)
+            self._move(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probing:
+                raise LLMUnavailable(min(1.0, self.open_seconds))
+            self._probing = True
+            return True
+        return False
+
+    def _record(self, failed: bool) -> None:
+        now = time.monotonic()
+        self._outcomes.append((now, failed))
+        self._failures += failed
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._failures -= self._outcomes.popleft()[1]
+
+    def record_success(self, probe: bool = False) -> None:
+        if not self.enabled:
+            return
+        if probe:
+            self._probing = False
+            self._outcomes.clear()
+            self._failures = 0
+            self._opened_for = self.open_seconds
+            self._move(CLOSED)
+        elif self.state == CLOSED:
+            self._record(False)
+
+    def record_failure(self, probe: bool = False) -> None:
+        if not self.enabled:
+            return
+        if probe:
+            self._probing = False
+            self._open(min(self.max_open_seconds, self._opened_for * 2))
+        elif self.state == CLOSED:
+            self._record(True)
+            if len(self._outcomes) >= self.min_calls and self._failures >= self.failure_ratio * len(self._outcomes):
+                self._open(self.open_seconds)
+
+    def record_neutral(self, probe: bool = False) -> None:
+        """The call ended without telling anything about upstream health (cancelled, bad request)."""
+        if probe:
+            self._probing = False
+
+
+class Resilience:
+    def __init__(
+        self,
+        breaker: Optional[CircuitBreaker] = None,
+        attempts: int = LLM_RETRY_ATTEMPTS,
+        base_delay: float = LLM_RETRY_BASE_MS / 1000,
+        max_delay: float = LLM_RETRY_MAX_MS / 1000,
+        attempt_timeout: float = LLM_ATTEMPT_TIMEOUT_SECONDS,
+    ):
+        self.breaker = breaker or CircuitBreaker()
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        delay = random.uniform(0.0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        retry_after = _retry_after_header(error)
+        return max(delay, min(self.max_delay, retry_after)) if retry_after is not None else delay
+
+    async def call(self, kind: str, operation: Callable[[], Awaitable[Any]], timeout: float) -> Any:
+        """
+        Runs operation() under the breaker with retries, all within `timeout` seconds.
+        Raises the last error, asyncio.TimeoutError once the deadline has passed, or LLMUnavailable.
+        """
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            attempt += 1
+            probe = self.breaker.before_call()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.breaker.record_neutral(probe)
+                raise asyncio.TimeoutError()
+            limit = min(remaining, self.attempt_timeout) if self.attempt_timeout > 0 else remaining
+            try:
+                result = await asyncio.wait_for(operation(), timeout=limit)
+            except Exception as e:
+                if counts_as_failure(e):
+                    self.breaker.record_failure(probe)
+                else:
+                    self.breaker.record_neutral(probe)
+                if attempt >= self.attempts or not is_retryable(e) or self.breaker.state != CLOSED:
+                    raise
+                delay = self.backoff(attempt, e)
+                if time.monotonic() + delay >= deadline:
+                    raise  # the retry could not start before the deadline
+                LLM_RETRIES.inc(kind=kind, reason=error_info(e)["code"])
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.record_neutral(probe)
+                raise
+            self.breaker.record_success(probe)
+            return result
+
+
+_resilience: Optional[Resilience] = None
+
+
+def get_resilience() -> Resilience:
+    global _resilience
+    if _resilience is None:
+        _resilience = Resilience()
+    return _resilience
+
+
+def set_resilience(resilience: Optional[Resilience]) -> None:
+    """Swaps the process-wide breaker and retry policy (benchmarks); None resets them to the environment's settings."""
+    global _resilience
+    _resilience = resilience
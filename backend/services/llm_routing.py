@@ -0,0 +1,204 @@
+"""
+Model tiers and hedged requests for the upstream LLM calls in llm_service.
+
+Tiers: LLM_MODEL_TIERS maps a call kind (initial, follow_up, question, answer, analysis,
+compaction, hints) to a list of models, most preferred first; "default" covers the kinds not listed:
+    LLM_MODEL_TIERS='{"default": ["gpt-4o-mini"], "analysis": ["gpt-4o", "gpt-4o-mini"]}'
+A call goes to the kind's first model. A caller that names a model explicitly gets that model only.
+
+Hedging (LLM_HEDGE_ENABLED=1): the turn latency tail comes from the occasional upstream response
+that is far slower than the rest, and a second copy of the same request rarely is slow as well.
+When a call has not finished after the hedge delay, a duplicate goes out (to the kind's second
+tier when there is one, so a slow large model is backed up by a faster one) and whichever finishes
+first is used; the other is cancelled, which aborts its HTTP request. For streamed replies the race
+is to the first text delta, after which the loser is closed.
+  * The delay adapts: it is the LLM_HEDGE_PERCENTILE (p95) of the kind's recent latencies
+    (the last LLM_HEDGE_WINDOW completed calls; cancelled losers are left out, as their time was
+    cut short by the winner's), so only the slowest ~5% of calls are hedged. Until
+    LLM_HEDGE_MIN_SAMPLES calls have been seen it is LLM_HEDGE_INITIAL_DELAY_MS, and it is never
+    below LLM_HEDGE_MIN_DELAY_MS.
+  * Hedges are paid for from a budget: every call earns LLM_HEDGE_BUDGET hedges (capped at 1, so
+    upstream requests can never more than double), saved up to LLM_HEDGE_BURST. Without budget
+    the call simply waits.
+  * A hedge is only sent while a concurrency slot is free (LLM_MAX_CONCURRENCY): under saturation
+    duplicates would only queue behind real work.
+  * Only slow calls are hedged, not failed ones; a call that fails before its hedge went out fails.
+
+Outcomes are counted in llm_hedges_total{kind, outcome} and the current delays are exposed as the
+llm_hedge_delay_seconds gauge. backend/benchmarks/hedging.py measures the effect on p99 against the
+stub provider's injected latency tail.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from backend.services.metrics import LLM_HEDGE_DELAY_SECONDS, LLM_HEDGES
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+LLM_MODEL_TIERS = os.getenv("LLM_MODEL_TIERS", "")
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "0") in ("1", "true")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "500"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_INITIAL_DELAY_MS = float(os.getenv("LLM_HEDGE_INITIAL_DELAY_MS", "2000"))
+LLM_HEDGE_MIN_DELAY_MS = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "50"))
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+LLM_HEDGE_BURST = float(os.getenv("LLM_HEDGE_BURST", "10"))
+
+
+def parse_tiers(raw: str) -> Dict[str, List[str]]:
+    tiers = json.loads(raw) if raw.strip() else {}
+    if not isinstance(tiers, dict) or not all(
+        isinstance(models, list) and models and all(isinstance(model, str) for model in models)
+        for models in tiers.values()
+    ):
+        raise ValueError("LLM_MODEL_TIERS must map call kinds to non-empty lists of model names")
+    tiers.setdefault("default", [DEFAULT_MODEL])
+    return tiers
+
+
+def _retrieve(task: asyncio.Task) -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+class HedgeRouter:
+    def __init__(
+        self,
+        tiers: Optional[Dict[str, List[str]]] = None,
+        enabled: bool = LLM_HEDGE_ENABLED,
+        percentile: float = LLM_HEDGE_PERCENTILE,
+        window: int = LLM_HEDGE_WINDOW,
+        min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+        initial_delay: float = LLM_HEDGE_INITIAL_DELAY_MS / 1000,
+        min_delay: float = LLM_HEDGE_MIN_DELAY_MS / 1000,
+        budget: float = LLM_HEDGE_BUDGET,
+        burst: float = LLM_HEDGE_BURST,
+    ):
+        self.tiers = tiers if tiers is not None else parse_tiers(LLM_MODEL_TIERS)
+        self.enabled = enabled
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.budget = min(1.0, max(0.0, budget))
+        self.burst = max(1.0, burst)
+        self._credits = self.burst
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._delays: Dict[str, float] = {}  # cached percentile, dropped on every new sample
+
+    def models(self, kind: str, requested: Optional[str] = None) -> List[str]:
+        """[primary, hedge] models for a call; the same model twice when the kind has one tier."""
+        if requested is not None:
+            return [requested, requested]
+        tier = self.tiers.get(kind) or self.tiers["default"]
+        return [tier[0], tier[1] if len(tier) > 1 else tier[0]]
+
+    def observe(self, key: str, seconds: float) -> None:
+        samples = self._latencies.get(key)
+        if samples is None:
+            samples = self._latencies[key] = deque(maxlen=self.window)
+        samples.append(seconds)
+        self._delays.pop(key, None)
+
+    def delay(self, key: str) -> float:
+        """Seconds to wait before hedging a call of this kind."""
+        delay = self._delays.get(key)
+        if delay is None:
+            samples = self._latencies.get(key, ())
+            if len(samples) < self.min_samples:
+                delay = self.initial_delay
+            else:
+                ordered = sorted(samples)
+                delay = ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+            delay = self._delays[key] = max(self.min_delay, delay)
+            LLM_HEDGE_DELAY_SECONDS.set(delay, kind=key)
+        return delay
+
+    def _take_credit(self) -> bool:
+        if self._credits >= 1.0:
+            self._credits -= 1.0
+            return True
+        return False
+
+    async def race(
+        self,
+        key: str,
+        attempt: Callable[[str], Awaitable[Any]],
+        models: List[str],
+        has_capacity: Callable[[], bool] = lambda: True,
+        discard: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ) -> Any:
+        """
+        Runs attempt(models[0]), hedged with attempt(models[1]) if it is slow, and returns the first
+        result. Pending attempts are cancelled; `discard` cleans up results that finished but lost
+        (e.g. closes a stream). key labels the latency window and metrics (the call kind).
+        """
+        if not self.enabled:
+            return await attempt(models[0])
+        self._credits = min(self.burst, self._credits + self.budget)
+        started: Dict[asyncio.Task, float] = {}
+
+        def launch(model: str) -> asyncio.Task:
+            task = asyncio.create_task(attempt(model))
+            task.add_done_callback(_retrieve)  # a cancelled loser's late error is not worth a warning
+            started[task] = time.perf_counter()
+            return task
+
+        primary = launch(models[0])
+        tasks = {primary}
+        winner: Optional[asyncio.Task] = None
+        error: Optional[BaseException] = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.delay(key))
+            if not done:
+                if not self._take_credit():
+                    LLM_HEDGES.inc(kind=key, outcome="skipped_budget")
+                elif not has_capacity():
+                    self._credits += 1.0
+                    LLM_HEDGES.inc(kind=key, outcome="skipped_busy")
+                else:
+                    tasks.add(launch(models[1]))
+                    LLM_HEDGES.inc(kind=key, outcome="sent")
+            while tasks and winner is None:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and winner is None:
+                        winner = task
+                    elif task.exception() is not None:
+                        error = error or task.exception()
+                    elif discard is not None:
+                        await discard(task.result())
+                    if task.exception() is None:
+                        self.observe(key, time.perf_counter() - started[task])
+        finally:
+            # A cancelled attempt's time so far is cut short by the winner's; recording it would pull
+            # the p95 (and with it the hedge delay) down, so only completed attempts are observed
+            for task in tasks:
+                task.cancel()
+        if winner is None:
+            raise error
+        if len(started) > 1:
+            LLM_HEDGES.inc(kind=key, outcome="won" if winner is not primary else "lost")
+        return winner.result()
+
+
+_router: Optional[HedgeRouter] = None
+
+
+def get_router() -> HedgeRouter:
+    global _router
+    if _router is None:
+        _router = HedgeRouter()
+    return _router
+
+
+def set_router(router: Optional[HedgeRouter]) -> None:
+    """Swaps the process-wide router (benchmarks); None resets it to the environment's settings."""
+    global _router
+    _router = router
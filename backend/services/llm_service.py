@@ -1,29 +1,126 @@
 import os
-from openai import OpenAI, APIError
-from dotenv import load_dotenv
-from typing import List, Dict, Optional
-from pathlib import Path
+import asyncio
+import logging
+import time
+from collections import deque
+from openai import APIError
+from typing import Any, AsyncIterator, List, Dict, Optional
+from backend.services.llm_provider import LLM_TIMEOUT_SECONDS, get_provider
+from backend.services.llm_resilience import (
+    INTERRUPTED, LLMUnavailable, counts_as_failure, error_fields, error_info, get_resilience,
+)
+from backend.services.llm_routing import get_router
+from backend.services.metrics import LLM_CALL_SECONDS, LLM_ERRORS, LLM_TIME_TO_FIRST_TOKEN_SECONDS, log_sampled, record_usage
 
-# Load environment variables from .env file explicitly
-# Assumes .env file is in the 'backend' directory, one level up from 'services'
-dotenv_path = Path(__file__).resolve().parent.parent / '.env'
-load_dotenv(dotenv_path=dotenv_path)
+# Every call goes through the provider from llm_provider.py (the pooled AsyncOpenAI client, or the
+# offline stub with LLM_PROVIDER=stub), so a slow completion only parks its own coroutine instead of
+# blocking the event loop. Nothing here touches the network or the API key at import time.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))  # in-flight upstream calls per process
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not found in environment variables. Please set it in your .env file.")
-
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Created lazily so it binds to the running loop rather than whatever loop existed at import time
+_llm_semaphore: Optional[asyncio.Semaphore] = None
 
 ChatMessage = Dict[str, str] 
 
+# Failures are counted in LLM_ERRORS; during an outage every call fails, so only the sampled log
+# lines describe them. Errors nothing expects (bugs) are always logged.
+logger = logging.getLogger(__name__)
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _llm_semaphore
+
+
+def _error_reason(error: BaseException) -> str:
+    if isinstance(error, LLMUnavailable):
+        return "circuit_open"
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(error, APIError):
+        return "api_error"
+    return "unexpected"
+
+
+def _failure(error: BaseException, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """The error result every call returns: no response_id, a message to show, and error_info()'s typed fields."""
+    if isinstance(error, asyncio.TimeoutError):
+        log_sampled("llm_failure", reason="timeout", timeout=timeout or LLM_TIMEOUT_SECONDS)
+        message = "The AI took too long to respond. Please try again."
+    elif isinstance(error, LLMUnavailable):
+        message = "The AI is temporarily unavailable. Please try again in a few seconds."
+    elif isinstance(error, APIError):
+        log_sampled("llm_failure", reason="api_error", error=str(error))
+        message = f"Error communicating with AI: {str(error)}"
+    else:
+        logger.warning("Unexpected error from an LLM call: %r", error, exc_info=error)
+        message = "An unexpected error occurred while trying to get an AI response."
+    return {"response_id": None, "ai_message": message, **error_info(error)}
+
+
+def _input_tokens(usage) -> Dict[str, int]:
+    """{"input_tokens": n} from a response's usage, or {} when it was not reported."""
+    input_tokens = getattr(usage, "input_tokens", None)
+    return {"input_tokens": input_tokens} if input_tokens else {}
+
+
+async def _create_response(kind: str, timeout: Optional[float] = None, **kwargs):
+    """
+    Sends one request to the Responses API through the shared client.
+    The concurrency limit and the deadline both apply here, so a call that waits too long for a
+    free slot times out the same way as one that waits too long for the model.
+    Cancelling the awaiting task (e.g. when the websocket goes away) cancels the HTTP request too.
+    kind ("initial", "follow_up", ...) labels the latency, token and error metrics, and picks the
+    model tier and hedging window (services/llm_routing.py) unless kwargs name a model.
+    Retries and the circuit breaker (services/llm_resilience.py) wrap the hedged call, all within
+    the same deadline; while the breaker is open this raises LLMUnavailable without sending anything.
+    """
+    router = get_router()
+    models = router.models(kind, kwargs.pop("model", None))
+    semaphore = _get_semaphore()
+
+    async def _call(model: str):
+        async with semaphore:
+            return await get_provider().create(model=model, **kwargs)
+
+    started = time.perf_counter()
+    try:
+        response = await get_resilience().call(
+            kind,
+            lambda: router.race(kind, _call, models, has_capacity=lambda: not semaphore.locked()),
+            timeout=timeout or LLM_TIMEOUT_SECONDS,
+        )
+    except asyncio.CancelledError:
+        LLM_CALL_SECONDS.observe(time.perf_counter() - started, kind=kind, outcome="cancelled")
+        raise
+    except Exception as e:
+        LLM_CALL_SECONDS.observe(time.perf_counter() - started, kind=kind, outcome="error")
+        LLM_ERRORS.inc(kind=kind, reason=_error_reason(e))
+        raise
+    elapsed = time.perf_counter() - started
+    LLM_CALL_SECONDS.observe(elapsed, kind=kind, outcome="ok")
+    usage = getattr(response, "usage", None)
+    record_usage(kind, usage)
+    log_sampled("llm_call", kind=kind, model=getattr(response, "model", None), response_id=response.id,
+                seconds=round(elapsed, 4), usage=usage.model_dump() if hasattr(usage, "model_dump") else None)
+    return response
+
+
+async def aclose() -> None:
+    """Closes the provider's pooled HTTP connections, called from the app lifespan on shutdown."""
+    await get_provider().aclose()
+
 
 
 async def get_ai_response_initial(
     instructions: str,
     current_case_context: Optional[str] = None,
-    model: str = "gpt-4o-mini",
+    model: Optional[str] = None,
     temperature: float = 0.5,
+    timeout: Optional[float] = None,
+    prompt_cache_key: Optional[str] = None,
 ) -> Dict[str, str]:
     
     """
@@ -35,41 +132,44 @@ async def get_ai_response_initial(
     Args: 
         instructions: str,
         current_case_context: Optional[str] = None,
-        model: str = "gpt-4.1-mini",
+        model: Optional[str] = None, // None -> the model tier for the call kind (services/llm_routing.py)
         temperature: float = 0.5,
+        timeout: Optional[float] = None, // seconds, defaults to LLM_TIMEOUT_SECONDS
+        prompt_cache_key: Optional[str] = None, // groups requests sharing the case prefix (services/prompt_assembly.py)
     Returns:
         Dict[str, str]: A dictionary containing the response_id and the ai_message
     """   
-    input = f"Current case context: {current_case_context}"
+    # With the case rendered into the instructions (services/prompt_assembly.py) there is no separate context
+    input = f"Current case context: {current_case_context}" if current_case_context else "Please begin the case interview."
     try:
-        # Removed await, as client.responses.create is synchronous with the standard OpenAI client
-        response = client.responses.create(
+        response = await _create_response(
+            "initial",
+            timeout=timeout,
             model=model,
             input= input,
             instructions=instructions,
             temperature=temperature,
+            prompt_cache_key=prompt_cache_key,
         )
-        # print(response)
         response_id = response.id
         ai_message = response.output_text
         return {"response_id": response_id, "ai_message": ai_message.strip()}
-    except APIError as e:
-        print(f"OpenAI API Error: {e}")
-        return {"response_id": None, "ai_message": f"Error communicating with AI: {e.strerror or str(e)}"}
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return {"response_id": None, "ai_message": "An unexpected error occurred while trying to get an AI response."}
-
+        return _failure(e, timeout)
 
 # THIS IS WHERE THE WEBSOCKET CONNECTION WILL BE MADE, these apis will be now "streamed"
 async def get_ai_response_follow_up(
-    response_id: str,
+    response_id: Optional[str],
     instructions: str, # add the instructions for follow up here itself to avoid useless parameter passing
     curr_message: str,
     question: Optional[str] = None,
     answer: Optional[str] = None,
-    model: str = "gpt-4o-mini",
+    context: Optional[str] = None,
+    history: Optional[List[Dict[str, str]]] = None,
+    model: Optional[str] = None,
     temperature: float = 0.5,
+    timeout: Optional[float] = None,
+    prompt_cache_key: Optional[str] = None,
 ) -> Dict[str, str]:
     """
     This function will be used to generate the follow-up response to the user's message. 
@@ -93,46 +193,205 @@ async def get_ai_response_follow_up(
         response_id: str, // either from the previous response or from the gen_ai_response_initial function
         instructions: str,
         curr_message: str,
-        model: str = "gpt-4o-mini",
+        context: Optional[str] = None, // compacted conversation state (services/compaction.py); pass response_id=None with it to start a fresh chain
+        history: Optional[List[Dict[str, str]]] = None, // earlier {"role", "content"} messages missing from the chain (cached replies, services/response_cache.py)
+        model: Optional[str] = None, // None -> the model tier for the call kind (services/llm_routing.py)
         temperature: float = 0.5,   
+        timeout: Optional[float] = None, // seconds, defaults to LLM_TIMEOUT_SECONDS
+        prompt_cache_key: Optional[str] = None, // as in get_ai_response_initial
     Returns:
-        Dict[str, str]: A dictionary containing the response_id and the ai_message
+        Dict[str, str]: A dictionary containing the response_id and the ai_message, plus input_tokens when the API reports usage
     """
     if question and answer:
         input = [{"role": "user", "content": curr_message}, {"role": "user", "content": question}, {"role": "user", "content": answer}] # ig question and answer are not to be provided with role as user, will see later
     else:
         input = [{"role": "user", "content": curr_message}]
+    input = list(history or []) + input
+    if context:
+        input.insert(0, {"role": "developer", "content": context})
     try:
-        # Removed await
-        response = client.responses.create(
+        response = await _create_response(
+            "follow_up",
+            timeout=timeout,
             model=model,
             previous_response_id=response_id,
             input=input,
             instructions=instructions,
             temperature=temperature,
+            prompt_cache_key=prompt_cache_key,
         )
-        print(response)
         response_id = response.id
         ai_message = response.output_text
         if response_id is None:
-            return {"response_id": None, "ai_message": "An unexpected error occurred while trying to get an AI response."}
+            return {"response_id": None, "ai_message": "An unexpected error occurred while trying to get an AI response.", "code": "internal", "retryable": False}
         else:
-            return {"response_id": response_id, "ai_message": ai_message.strip()}
-    except APIError as e:
-        print(f"OpenAI API Error: {e}")
-        return {"response_id": None, "ai_message": f"Error communicating with AI: {e.strerror or str(e)}"}
+            return {"response_id": response_id, "ai_message": ai_message.strip(), **_input_tokens(response.usage)}
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return {"response_id": None, "ai_message": "An unexpected error occurred while trying to get an AI response."}
-    
+        return _failure(e, timeout)
+
+async def stream_ai_response_follow_up(
+    response_id: Optional[str],
+    instructions: str,
+    curr_message: str,
+    context: Optional[str] = None,
+    history: Optional[List[Dict[str, str]]] = None,
+    model: Optional[str] = None,
+    temperature: float = 0.5,
+    timeout: Optional[float] = None,
+    prompt_cache_key: Optional[str] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming twin of get_ai_response_follow_up, for the websocket's streaming mode.
+    Yields events as they arrive from the Responses API instead of waiting for the whole completion:
+        {"type": "delta", "delta": str}                                  -> a piece of the ai_message
+        {"type": "done", "response_id": str, "ai_message": str}          -> the new chain anchor, always last on success
+                                                                            (plus "input_tokens" when usage is reported)
+        {"type": "error", "error": str, "code": str, "retryable": bool}  -> always last on failure
+                                                                            (plus "retry_after" when known, services/llm_resilience.py)
+    The concurrency slot is held for the whole stream and the deadline covers the whole stream,
+    the same as the non-streaming calls. With hedging on (services/llm_routing.py) a stream whose
+    first text is slow to arrive races a second one, and the later one is closed. Opening the
+    stream is retried and guarded by the circuit breaker like the other calls; once text has been
+    sent a failure is not retried (the user has seen part of the reply) but still counts against
+    the breaker.
+
+    Args:
+        response_id: str, // the previous response in the chain
+        instructions: str,
+        curr_message: str,
+        context: Optional[str] = None, // as in get_ai_response_follow_up
+        history: Optional[List[Dict[str, str]]] = None, // as in get_ai_response_follow_up
+        model: Optional[str] = None, // None -> the model tier for the call kind (services/llm_routing.py)
+        temperature: float = 0.5,
+        timeout: Optional[float] = None, // seconds, defaults to LLM_TIMEOUT_SECONDS
+        prompt_cache_key: Optional[str] = None, // as in get_ai_response_initial
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (timeout or LLM_TIMEOUT_SECONDS)
+
+    def remaining() -> float:
+        return max(0.0, deadline - loop.time())
+
+    input = list(history or []) + [{"role": "user", "content": curr_message}]
+    if context:
+        input.insert(0, {"role": "developer", "content": context})
+    parts: List[str] = []
+    new_response_id: Optional[str] = None
+    usage = None
+    started = time.perf_counter()
+    outcome = "cancelled"  # anything that leaves without setting it is the consumer going away
+
+    def failed(reason: str) -> None:
+        nonlocal outcome
+        outcome = "error"
+        LLM_ERRORS.inc(kind="follow_up", reason=reason)
+
+    router = get_router()
+    semaphore = _get_semaphore()
+
+    async def _open(model_name: str):
+        """One attempt: a concurrency slot and a stream, read up to its first event past response.created."""
+        await semaphore.acquire()
+        try:
+            stream = await get_provider().stream(
+                model=model_name,
+                previous_response_id=response_id,
+                input=input,
+                instructions=instructions,
+                temperature=temperature,
+                prompt_cache_key=prompt_cache_key,
+            )
+            try:
+                events = stream.__aiter__()
+                head = []
+                while not head or head[-1].type == "response.created":
+                    try:
+                        head.append(await events.__anext__())
+                    except StopAsyncIteration:
+                        break
+                return stream, events, deque(head)
+            except BaseException:
+                await stream.close()
+                raise
+        except BaseException:
+            semaphore.release()
+            raise
+
+    async def _discard(opened) -> None:
+        await opened[0].close()
+        semaphore.release()
+
+    resilience = get_resilience()
+    opened = False
+    try:
+        stream, events, head = await resilience.call("follow_up", lambda: router.race(
+            "follow_up_stream",
+            _open,
+            router.models("follow_up", model),
+            has_capacity=lambda: not semaphore.locked(),
+            discard=_discard,
+        ), timeout=remaining())
+        opened = True
+        try:
+            while True:
+                if head:
+                    event = head.popleft()
+                else:
+                    try:
+                        event = await asyncio.wait_for(events.__anext__(), timeout=remaining())
+                    except StopAsyncIteration:
+                        break
+                if event.type == "response.created":
+                    new_response_id = event.response.id
+                elif event.type == "response.output_text.delta":
+                    if not parts:
+                        LLM_TIME_TO_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started, kind="follow_up")
+                    parts.append(event.delta)
+                    yield {"type": "delta", "delta": event.delta}
+                elif event.type == "response.completed":
+                    new_response_id = event.response.id
+                    usage = getattr(event.response, "usage", None)
+                    record_usage("follow_up", usage)
+                elif event.type in ("response.failed", "response.incomplete", "error"):
+                    log_sampled("llm_failure", reason="stream", event_type=event.type)
+                    failed("stream_" + event.type.rsplit(".", 1)[-1])
+                    resilience.breaker.record_failure()
+                    yield {"type": "error", "error": "The AI response was interrupted. Please try again.", **INTERRUPTED}
+                    return
+        finally:
+            await stream.close()
+            semaphore.release()
+        if new_response_id is None:
+            failed("missing_response_id")
+        else:
+            outcome = "ok"
+    except Exception as e:
+        failed(_error_reason(e))
+        if opened and counts_as_failure(e):
+            resilience.breaker.record_failure()  # failures while opening were counted by resilience.call
+        failure = _failure(e, timeout)
+        typed = INTERRUPTED if opened and parts else error_fields(failure)
+        yield {"type": "error", "error": failure["ai_message"], **typed}
+        return
+    finally:
+        LLM_CALL_SECONDS.observe(time.perf_counter() - started, kind="follow_up", outcome=outcome)
+
+    if new_response_id is None:
+        yield {"type": "error", "error": "An unexpected error occurred while trying to get an AI response.", "code": "internal", "retryable": False}
+    else:
+        yield {"type": "done", "response_id": new_response_id, "ai_message": "".join(parts).strip(), **_input_tokens(usage)}
+
 
 async def gen_ai_response_question(
     response_id: str,
     question: str,
     answer: str,
     instructions: str,
-    model: str = "gpt-4o-mini",
+    model: Optional[str] = None,
     temperature: float = 0.5,
+    timeout: Optional[float] = None,
+    prompt_cache_key: Optional[str] = None,
+    store: bool = True,
 ) -> Dict[str, str]:
     """
     This function will be used to explain the question to the user, the instructions/system prompt will be designed accordingly
@@ -147,26 +406,73 @@ async def gen_ai_response_question(
     response_id, ai_message = gen_ai_response_question(response_id, question, answer) # instructions will be hardcoded later when defined 
     The above function is ran once 
 
+    store=False for one-off calls nothing continues from (the offline precompute), so the response is not kept upstream.
+
     if user.clicked_on_I_DONT_UNDERSTAND_bubble, then the follow_up function will be called again with the updated response_id and the user's message and the question and answer will also passed
 
     """
     input = [{"role": "user", "content": question}, {"role": "user", "content": answer}] # ig question and answer are not to be provided with role as user, will see later
     try:
-        # Removed await
-        response = client.responses.create(
+        response = await _create_response(
+            "question",
+            timeout=timeout,
             model=model,
             previous_response_id=response_id,
             input=input,
             instructions=instructions,
             temperature=temperature,
+            prompt_cache_key=prompt_cache_key,
+            store=store,
         )
-        print(response)
         response_id = response.id
         ai_message = response.output_text
         return {"response_id": response_id, "ai_message": ai_message.strip()}
-    except APIError as e:
-        print(f"OpenAI API Error: {e}")
-        return {"response_id": None, "ai_message": f"Error communicating with AI: {e.strerror or str(e)}"}
+    except Exception as e:
+        return _failure(e, timeout)
+
+async def gen_ai_response_hints(
+    question: str,
+    answer: str,
+    hints: Optional[List[str]],
+    instructions: str,
+    model: Optional[str] = None,
+    temperature: float = 0.3,
+    timeout: Optional[float] = None,
+    prompt_cache_key: Optional[str] = None,
+) -> Dict[str, str]:
+    """
+    Writes the hint ladder for one question, offline (services/question_precompute.py).
+    Nothing chains from this response, so it is not stored upstream.
+
+    Args:
+        question: str,
+        answer: str, // the reference answer, so the hints lead towards it
+        hints: Optional[List[str]], // the case author's hints for the question
+        instructions: str, // hint_ladder_prompt with the case prefix
+        model: Optional[str] = None, // None -> the model tier for the call kind (services/llm_routing.py)
+        temperature: float = 0.3,
+        timeout: Optional[float] = None, // seconds, defaults to LLM_TIMEOUT_SECONDS
+        prompt_cache_key: Optional[str] = None, // as in get_ai_response_initial
+    Returns:
+        Dict[str, str]: A dictionary containing the response_id and the ai_message (the ladder as a numbered list)
+    """
+    input = [{"role": "user", "content": question}, {"role": "user", "content": f"Reference answer:\n{answer}"}]
+    if hints:
+        input.append({"role": "user", "content": "Author's hints:\n" + "\n".join(f"- {hint}" for hint in hints)})
+    try:
+        response = await _create_response(
+            "hints",
+            timeout=timeout,
+            model=model,
+            input=input,
+            instructions=instructions,
+            temperature=temperature,
+            prompt_cache_key=prompt_cache_key,
+            store=False,
+        )
+        return {"response_id": response.id, "ai_message": response.output_text.strip()}
+    except Exception as e:
+        return _failure(e, timeout)
 
 async def gen_ai_response_answer(
     response_id: str,
@@ -174,8 +480,11 @@ async def gen_ai_response_answer(
     answer: str,
     curr_message: str,
     instructions: str,
-    model: str = "gpt-4o-mini",
+    history: Optional[List[Dict[str, str]]] = None,
+    model: Optional[str] = None,
     temperature: float = 0.5,
+    timeout: Optional[float] = None,
+    prompt_cache_key: Optional[str] = None,
 ) -> Dict[str, str]:
     """
     This function will take the user's answer and guide it through the question, it will be the main orchestractor
@@ -189,33 +498,40 @@ async def gen_ai_response_answer(
     base case = (if response_id is None) return a signal to the backend to end the process and give the error message to the frontend
 
     response_id, ai_message = gen_ai_response_answer(response_id, question, answer) # instructions will be hardcoded later when defined 
+
+    history is what the chain is missing, e.g. a question explanation or hints served from the
+    precomputed artifact (services/question_precompute.py), as in get_ai_response_follow_up.
     """
-    input = [{"role": "user", "content": question}, {"role": "user", "content": answer}]
+    input = [{"role": "user", "content": question}, {"role": "user", "content": answer}, {"role": "user", "content": curr_message}]
+    input = list(history or []) + input
     try:
-        # Removed await
-        response = client.responses.create(
+        response = await _create_response(
+            "answer",
+            timeout=timeout,
             model=model,
             previous_response_id=response_id,
             input=input,
             instructions=instructions,
             temperature=temperature,
+            prompt_cache_key=prompt_cache_key,
         )           
-        print(response)
         response_id = response.id
         ai_message = response.output_text
         return {"response_id": response_id, "ai_message": ai_message.strip()}
-    except APIError as e:
-        print(f"OpenAI API Error: {e}")
-        return {"response_id": None, "ai_message": f"Error communicating with AI: {e.strerror or str(e)}"}
-
+    except Exception as e:
+        return _failure(e, timeout)
 
 async def gen_ai_response_analysis(
     response_id: str,
     question: str,
     answer: str,
     instructions: str,
-    model: str = "gpt-4o-mini",
+    user_answer: Optional[str] = None,
+    history: Optional[List[Dict[str, str]]] = None,
+    model: Optional[str] = None,
     temperature: float = 0.5,
+    timeout: Optional[float] = None,
+    prompt_cache_key: Optional[str] = None,
 ) -> Dict[str, str]:
     """
     This function will be used to analyze the user's answer and provide feedback to the user.
@@ -223,25 +539,62 @@ async def gen_ai_response_analysis(
 
     straight forward  some if's statements like if the Done button is clicked and shit some state mgmt needed here on the frontend side.
     There should be an option to download the analysis as a pdf or sum shi 
+
+    user_answer is passed when the user's answer is not already in the response_id chain, e.g. the
+    batch analysis jobs in services/analysis_jobs.py that run after the interview has ended.
+    history is as in gen_ai_response_answer.
     """
-    input = [{"role": "user", "content": question}, {"role": "user", "content": answer}]
+    input = list(history or []) + [{"role": "user", "content": question}, {"role": "user", "content": answer}]
+    if user_answer is not None:
+        input.append({"role": "user", "content": f"Candidate's answer:\n{user_answer}"})
     try:
-        # Removed await
-        response = client.responses.create(
+        response = await _create_response(
+            "analysis",
+            timeout=timeout,
             model=model,
             previous_response_id=response_id,
             input=input,
             instructions=instructions,
             temperature=temperature,
+            prompt_cache_key=prompt_cache_key,
         )
-        print(response)
         response_id = response.id
         ai_message = response.output_text
         return {"response_id": response_id, "ai_message": ai_message.strip()}   
-    except APIError as e:
-        print(f"OpenAI API Error: {e}")
-        return {"response_id": None, "ai_message": f"Error communicating with AI: {e.strerror or str(e)}"}
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return {"response_id": None, "ai_message": "An unexpected error occurred while trying to get an AI response."}
+        return _failure(e, timeout)
+
+async def gen_ai_response_summary(
+    transcript: str,
+    instructions: str,
+    model: Optional[str] = None,
+    temperature: float = 0.2,
+    timeout: Optional[float] = None,
+) -> Dict[str, str]:
+    """
+    Summarises a conversation into a compact state for context compaction (services/compaction.py).
+    The transcript is sent in full and nothing chains from this response, so it is not stored upstream.
 
+    Args:
+        transcript: str, // the conversation (and any earlier summary) as plain text
+        instructions: str,
+        model: Optional[str] = None, // None -> the model tier for the call kind (services/llm_routing.py)
+        temperature: float = 0.2,
+        timeout: Optional[float] = None, // seconds, defaults to LLM_TIMEOUT_SECONDS
+    Returns:
+        Dict[str, str]: A dictionary containing the response_id and the ai_message (the summary)
+    """
+    input = [{"role": "user", "content": transcript}]
+    try:
+        response = await _create_response(
+            "compaction",
+            timeout=timeout,
+            model=model,
+            input=input,
+            instructions=instructions,
+            temperature=temperature,
+            store=False,
+        )
+        return {"response_id": response.id, "ai_message": response.output_text.strip()}
+    except Exception as e:
+        return _failure(e, timeout)
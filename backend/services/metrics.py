@@ -0,0 +1,257 @@
+"""
+Process-local metrics, exposed in the Prometheus text format on GET /metrics.
+
+Counters, gauges and histograms are plain in-memory objects updated on the event loop, so recording
+a sample is a dict lookup and a few additions; nothing is written on the hot path. Each worker
+process exposes its own numbers, and Prometheus sums them across workers.
+
+log_sampled() replaces the old print(response) calls: one JSON line on the "backend.metrics" logger
+for a random LOG_SAMPLE_RATE fraction of events (0 by default, so nothing is logged unless asked).
+"""
+import json
+import logging
+import math
+import os
+import random
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0"))
+
+# Seconds. LLM calls sit between a few hundred ms and tens of seconds; first tokens and cache hits
+# land in the low buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger("backend.metrics")
+if LOG_SAMPLE_RATE > 0 and not logger.handlers:
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(line + "\n" for line in self.samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterable[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts with a trailing +Inf slot, sum, count)
+        self._series: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def samples(self) -> Iterable[str]:
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics.values())
+
+
+REGISTRY = Registry()
+
+# kind is the llm_service function: initial, follow_up, question, answer, analysis, compaction
+LLM_CALL_SECONDS = REGISTRY.register(Histogram(
+    "llm_call_seconds", "Upstream LLM call latency, queueing for a concurrency slot included.", ("kind", "outcome")
+))
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = REGISTRY.register(Histogram(
+    "llm_time_to_first_token_seconds", "Time from sending a streaming request to its first text delta.", ("kind",)
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "llm_tokens_total", "Tokens reported in the response usage (input, cached_input, output).", ("kind", "type")
+))
+# outcome: sent | won (the hedge finished first) | lost (the original did) | skipped_budget | skipped_busy
+LLM_HEDGES = REGISTRY.register(Counter(
+    "llm_hedges_total", "Hedged duplicate LLM requests by outcome (services/llm_routing.py).", ("kind", "outcome")
+))
+LLM_HEDGE_DELAY_SECONDS = REGISTRY.register(Gauge(
+    "llm_hedge_delay_seconds", "Current hedge delay, the recent latency percentile, per call kind.", ("kind",)
+))
+LLM_PROMPT_CACHE_HIT_RATIO = REGISTRY.register(Histogram(
+    "llm_prompt_cache_hit_ratio", "Share of a call's input tokens the provider read from its prompt cache.", ("kind",),
+    buckets=(0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0),
+))
+# reason: the error code of the failed attempt (services/llm_resilience.py)
+LLM_RETRIES = REGISTRY.register(Counter(
+    "llm_retries_total", "LLM call attempts retried after a retryable error.", ("kind", "reason")
+))
+LLM_BREAKER_STATE = REGISTRY.register(Gauge(
+    "llm_breaker_state", "LLM circuit breaker state: 0 closed, 1 half-open, 2 open."
+))
+LLM_BREAKER_TRANSITIONS = REGISTRY.register(Counter(
+    "llm_breaker_transitions_total", "LLM circuit breaker state changes by the state entered.", ("state",)
+))
+LLM_ERRORS = REGISTRY.register(Counter(
+    "llm_errors_total", "Failed upstream LLM calls by reason.", ("kind", "reason")
+))
+# chain is "original" until a session's context has been compacted, "compacted" after that
+CHAT_TURN_SECONDS = REGISTRY.register(Histogram(
+    "chat_turn_seconds", "Websocket turn latency, from dequeuing the user message to the last reply frame.", ("mode", "chain")
+))
+CHAT_CONTEXT_TOKENS = REGISTRY.register(Histogram(
+    "chat_context_tokens", "Input tokens the model processed for a websocket turn.", ("chain",),
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000),
+))
+CHAT_COMPACTIONS = REGISTRY.register(Counter(
+    "chat_compactions_total", "Context compactions of chat sessions by outcome.", ("outcome",)
+))
+CHAT_COMPACTION_TOKENS_SAVED = REGISTRY.register(Counter(
+    "chat_compaction_tokens_saved_total", "Input tokens of the last full-context turn minus those of the first compacted turn."
+))
+# result: hit_exact | hit_similar | miss | uncacheable (message too long to be a clarifying question)
+RESPONSE_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "response_cache_lookups_total", "Follow-up response cache lookups by result.", ("result",)
+))
+RESPONSE_CACHE_ENTRIES = REGISTRY.register(Gauge(
+    "response_cache_entries", "Replies held in this worker's follow-up response cache."
+))
+RESPONSE_CACHE_EVICTIONS = REGISTRY.register(Counter(
+    "response_cache_evictions_total", "Replies evicted from the follow-up response cache to stay under its size limit."
+))
+CHAT_FRAME_BYTES = REGISTRY.register(Counter(
+    "chat_frame_bytes_total", "Payload bytes of chat websocket frames sent, before compression, by protocol version.", ("protocol",)
+))
+# reason: client | idle | max_duration | draining | capacity (the last two also count refused sockets)
+CHAT_WEBSOCKETS_CLOSED = REGISTRY.register(Counter(
+    "chat_websockets_closed_total", "Chat websockets closed or refused, by reason.", ("reason",)
+))
+CHAT_ACTIVE_WEBSOCKETS = REGISTRY.register(Gauge(
+    "chat_active_websockets", "Chat websockets currently open in this process."
+))
+CHAT_ERRORS = REGISTRY.register(Counter(
+    "chat_errors_total", "Errors reported to chat websocket clients by reason.", ("reason",)
+))
+
+
+def record_usage(kind: str, usage) -> None:
+    """Adds the token counts of a Responses API usage object (or None) to LLM_TOKENS and LLM_PROMPT_CACHE_HIT_RATIO."""
+    if usage is None:
+        return
+    input_tokens = getattr(usage, "input_tokens", None)
+    output_tokens = getattr(usage, "output_tokens", None)
+    details = getattr(usage, "input_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) if details is not None else None
+    if input_tokens:
+        LLM_TOKENS.inc(input_tokens, kind=kind, type="input")
+        LLM_PROMPT_CACHE_HIT_RATIO.observe(min(1.0, (cached_tokens or 0) / input_tokens), kind=kind)
+    if cached_tokens:
+        LLM_TOKENS.inc(cached_tokens, kind=kind, type="cached_input")
+    if output_tokens:
+        LLM_TOKENS.inc(output_tokens, kind=kind, type="output")
+
+
+def log_sampled(event: str, rate: Optional[float] = None, **fields) -> None:
+    """Logs {"event", "ts", **fields} as one JSON line for a sampled fraction of calls."""
+    rate = LOG_SAMPLE_RATE if rate is None else rate
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    logger.info(json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, default=str))
+
+
+def render_latest() -> str:
+    return REGISTRY.render()
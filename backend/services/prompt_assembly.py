@@ -0,0 +1,123 @@
+"""
+Prompt assembly that keeps the provider's prompt cache warm.
+
+The Responses API caches prompt prefixes: once a prompt of 1024 tokens or more has been seen, the
+longest previously seen prefix of a later prompt (in 128-token steps) is read from cache, which is
+cheaper and faster than processing it again. A prompt is laid out as instructions, then the
+conversation chained through previous_response_id, then the new input. So everything that is the
+same for every session of a case goes into the instructions, always rendered the same way:
+    1. the phase's prompt from prompts.yaml (follow_up_prompt, question_prompt, ...)
+    2. the case: name, client, goal, client description, situation, company study, global hints
+    3. the numbered question list (no reference answers; the phases that need one send it per turn)
+Only per-turn content (the user's message, a question's reference answer, a compacted summary)
+goes in the input. Every session of a case, on every worker, then sends byte-identical instructions
+for a given phase, and after the first call those tokens come from the cache.
+
+Assembled instructions are cached per (case id, case content hash, prompt name, prompt version),
+so a case or prompt edit renders a new prefix and the old one ages out of the LRU
+(PROMPT_PREFIX_CACHE_SIZE entries). Each prefix has a version (a hash of the layout, the prompts
+version and the case content) that is sent as the request's prompt_cache_key, which routes requests
+sharing a prefix to the same cache; set PROMPT_CACHE_KEY=0 to leave it out.
+
+How much of each call came from the cache is in llm_tokens_total{type="cached_input"} and the
+llm_prompt_cache_hit_ratio histogram on GET /metrics.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from backend.database.case_store import case_content_hash, get_case_store
+from backend.database.models import CaseInterview
+from backend.services.prompts import get_prompts
+
+PROMPT_PREFIX_CACHE_SIZE = int(os.getenv("PROMPT_PREFIX_CACHE_SIZE", "1024"))
+PROMPT_CACHE_KEY = os.getenv("PROMPT_CACHE_KEY", "1") in ("1", "true")
+
+# Bump when render_case changes its output, so old and new prefixes never share a version
+CASE_PREFIX_LAYOUT = 1
+
+
+def render_case(case: CaseInterview) -> str:
+    """The case as a deterministic block of text: same case, same bytes."""
+    description = case.description
+    lines = [
+        "# Case",
+        f"Name: {case.name}",
+        f"Company: {case.company}",
+        f"Client: {description.client_name}",
+        f"Client goal: {description.client_goal}",
+        "",
+        "## Client description",
+        description.client_description.strip(),
+        "",
+        "## Situation",
+        description.situation_description.strip(),
+    ]
+    if description.company_study:
+        lines += ["", "## Company study", description.company_study.strip()]
+    if description.global_hints:
+        lines += ["", "## Hints you may give"] + [f"- {hint.strip()}" for hint in description.global_hints]
+    lines += ["", "## Questions, in the order they are asked"]
+    lines += [f"{number}. {question.text.strip()}" for number, question in enumerate(description.questions, 1)]
+    return "\n".join(lines)
+
+
+@dataclass(frozen=True)
+class AssembledPrompt:
+    instructions: str
+    version: Optional[str] = None  # None without a case: nothing to share a prefix with
+    cache_key: Optional[str] = None  # the request's prompt_cache_key
+
+
+class PromptAssembler:
+    def __init__(self, max_entries: int = PROMPT_PREFIX_CACHE_SIZE, send_cache_key: bool = PROMPT_CACHE_KEY):
+        self.max_entries = max_entries
+        self.send_cache_key = send_cache_key
+        self._entries: "OrderedDict[Tuple, AssembledPrompt]" = OrderedDict()
+        self.renders = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def assemble(self, prompt_name: str, case: Optional[CaseInterview], **values: str) -> AssembledPrompt:
+        """
+        Instructions for one call: the named prompt (with {{placeholders}} filled from `values`),
+        followed by the case when there is one.
+        """
+        prompts = get_prompts()
+        template = prompts.template(prompt_name)  # first: picks up a reload before .version is read
+        if case is None:
+            return AssembledPrompt(instructions=template.render(**values))
+        content_hash = get_case_store().content_hash(case.id) or case_content_hash(case)
+        key = (case.id, content_hash, prompt_name, prompts.version, tuple(sorted(values.items())))
+        assembled = self._entries.get(key)
+        if assembled is not None:
+            self._entries.move_to_end(key)
+            return assembled
+
+        version = hashlib.sha256(
+            f"{CASE_PREFIX_LAYOUT}|{prompts.version}|{content_hash}".encode("utf-8")
+        ).hexdigest()[:16]
+        head = template.render(**values).rstrip()
+        assembled = AssembledPrompt(
+            instructions=f"{head}\n\n{render_case(case)}\n",
+            version=version,
+            cache_key=f"case-{case.id}-{version}" if self.send_cache_key else None,
+        )
+        self.renders += 1
+        self._entries[key] = assembled
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return assembled
+
+
+_assembler: Optional[PromptAssembler] = None
+
+
+def get_prompt_assembler() -> PromptAssembler:
+    global _assembler
+    if _assembler is None:
+        _assembler = PromptAssembler()
+    return _assembler
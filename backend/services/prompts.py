@@ -0,0 +1,112 @@
+"""
+Prompt registry: the one place backend/prompts.yaml is read.
+
+The file is found relative to this package (or at PROMPTS_PATH), not the working directory, so
+workers boot from anywhere. Nothing is read at import; the app lifespan loads it once per process
+and every caller shares that copy through get_prompts(). The file's mtime is re-checked at most
+every PROMPTS_RELOAD_SECONDS (0 turns hot reload off): an edit is picked up without a restart, and
+an edit that does not parse is reported and ignored, keeping the last good prompts.
+
+Prompts may contain {{placeholders}}. template(name) returns the prompt compiled once into literal
+and placeholder parts, so rendering is a single join instead of a str.replace per placeholder per
+request. Placeholders without a value are left as they are.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+PROMPTS_PATH = os.getenv("PROMPTS_PATH") or str(Path(__file__).resolve().parent.parent / "prompts.yaml")
+PROMPTS_RELOAD_SECONDS = float(os.getenv("PROMPTS_RELOAD_SECONDS", "2"))
+
+DEFAULT_PROMPT = "default_system_prompt"
+
+_PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+logger = logging.getLogger(__name__)
+
+
+class PromptTemplate:
+    def __init__(self, text: str):
+        self.text = text
+        # Alternating literal / placeholder parts: even indexes are literals, odd ones field names
+        self._parts: List[str] = _PLACEHOLDER.split(text)
+        self.fields: Tuple[str, ...] = tuple(self._parts[1::2])
+
+    def render(self, **values: str) -> str:
+        if not self.fields:
+            return self.text
+        parts = self._parts[:]
+        for index in range(1, len(parts), 2):
+            name = parts[index]
+            parts[index] = str(values[name]) if name in values else "{{" + name + "}}"
+        return "".join(parts)
+
+
+class PromptRegistry:
+    def __init__(self, path: str = PROMPTS_PATH, reload_seconds: float = PROMPTS_RELOAD_SECONDS):
+        self.path = Path(path)
+        self.reload_seconds = reload_seconds
+        self.version = ""  # content hash of the loaded file, for cache keys
+        self._prompts: Optional[Dict[str, str]] = None
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._mtime_ns = 0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """(Re)reads the file. The first load raises if it is missing or invalid; later ones keep the old prompts."""
+        with self._lock:
+            mtime_ns = self.path.stat().st_mtime_ns
+            raw = self.path.read_bytes()
+            prompts = yaml.safe_load(raw)
+            if not isinstance(prompts, dict) or not all(isinstance(value, str) for value in prompts.values()):
+                raise ValueError(f"{self.path} must be a mapping of prompt names to strings")
+            self._prompts = prompts
+            self._templates = {}
+            self._mtime_ns = mtime_ns
+            self.version = hashlib.sha256(raw).hexdigest()[:16]
+            self._checked_at = time.monotonic()
+
+    def _current(self) -> Dict[str, str]:
+        if self._prompts is None:
+            self.load()
+        elif self.reload_seconds > 0 and time.monotonic() - self._checked_at >= self.reload_seconds:
+            self._checked_at = time.monotonic()
+            try:
+                mtime_ns = self.path.stat().st_mtime_ns
+                if mtime_ns != self._mtime_ns:
+                    self._mtime_ns = mtime_ns  # a broken edit is reported once, not on every check
+                    self.load()
+                    logger.info("Reloaded prompts from %s", self.path)
+            except (OSError, ValueError, yaml.YAMLError) as e:
+                logger.warning("Could not reload prompts from %s, keeping the previous ones: %s", self.path, e)
+        return self._prompts
+
+    def get(self, name: str) -> str:
+        """The named prompt, or the default system prompt when the file does not define it."""
+        prompts = self._current()
+        return prompts.get(name, prompts.get(DEFAULT_PROMPT))
+
+    def template(self, name: str) -> PromptTemplate:
+        text = self.get(name)
+        template = self._templates.get(name)
+        if template is None or template.text != text:
+            template = self._templates[name] = PromptTemplate(text)
+        return template
+
+
+_registry: Optional[PromptRegistry] = None
+
+
+def get_prompts() -> PromptRegistry:
+    global _registry
+    if _registry is None:
+        _registry = PromptRegistry()
+    return _registry
@@ -0,0 +1,310 @@
+"""
+Question explanations and hint ladders, generated offline and served from a local artifact.
+
+The question phase (services/interview.py) opens every question with an explanation that is the
+same for every candidate of a case, and hints are the same too. Instead of generating them live on
+the critical path, a batch run walks every case in the store (CASE_STORE_PATH) and, per question:
+  * explanation: question_prompt with the case prefix (prompt_assembly.py), given the question and
+    its reference answer, the same request the live phase sends, minus the conversation chain
+  * hint ladder: hint_ladder_prompt, given the question, the reference answer and the author's hints
+    (Question.hints), asking for QUESTION_HINT_STEPS hints from a gentle nudge to nearly the answer
+The calls run QUESTION_PRECOMPUTE_CONCURRENCY at a time through llm_service, so the concurrency
+limit, retries and circuit breaker apply as for live calls:
+    python -m backend.services.question_precompute [--concurrency 8] [--force] [--dry-run]
+
+Artifact: one JSON file at QUESTION_ARTIFACT_PATH (default backend/precomputed/questions.json, git-ignored),
+replaced atomically:
+    {"format": 1, "entries": {"<case id>/<question index>": {
+        "explanation": {"key", "text", "model", "generated_at"},
+        "hint_ladder": {"key", "hints", "model", "generated_at"}}}}
+Each part's key hashes everything that shaped it: the instructions sent (prompt text and case
+prefix), the question, reference answer and author hints, the model and the temperature. A run only
+regenerates parts whose key changed (an edited case or prompt, a new question), drops entries for
+questions that no longer exist and keeps the rest. Bumping ARTIFACT_FORMAT invalidates everything.
+
+Serving: get_precomputed_questions().explanation(case, index) / .hint_ladder(case, index) return a
+part only while its key still matches the current case and prompts, so a stale artifact falls back
+to the live call rather than serving an outdated explanation. The file is re-read when it changes
+(checked at most every QUESTION_ARTIFACT_RELOAD_SECONDS), so running workers pick up a new run
+without a restart.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from backend.database.case_store import CaseStore, case_content_hash, get_case_store
+from backend.database.models import CaseInterview, Question
+from backend.services.llm_routing import get_router
+from backend.services.llm_service import gen_ai_response_hints, gen_ai_response_question
+from backend.services.prompt_assembly import AssembledPrompt, get_prompt_assembler
+from backend.services.prompts import get_prompts
+
+QUESTION_ARTIFACT_PATH = os.getenv("QUESTION_ARTIFACT_PATH") or str(
+    Path(__file__).resolve().parent.parent / "precomputed" / "questions.json"
+)
+QUESTION_ARTIFACT_RELOAD_SECONDS = float(os.getenv("QUESTION_ARTIFACT_RELOAD_SECONDS", "5"))
+QUESTION_PRECOMPUTE_CONCURRENCY = int(os.getenv("QUESTION_PRECOMPUTE_CONCURRENCY", "4"))
+QUESTION_HINT_STEPS = int(os.getenv("QUESTION_HINT_STEPS", "3"))
+
+# Bump when the entry layout or what goes into a key changes
+ARTIFACT_FORMAT = 1
+
+EXPLANATION_TEMPERATURE = 0.5
+HINT_LADDER_TEMPERATURE = 0.3
+
+_LADDER_LINE = re.compile(r"^\s*(?:\d+[.)]|[-*])\s+(.*\S)\s*$")
+
+logger = logging.getLogger(__name__)
+
+
+def entry_id(case_id: str, index: int) -> str:
+    return f"{case_id}/{index}"
+
+
+def _part_key(kind: str, prompt: AssembledPrompt, question: Question, model: str, temperature: float) -> str:
+    material = json.dumps(
+        [ARTIFACT_FORMAT, kind, prompt.instructions, question.text, question.reveal_answer,
+         question.hints or [], model, temperature],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def parse_ladder(text: str, steps: int) -> List[str]:
+    """Hints from a numbered or bulleted reply; a reply without a list is taken one line per hint."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    hints = [match.group(1) for match in map(_LADDER_LINE.match, lines) if match]
+    return (hints or [line.strip() for line in lines])[:steps]
+
+
+@dataclass
+class QuestionJob:
+    """What one question needs: the prompts and keys of its two parts, and which of them are stale."""
+    case: CaseInterview
+    index: int
+    explanation_prompt: AssembledPrompt
+    ladder_prompt: AssembledPrompt
+    keys: Dict[str, str] = field(default_factory=dict)
+    stale: Tuple[str, ...] = ()
+
+    @property
+    def question(self) -> Question:
+        return self.case.description.questions[self.index]
+
+
+class PrecomputedQuestions:
+    """The artifact as seen by one worker: read-only lookups that check each part's key against the live case."""
+
+    def __init__(
+        self,
+        path: str = QUESTION_ARTIFACT_PATH,
+        reload_seconds: float = QUESTION_ARTIFACT_RELOAD_SECONDS,
+        steps: int = QUESTION_HINT_STEPS,
+    ):
+        self.path = Path(path)
+        self.reload_seconds = reload_seconds
+        self.steps = steps
+        self.entries: Dict[str, Dict] = {}
+        self._mtime_ns: Optional[int] = None
+        self._checked_at = float("-inf")
+        # (case id, content hash, prompts version, question index, models) -> part keys
+        self._keys: Dict[Tuple, Dict[str, str]] = {}
+
+    def maybe_reload(self) -> None:
+        if time.monotonic() - self._checked_at < self.reload_seconds:
+            return
+        self._checked_at = time.monotonic()
+        try:
+            mtime_ns = self.path.stat().st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if mtime_ns == self._mtime_ns:
+            return
+        self._mtime_ns = mtime_ns
+        self.entries = {}
+        if mtime_ns is None:
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read the question artifact %s: %s", self.path, e)
+            return
+        if data.get("format") != ARTIFACT_FORMAT:
+            logger.warning("Ignoring the question artifact %s: format %s, expected %s", self.path, data.get("format"), ARTIFACT_FORMAT)
+            return
+        self.entries = data.get("entries", {})
+
+    def prompts(self, case: CaseInterview) -> Tuple[AssembledPrompt, AssembledPrompt]:
+        assembler = get_prompt_assembler()
+        return (
+            assembler.assemble("question_prompt", case),
+            assembler.assemble("hint_ladder_prompt", case, steps=str(self.steps)),
+        )
+
+    def job(self, case: CaseInterview, index: int) -> QuestionJob:
+        explanation_prompt, ladder_prompt = self.prompts(case)
+        job = QuestionJob(case, index, explanation_prompt, ladder_prompt)
+        router = get_router()
+        explanation_model, ladder_model = router.models("question")[0], router.models("hints")[0]
+        job.keys = {
+            "explanation": _part_key("explanation", explanation_prompt, job.question, explanation_model, EXPLANATION_TEMPERATURE),
+            "hint_ladder": _part_key("hint_ladder", ladder_prompt, job.question, ladder_model, HINT_LADDER_TEMPERATURE),
+        }
+        return job
+
+    def _current_keys(self, case: CaseInterview, index: int) -> Dict[str, str]:
+        router = get_router()
+        memo = (
+            case.id, get_case_store().content_hash(case.id) or case_content_hash(case), get_prompts().version,
+            index, router.models("question")[0], router.models("hints")[0],
+        )
+        keys = self._keys.get(memo)
+        if keys is None:
+            if len(self._keys) > 100_000:
+                self._keys.clear()
+            keys = self._keys[memo] = self.job(case, index).keys
+        return keys
+
+    def _part(self, case: CaseInterview, index: int, part: str) -> Optional[Dict]:
+        self.maybe_reload()
+        entry = self.entries.get(entry_id(case.id, index))
+        if entry is None or part not in entry:
+            return None
+        stored = entry[part]
+        return stored if stored.get("key") == self._current_keys(case, index)[part] else None
+
+    def explanation(self, case: CaseInterview, index: int) -> Optional[str]:
+        """The precomputed explanation of question `index`, or None when there is no current one."""
+        stored = self._part(case, index, "explanation")
+        return stored["text"] if stored is not None else None
+
+    def hint_ladder(self, case: CaseInterview, index: int) -> Optional[List[str]]:
+        stored = self._part(case, index, "hint_ladder")
+        return stored["hints"] if stored is not None else None
+
+
+def write_artifact(path: Path, entries: Dict[str, Dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"format": ARTIFACT_FORMAT, "entries": entries}, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, path)  # atomic, so workers never read half a file
+
+
+async def precompute(
+    store: Optional[CaseStore] = None,
+    artifact: Optional[PrecomputedQuestions] = None,
+    concurrency: int = QUESTION_PRECOMPUTE_CONCURRENCY,
+    force: bool = False,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """
+    Brings the artifact up to date with the store and prompts. Returns counts of questions and of
+    parts generated, kept, failed, and entries dropped. Parts that fail keep their old entry out of
+    the artifact, so the live call covers them until the next run.
+    """
+    store = store or get_case_store()
+    artifact = artifact or PrecomputedQuestions(reload_seconds=0)
+    artifact.maybe_reload()
+    old = artifact.entries
+
+    jobs: List[QuestionJob] = []
+    for case in store.list_cases():
+        for index in range(len(case.description.questions)):
+            job = artifact.job(case, index)
+            stored = old.get(entry_id(case.id, index), {})
+            job.stale = tuple(
+                part for part, key in job.keys.items() if force or stored.get(part, {}).get("key") != key
+            )
+            jobs.append(job)
+    live = {entry_id(job.case.id, job.index) for job in jobs}
+    report = {
+        "questions": len(jobs),
+        "generated": 0,
+        "kept": sum(2 - len(job.stale) for job in jobs),
+        "failed": 0,
+        "dropped": len(set(old) - live),
+    }
+    if dry_run:
+        report["stale"] = sum(len(job.stale) for job in jobs)
+        return report
+
+    entries: Dict[str, Dict] = {key: dict(old[key]) for key in live if key in old}
+    limit = asyncio.Semaphore(max(1, concurrency))
+    pending = sum(len(job.stale) for job in jobs)
+
+    async def generate(job: QuestionJob, part: str) -> None:
+        question = job.question
+        async with limit:
+            if part == "explanation":
+                prompt = job.explanation_prompt
+                result = await gen_ai_response_question(
+                    response_id=None,
+                    question=question.text,
+                    answer=question.reveal_answer,
+                    instructions=prompt.instructions,
+                    temperature=EXPLANATION_TEMPERATURE,
+                    prompt_cache_key=prompt.cache_key,
+                    store=False,
+                )
+            else:
+                prompt = job.ladder_prompt
+                result = await gen_ai_response_hints(
+                    question=question.text,
+                    answer=question.reveal_answer,
+                    hints=question.hints,
+                    instructions=prompt.instructions,
+                    temperature=HINT_LADDER_TEMPERATURE,
+                    prompt_cache_key=prompt.cache_key,
+                )
+        name = entry_id(job.case.id, job.index)
+        hints = parse_ladder(result["ai_message"], artifact.steps) if result.get("response_id") is not None else []
+        if result.get("response_id") is None or (part == "hint_ladder" and not hints):
+            report["failed"] += 1
+            entries.get(name, {}).pop(part, None)
+            print(f"[{report['generated'] + report['failed']}/{pending}] {name} {part} failed: {result.get('ai_message')}")
+            return
+        model = get_router().models("question" if part == "explanation" else "hints")[0]
+        stored = {"key": job.keys[part], "model": model, "generated_at": time.time()}
+        if part == "explanation":
+            stored["text"] = result["ai_message"]
+        else:
+            stored["hints"] = hints
+        entries.setdefault(name, {})[part] = stored
+        report["generated"] += 1
+        print(f"[{report['generated'] + report['failed']}/{pending}] {name} {part}")
+
+    await asyncio.gather(*(generate(job, part) for job in jobs for part in job.stale))
+    entries = {key: value for key, value in entries.items() if value}
+    await asyncio.to_thread(write_artifact, artifact.path, entries)
+    return report
+
+
+_precomputed: Optional[PrecomputedQuestions] = None
+
+
+def get_precomputed_questions() -> PrecomputedQuestions:
+    global _precomputed
+    if _precomputed is None:
+        _precomputed = PrecomputedQuestions()
+    return _precomputed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=QUESTION_PRECOMPUTE_CONCURRENCY, help="LLM calls in flight at once")
+    parser.add_argument("--force", action="store_true", help="regenerate every part, current or not")
+    parser.add_argument("--dry-run", action="store_true", help="only report what is stale")
+    args = parser.parse_args()
+
+    get_prompts().load()
+    started = time.perf_counter()
+    report = asyncio.run(precompute(concurrency=args.concurrency, force=args.force, dry_run=args.dry_run))
+    print(f"{report} in {time.perf_counter() - started:.1f}s -> {QUESTION_ARTIFACT_PATH}")
@@ -0,0 +1,54 @@
+"""
+Token-bucket limits for chat turns on the websocket.
+
+Every turn that reaches the LLM takes one token from the session's bucket and one from the
+global bucket. When either is empty the turn waits (the client is told with a "throttled"
+frame) instead of piling another upstream call onto the quota. Both buckets live in the shared
+state (services/shared_state.py): the session's is keyed by its session_id, so reconnecting does
+not refill it, and with SHARED_STATE_PATH set both budgets hold across all workers rather than per
+worker.
+"""
+import os
+from typing import Optional, Tuple
+
+from backend.services.shared_state import SharedState, get_shared_state
+
+# per websocket session: sustained turns per minute and how many may come back to back
+CHAT_SESSION_TURNS_PER_MINUTE = float(os.getenv("CHAT_SESSION_TURNS_PER_MINUTE", "12"))
+CHAT_SESSION_BURST = float(os.getenv("CHAT_SESSION_BURST", "4"))
+# all workers sharing the state: sustained turns per second across all sessions
+CHAT_GLOBAL_TURNS_PER_SECOND = float(os.getenv("CHAT_GLOBAL_TURNS_PER_SECOND", "20"))
+CHAT_GLOBAL_BURST = float(os.getenv("CHAT_GLOBAL_BURST", "40"))
+# messages a client may queue while a turn is running; beyond that they are dropped
+CHAT_MAX_PENDING_MESSAGES = int(os.getenv("CHAT_MAX_PENDING_MESSAGES", "20"))
+
+
+GLOBAL_BUCKET_KEY = "chat_turns"
+SESSION_BUCKET_PREFIX = "chat_session:"
+
+
+class ChatTurnLimiter:
+    """One per websocket: the session's bucket plus the global bucket, both in the shared state."""
+
+    def __init__(self, session_id: str, state: Optional[SharedState] = None):
+        self.session_key = SESSION_BUCKET_PREFIX + session_id
+        self.state = state or get_shared_state()
+
+    async def try_acquire(self) -> Tuple[float, Optional[str]]:
+        """
+        Takes a token from both buckets if both have one and returns (0.0, None).
+        Otherwise takes nothing and returns (seconds to wait, "session" | "global").
+        """
+        session_rate = CHAT_SESSION_TURNS_PER_MINUTE / 60
+        session_wait = await self.state.run(self.state.take_token, self.session_key, session_rate, CHAT_SESSION_BURST)
+        if session_wait:
+            return session_wait, "session"
+        # The session bucket goes first, so a session that is over its own budget never spends a global token
+        global_wait = await self.state.run(
+            self.state.take_token, GLOBAL_BUCKET_KEY, CHAT_GLOBAL_TURNS_PER_SECOND, CHAT_GLOBAL_BURST
+        )
+        if global_wait:
+            # the turn does not go ahead, so the session keeps its token
+            await self.state.run(self.state.give_back, self.session_key, session_rate, CHAT_SESSION_BURST)
+            return global_wait, "global"
+        return 0.0, None
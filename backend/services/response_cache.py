@@ -0,0 +1,274 @@
+"""
+Cache of follow-up replies to the clarifying questions everyone asks during a case.
+
+Within one case many users ask the same things ("what is the client's revenue?", "can you repeat
+the question?"), and each is otherwise a full LLM round trip. With RESPONSE_CACHE_ENABLED=1, a
+follow-up reply is remembered under (case id, interview phase, question index, prompt version,
+normalized message) and the next user asking the same thing in the same place gets it straight
+from memory. Only short messages (RESPONSE_CACHE_MAX_MESSAGE_CHARS) are cached: clarifying
+questions are short, answers to the case are not and are personal anyway.
+
+Lookups try the exact normalized message first. With RESPONSE_CACHE_SIMILARITY set they then ask
+a similarity index for the closest cached message in the same scope and accept it at
+RESPONSE_CACHE_THRESHOLD cosine similarity or more:
+    exact  -> no similarity index (default)
+    ngram  -> character trigram vectors in pure Python
+    numpy  -> hashed character n-gram vectors scored with one matrix product (needs NumPy)
+
+Entries are evicted least recently used first past RESPONSE_CACHE_MAX_ENTRIES, and expire after
+RESPONSE_CACHE_TTL_SECONDS. The cache is per worker: the similarity indexes are in-memory structures.
+
+A reply served from the cache does not extend the session's response chain. The exchange is kept
+on the session (ChatSession.unchained) and handed to the model with the next real follow-up, so
+the conversation the model sees stays complete.
+"""
+import math
+import os
+import re
+import time
+import unicodedata
+import zlib
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from backend.services.metrics import RESPONSE_CACHE_ENTRIES, RESPONSE_CACHE_EVICTIONS, RESPONSE_CACHE_LOOKUPS
+
+try:
+    import numpy  # optional: only used by the "numpy" similarity index
+except ImportError:
+    numpy = None
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "0") in ("1", "true")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "20000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(6 * 60 * 60)))
+RESPONSE_CACHE_MAX_MESSAGE_CHARS = int(os.getenv("RESPONSE_CACHE_MAX_MESSAGE_CHARS", "160"))
+RESPONSE_CACHE_SIMILARITY = os.getenv("RESPONSE_CACHE_SIMILARITY", "exact")
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.9"))
+
+# (case id, phase, question index, prompt version)
+Scope = Tuple[str, str, int, str]
+
+_NOT_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_message(text: str) -> str:
+    """Case, punctuation, accents and spacing do not change what was asked."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _SPACES.sub(" ", _NOT_WORD.sub(" ", text)).strip()
+
+
+def _ngrams(text: str, n: int = 3) -> List[str]:
+    padded = f" {text} "
+    return [padded[i:i + n] for i in range(max(1, len(padded) - n + 1))]
+
+
+class SimilarityIndex:
+    """Finds the cached message in a scope that is closest to a new one."""
+
+    def add(self, scope: Scope, text: str) -> None:
+        raise NotImplementedError
+
+    def remove(self, scope: Scope, text: str) -> None:
+        raise NotImplementedError
+
+    def nearest(self, scope: Scope, text: str) -> Optional[Tuple[str, float]]:
+        """(cached normalized message, cosine similarity) or None when the scope is empty."""
+        raise NotImplementedError
+
+
+class NgramIndex(SimilarityIndex):
+    """Cosine over character trigram counts, scanning only the messages that share a trigram."""
+
+    def __init__(self):
+        self._vectors: Dict[Scope, Dict[str, Tuple[Counter, float]]] = {}
+        # scope -> trigram -> messages containing it
+        self._postings: Dict[Scope, Dict[str, set]] = {}
+
+    @staticmethod
+    def _vector(text: str) -> Tuple[Counter, float]:
+        counts = Counter(_ngrams(text))
+        return counts, math.sqrt(sum(count * count for count in counts.values()))
+
+    def add(self, scope: Scope, text: str) -> None:
+        vector = self._vector(text)
+        self._vectors.setdefault(scope, {})[text] = vector
+        postings = self._postings.setdefault(scope, {})
+        for gram in vector[0]:
+            postings.setdefault(gram, set()).add(text)
+
+    def remove(self, scope: Scope, text: str) -> None:
+        vectors = self._vectors.get(scope, {})
+        vector = vectors.pop(text, None)
+        if vector is None:
+            return
+        postings = self._postings[scope]
+        for gram in vector[0]:
+            postings[gram].discard(text)
+            if not postings[gram]:
+                del postings[gram]
+        if not vectors:
+            del self._vectors[scope], self._postings[scope]
+
+    def nearest(self, scope: Scope, text: str) -> Optional[Tuple[str, float]]:
+        vectors = self._vectors.get(scope)
+        if not vectors:
+            return None
+        counts, norm = self._vector(text)
+        postings = self._postings[scope]
+        candidates = set().union(*(postings.get(gram, ()) for gram in counts))
+        best: Optional[Tuple[str, float]] = None
+        for candidate in candidates:
+            other, other_norm = vectors[candidate]
+            score = sum(count * other[gram] for gram, count in counts.items()) / (norm * other_norm)
+            if best is None or score > best[1]:
+                best = (candidate, score)
+        return best
+
+
+class NumpyIndex(SimilarityIndex):
+    """Hashed character n-gram (2 to 4) vectors, unit length, one row per cached message."""
+
+    DIMENSIONS = 1024
+
+    def __init__(self):
+        if numpy is None:
+            raise RuntimeError("RESPONSE_CACHE_SIMILARITY=numpy needs NumPy installed")
+        # scope -> (messages, matrix with one unit-length row per message)
+        self._scopes: Dict[Scope, Tuple[List[str], "numpy.ndarray"]] = {}
+
+    def _vector(self, text: str) -> "numpy.ndarray":
+        vector = numpy.zeros(self.DIMENSIONS, dtype=numpy.float32)
+        for n in (2, 3, 4):
+            for gram in _ngrams(text, n):
+                vector[zlib.crc32(gram.encode("utf-8")) % self.DIMENSIONS] += 1.0
+        norm = numpy.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def add(self, scope: Scope, text: str) -> None:
+        texts, matrix = self._scopes.get(scope, ([], numpy.zeros((0, self.DIMENSIONS), dtype=numpy.float32)))
+        if text in texts:
+            return
+        self._scopes[scope] = (texts + [text], numpy.vstack([matrix, self._vector(text)]))
+
+    def remove(self, scope: Scope, text: str) -> None:
+        texts, matrix = self._scopes.get(scope, ([], None))
+        if text not in texts:
+            return
+        index = texts.index(text)
+        if len(texts) == 1:
+            del self._scopes[scope]
+        else:
+            self._scopes[scope] = (texts[:index] + texts[index + 1:], numpy.delete(matrix, index, axis=0))
+
+    def nearest(self, scope: Scope, text: str) -> Optional[Tuple[str, float]]:
+        texts, matrix = self._scopes.get(scope, ([], None))
+        if not texts:
+            return None
+        scores = matrix @ self._vector(text)
+        best = int(scores.argmax())
+        return texts[best], float(scores[best])
+
+
+def make_similarity_index(kind: str = RESPONSE_CACHE_SIMILARITY) -> Optional[SimilarityIndex]:
+    if kind == "exact":
+        return None
+    if kind == "ngram":
+        return NgramIndex()
+    if kind == "numpy":
+        return NumpyIndex()
+    raise ValueError(f"Unknown RESPONSE_CACHE_SIMILARITY {kind!r} (expected 'exact', 'ngram' or 'numpy')")
+
+
+@dataclass
+class CachedReply:
+    ai_message: str
+    stored_at: float
+    hits: int = 0
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+        max_message_chars: int = RESPONSE_CACHE_MAX_MESSAGE_CHARS,
+        threshold: float = RESPONSE_CACHE_THRESHOLD,
+        index: Optional[SimilarityIndex] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_message_chars = max_message_chars
+        self.threshold = threshold
+        self.index = index
+        self._entries: "OrderedDict[Tuple[Scope, str], CachedReply]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _key(self, message: str) -> Optional[str]:
+        if len(message) > self.max_message_chars:
+            return None
+        return normalize_message(message) or None
+
+    def _drop(self, key: Tuple[Scope, str]) -> None:
+        del self._entries[key]
+        if self.index is not None:
+            self.index.remove(*key)
+
+    def _live(self, key: Tuple[Scope, str]) -> Optional[CachedReply]:
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry.stored_at >= self.ttl_seconds:
+            self._drop(key)
+            RESPONSE_CACHE_ENTRIES.set(len(self._entries))
+            return None
+        return entry
+
+    def lookup(self, scope: Scope, message: str) -> Optional[str]:
+        """The cached ai_message for this question in this scope, or None."""
+        normalized = self._key(message)
+        if normalized is None:
+            RESPONSE_CACHE_LOOKUPS.inc(result="uncacheable")
+            return None
+        key = (scope, normalized)
+        result = "hit_exact"
+        entry = self._live(key)
+        if entry is None and self.index is not None:
+            nearest = self.index.nearest(scope, normalized)
+            if nearest is not None and nearest[1] >= self.threshold:
+                key, result = (scope, nearest[0]), "hit_similar"
+                entry = self._live(key)
+        if entry is None:
+            RESPONSE_CACHE_LOOKUPS.inc(result="miss")
+            return None
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        RESPONSE_CACHE_LOOKUPS.inc(result=result)
+        return entry.ai_message
+
+    def store(self, scope: Scope, message: str, ai_message: str) -> None:
+        normalized = self._key(message)
+        if normalized is None or not ai_message:
+            return
+        key = (scope, normalized)
+        if key not in self._entries and self.index is not None:
+            self.index.add(scope, normalized)
+        self._entries[key] = CachedReply(ai_message=ai_message, stored_at=time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+            RESPONSE_CACHE_EVICTIONS.inc()
+        RESPONSE_CACHE_ENTRIES.set(len(self._entries))
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """The process-wide cache, or None unless RESPONSE_CACHE_ENABLED is set."""
+    global _cache
+    if _cache is None and RESPONSE_CACHE_ENABLED:
+        _cache = ResponseCache(index=make_similarity_index())
+    return _cache
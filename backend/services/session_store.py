@@ -0,0 +1,231 @@
+"""
+Server-side chat sessions, so a dropped or rebalanced websocket can pick up where it left off
+instead of paying for another /chat/initiate_chat call.
+
+A session holds the response-id chain (its last entry is what the next turn chains from), the
+current question index and the transcript. Sessions live in an in-memory LRU with a TTL. With
+more than one worker they are also written behind to the shared state (services/shared_state.py,
+SHARED_STATE_PATH, or a database of their own at SESSION_DB_PATH) every SESSION_FLUSH_SECONDS and
+when their socket closes. A resume reads the shared copy first, since the socket may have been
+served by another worker since this one last saw the session.
+"""
+import asyncio
+import json
+import logging
+import os
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Set
+
+from backend.services.shared_state import SharedState, SqliteState, get_shared_state
+
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(2 * 60 * 60)))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH")
+SESSION_FLUSH_SECONDS = float(os.getenv("SESSION_FLUSH_SECONDS", "1"))
+
+SESSION_NAMESPACE = "sessions"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ChatSession:
+    session_id: str
+    case_id: str
+    response_ids: List[str] = field(default_factory=list)
+    question_index: int = 0
+    # interview phase, see services/interview.py: intro | answer | analysis | complete | ended
+    phase: str = "intro"
+    # [{"role": "user" | "assistant", "content": str}, ...]
+    transcript: List[Dict[str, str]] = field(default_factory=list)
+    # question index (as a string, for JSON) -> what the user said while answering it
+    answers: Dict[str, List[str]] = field(default_factory=dict)
+    # context compaction (services/compaction.py): input tokens of the last turn, the running summary,
+    # how much of the transcript it covers, and the state the next follow-up starts a fresh chain from
+    context_tokens: int = 0
+    summary: Optional[str] = None
+    compacted_upto: int = 0
+    compact_state: Optional[str] = None
+    tokens_before_compaction: int = 0
+    compactions: int = 0
+    # replies served from the response cache (services/response_cache.py) since the last chained turn;
+    # they are not in the response chain, so the next follow-up sends them along
+    unchained: List[Dict[str, str]] = field(default_factory=list)
+    # hints of the current question's ladder already given (services/interview.py)
+    hints_given: int = 0
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def current_response_id(self) -> Optional[str]:
+        return self.response_ids[-1] if self.response_ids else None
+
+    @property
+    def last_ai_message(self) -> Optional[str]:
+        for message in reversed(self.transcript):
+            if message["role"] == "assistant":
+                return message["content"]
+        return None
+
+    def record_turn(self, user_message: Optional[str], ai_message: str, response_id: str) -> None:
+        if user_message is not None:
+            self.transcript.append({"role": "user", "content": user_message})
+        self.transcript.append({"role": "assistant", "content": ai_message})
+        self.response_ids.append(response_id)
+        self.unchained = []
+        self.updated_at = time.time()
+
+    def record_cached_turn(self, user_message: str, ai_message: str) -> None:
+        """A turn answered from the response cache: in the transcript, but not (yet) in the chain."""
+        exchange = [{"role": "user", "content": user_message}, {"role": "assistant", "content": ai_message}]
+        self.transcript.extend(exchange)
+        self.unchained.extend(exchange)
+        self.updated_at = time.time()
+
+    def record_local_turn(self, ai_message: str, response_id: str) -> None:
+        """
+        A reply served from local data (precomputed explanations and hints, services/question_precompute.py):
+        in the transcript and sent along with the next call. A response_id other than the current one
+        starts a new branch, which carries nothing unchained over.
+        """
+        if response_id != self.current_response_id:
+            self.response_ids.append(response_id)
+            self.unchained = []
+        message = {"role": "assistant", "content": ai_message}
+        self.transcript.append(message)
+        self.unchained.append(message)
+        self.updated_at = time.time()
+
+    def record_answer(self, question_index: int, message: str) -> None:
+        self.answers.setdefault(str(question_index), []).append(message)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "ChatSession":
+        return cls(**json.loads(data))
+
+
+class SessionStore:
+    def __init__(
+        self,
+        ttl_seconds: float = SESSION_TTL_SECONDS,
+        max_entries: int = SESSION_MAX_ENTRIES,
+        backend: Optional[SharedState] = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.backend = backend
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        # written-behind: sessions changed since the last flush (kept even if evicted from the LRU)
+        self._dirty: Dict[str, ChatSession] = {}
+        self._flushes: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _expired(self, session: ChatSession) -> bool:
+        return time.time() - session.updated_at > self.ttl_seconds
+
+    def _remember(self, session: ChatSession) -> None:
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self.max_entries:
+            self._sessions.popitem(last=False)
+
+    def create(self, case_id: str, response_id: Optional[str] = None, ai_message: Optional[str] = None) -> ChatSession:
+        session = ChatSession(session_id=secrets.token_urlsafe(16), case_id=case_id)
+        if response_id is not None:
+            session.record_turn(None, ai_message or "", response_id)
+        self.save(session)
+        return session
+
+    def save(self, session: ChatSession) -> None:
+        """Call after changing a session; it will be in the next write-behind flush."""
+        session.updated_at = time.time()
+        self._remember(session)
+        if self.backend is not None:
+            self._dirty[session.session_id] = session
+
+    async def get(self, session_id: str) -> Optional[ChatSession]:
+        # Unflushed local changes are the newest copy; after that the shared one, which another
+        # worker may have moved on since this worker's copy was cached
+        session = self._dirty.get(session_id)
+        if session is None and self.backend is not None:
+            data = await self.backend.run(self.backend.get, SESSION_NAMESPACE, session_id)
+            session = ChatSession.from_json(data) if data is not None else None
+        session = session or self._sessions.get(session_id)
+        if session is None:
+            return None
+        if self._expired(session):
+            self._sessions.pop(session_id, None)
+            return None
+        self._remember(session)
+        return session
+
+    def evict_expired(self) -> None:
+        """Drops expired sessions from the front of the LRU (least recently used first)."""
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if not self._expired(session):
+                break
+            self._sessions.popitem(last=False)
+
+    async def flush(self) -> None:
+        if self.backend is None or not self._dirty:
+            return
+        pending = list(self._dirty.values())
+        self._dirty = {}
+        try:
+            await self.backend.run(
+                self.backend.set_many,
+                SESSION_NAMESPACE,
+                {session.session_id: session.to_json() for session in pending},
+                self.ttl_seconds,
+            )
+        except Exception as e:
+            logger.warning("Session write-behind failed, will retry: %r", e)
+            for session in pending:
+                self._dirty.setdefault(session.session_id, session)
+
+    def flush_soon(self) -> None:
+        """Starts a flush without waiting for it, e.g. when a socket closes and the client may reconnect elsewhere."""
+        if self.backend is not None and self._dirty:
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def run_write_behind(self, interval: float = SESSION_FLUSH_SECONDS) -> None:
+        """Background task started from the app lifespan: write-behind flushes and TTL eviction."""
+        last_purge = time.time()
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_expired()
+            await self.flush()
+            if time.time() - last_purge > self.ttl_seconds / 4:
+                last_purge = time.time()
+                if self.backend is not None:
+                    await self.backend.run(self.backend.purge_expired)
+                # the shared state also holds the per-session chat buckets, even when sessions live elsewhere
+                state = get_shared_state()
+                if state is not self.backend:
+                    await state.run(state.purge_expired)
+
+
+_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        if SESSION_DB_PATH:
+            backend = SqliteState(SESSION_DB_PATH)
+        else:
+            state = get_shared_state()
+            backend = state if state.shared else None  # one process: the LRU is all there is
+        _store = SessionStore(backend=backend)
+    return _store
@@ -0,0 +1,192 @@
+"""
+State that has to be the same in every worker: sessions, shared caches and rate-limit counters.
+
+SHARED_STATE_PATH picks the backend:
+    unset        -> InProcessState: plain dicts, only this process sees them (one uvicorn worker)
+    a file path  -> SqliteState: one SQLite database in WAL mode that every worker on the machine
+                    opens, so sessions resume, greetings are cached once and the global chat budget
+                    holds across `uvicorn --workers N`
+
+Both store string values under (namespace, key) with an optional TTL, and keep token buckets whose
+take_token() is atomic across processes (BEGIN IMMEDIATE in SQLite). Buckets untouched for
+BUCKET_IDLE_SECONDS have refilled and are dropped by purge_expired() (they come back full). Several pods need the database
+on storage they all reach; for that, put a networked store behind the same four methods.
+
+The methods are blocking. InProcessState never blocks in practice, so run() calls it inline;
+SqliteState goes through asyncio.to_thread like the other SQLite backends in this package.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, Callable, Dict, Optional, Tuple
+
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH")
+# every bucket in use refills within this (per-session chat buckets: burst / rate = 20 s by default)
+BUCKET_IDLE_SECONDS = 60 * 60
+
+
+class SharedState:
+    # True when other processes see the same state
+    shared = False
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set_many(self, namespace: str, items: Dict[str, str], ttl_seconds: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str) -> None:
+        raise NotImplementedError
+
+    def take_token(self, key: str, rate_per_second: float, capacity: float, tokens: float = 1.0) -> float:
+        """
+        Takes `tokens` from the bucket `key` (created full) if it has them and returns 0.0.
+        Otherwise takes nothing and returns the seconds until they will be there.
+        """
+        raise NotImplementedError
+
+    def give_back(self, key: str, rate_per_second: float, capacity: float, tokens: float = 1.0) -> None:
+        """Returns tokens take_token() handed out for something that did not go ahead after all."""
+        self.take_token(key, rate_per_second, capacity, -tokens)
+
+    def purge_expired(self) -> None:
+        pass
+
+    def set(self, namespace: str, key: str, value: str, ttl_seconds: Optional[float] = None) -> None:
+        self.set_many(namespace, {key: value}, ttl_seconds)
+
+    async def run(self, method: Callable[..., Any], *args) -> Any:
+        """Calls one of the methods above from the event loop."""
+        if self.shared:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+
+def _bucket_wait(tokens_left: float, rate_per_second: float, tokens: float) -> float:
+    return (tokens - tokens_left) / rate_per_second if rate_per_second > 0 else float("inf")
+
+
+class InProcessState(SharedState):
+    def __init__(self):
+        # (namespace, key) -> (expires_at or None, value)
+        self._values: Dict[Tuple[str, str], Tuple[Optional[float], str]] = {}
+        # key -> (tokens, updated_at)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        entry = self._values.get((namespace, key))
+        if entry is None:
+            return None
+        if entry[0] is not None and entry[0] <= time.time():
+            del self._values[(namespace, key)]
+            return None
+        return entry[1]
+
+    def set_many(self, namespace: str, items: Dict[str, str], ttl_seconds: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl_seconds if ttl_seconds is not None else None
+        for key, value in items.items():
+            self._values[(namespace, key)] = (expires_at, value)
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._values.pop((namespace, key), None)
+
+    def take_token(self, key: str, rate_per_second: float, capacity: float, tokens: float = 1.0) -> float:
+        now = time.monotonic()
+        left, updated_at = self._buckets.get(key, (capacity, now))
+        left = min(capacity, left + (now - updated_at) * rate_per_second)
+        if left < tokens:
+            self._buckets[key] = (left, now)
+            return _bucket_wait(left, rate_per_second, tokens)
+        self._buckets[key] = (min(capacity, left - tokens), now)
+        return 0.0
+
+    def purge_expired(self) -> None:
+        now = time.time()
+        for composite, (expires_at, _) in list(self._values.items()):
+            if expires_at is not None and expires_at <= now:
+                del self._values[composite]
+        idle_before = time.monotonic() - BUCKET_IDLE_SECONDS
+        for key, (_, updated_at) in list(self._buckets.items()):
+            if updated_at < idle_before:
+                del self._buckets[key]
+
+
+class SqliteState(SharedState):
+    """One connection per thread (asyncio.to_thread reuses a small pool of them)."""
+
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with closing(sqlite3.connect(self.path, timeout=5)) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS shared_values (namespace TEXT NOT NULL, key TEXT NOT NULL, "
+                "value TEXT NOT NULL, expires_at REAL, PRIMARY KEY (namespace, key))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit, transactions are opened explicitly where they matter
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")  # WAL: durable against process crashes, which is what matters here
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT value FROM shared_values WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_many(self, namespace: str, items: Dict[str, str], ttl_seconds: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl_seconds if ttl_seconds is not None else None
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO shared_values (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                [(namespace, key, value, expires_at) for key, value in items.items()],
+            )
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._conn().execute("DELETE FROM shared_values WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def take_token(self, key: str, rate_per_second: float, capacity: float, tokens: float = 1.0) -> float:
+        conn = self._conn()
+        now = time.time()  # wall clock: monotonic clocks are not comparable between processes
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")  # take the write lock before reading, so two workers cannot both spend the last token
+            row = conn.execute("SELECT tokens, updated_at FROM token_buckets WHERE key = ?", (key,)).fetchone()
+            left = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate_per_second)
+            wait = 0.0 if left >= tokens else _bucket_wait(left, rate_per_second, tokens)
+            conn.execute(
+                "INSERT OR REPLACE INTO token_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                (key, min(capacity, left - tokens) if not wait else left, now),
+            )
+        return wait
+
+    def purge_expired(self) -> None:
+        now = time.time()
+        self._conn().execute("DELETE FROM shared_values WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        self._conn().execute("DELETE FROM token_buckets WHERE updated_at < ?", (now - BUCKET_IDLE_SECONDS,))
+
+
+_state: Optional[SharedState] = None
+
+
+def get_shared_state() -> SharedState:
+    global _state
+    if _state is None:
+        _state = SqliteState(SHARED_STATE_PATH) if SHARED_STATE_PATH else InProcessState()
+    return _state
@@ -0,0 +1,84 @@
+import asyncio
+import os
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+# A websocket frame per token costs more in framing and JSON than the token itself, so deltas are
+# merged until either enough text has piled up or the oldest buffered piece has waited long enough.
+STREAM_COALESCE_MIN_CHARS = int(os.getenv("STREAM_COALESCE_MIN_CHARS", "48"))
+STREAM_COALESCE_INTERVAL_MS = float(os.getenv("STREAM_COALESCE_INTERVAL_MS", "60"))
+
+
+async def coalesce_deltas(
+    events: AsyncIterator[Dict[str, Any]],
+    min_chars: int = STREAM_COALESCE_MIN_CHARS,
+    max_interval_ms: float = STREAM_COALESCE_INTERVAL_MS,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Merges consecutive {"type": "delta"} events from llm_service's streaming calls.
+    The first delta is passed through straight away so time-to-first-token is not delayed; after
+    that, buffered text is flushed once it reaches min_chars or has been held for max_interval_ms,
+    even if the upstream goes quiet in between. Any other event ("done", "error") flushes the buffer
+    first and is passed through unchanged.
+    """
+    loop = asyncio.get_running_loop()
+    max_interval = max_interval_ms / 1000
+    buffer: List[str] = []
+    buffered_chars = 0
+    held_since: Optional[float] = None
+    first_sent = False
+
+    def flush() -> Dict[str, Any]:
+        nonlocal buffered_chars, held_since
+        frame = {"type": "delta", "delta": "".join(buffer)}
+        buffer.clear()
+        buffered_chars = 0
+        held_since = None
+        return frame
+
+    async with aclosing(events):
+        iterator = events.__aiter__()
+        pending: Optional[asyncio.Future] = None
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+                wait_for = None if held_since is None else max(0.0, held_since + max_interval - loop.time())
+                done, _ = await asyncio.wait({pending}, timeout=wait_for)
+                if not done:
+                    # Upstream is slow to produce the next token: don't sit on what we have
+                    yield flush()
+                    continue
+
+                try:
+                    event = pending.result()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    pending = None
+
+                if event.get("type") != "delta":
+                    if buffer:
+                        yield flush()
+                    yield event
+                    continue
+
+                if not first_sent:
+                    first_sent = True
+                    yield event
+                    continue
+
+                buffer.append(event["delta"])
+                buffered_chars += len(event["delta"])
+                if held_since is None:
+                    held_since = loop.time()
+                if buffered_chars >= min_chars:
+                    yield flush()
+        finally:
+            if pending is not None:
+                # Let the cancelled __anext__ unwind before aclosing() closes the generator
+                pending.cancel()
+                await asyncio.wait({pending})
+
+    if buffer:
+        yield flush()
@@ -0,0 +1,74 @@
+import asyncio
+import sqlite3
+
+from backend.services.analysis_jobs import COMPLETE, AnalysisItem, AnalysisJob, AnalysisQueue, SqliteAnalysisBackend
+
+
+class FlakyBackend(SqliteAnalysisBackend):
+    """Fails the first `failures` saves like a locked database would."""
+
+    def __init__(self, path, failures):
+        super().__init__(path)
+        self.failures = failures
+        self.attempts = 0
+
+    def save(self, job, owner):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise sqlite3.OperationalError("database is locked")
+        return super().save(job, owner)
+
+
+def _job():
+    item = AnalysisItem(question_index=0, question="How big?", reference_answer="1bn", user_answer="2bn")
+    return AnalysisJob(job_id="job1", session_id="session1", case_id="case1", anchor_response_id=None, items=[item])
+
+
+def _queue(backend):
+    return AnalysisQueue(retry_base_seconds=0.001, retry_max_seconds=0.01, backend=backend)
+
+
+def test_a_failed_save_is_retried_with_the_same_snapshot(tmp_path):
+    backend = FlakyBackend(str(tmp_path / "jobs.db"), failures=2)
+    queue = _queue(backend)
+    job = _job()
+
+    async def scenario():
+        queue._persist_soon(job)
+        await queue.flush(timeout=5)
+
+    asyncio.run(scenario())
+
+    assert backend.attempts == 3
+    assert backend.load("job1") == job
+
+
+def test_a_newer_snapshot_wins_over_the_failed_one(tmp_path):
+    backend = FlakyBackend(str(tmp_path / "jobs.db"), failures=1)
+    queue = _queue(backend)
+    job = _job()
+
+    async def scenario():
+        queue._persist_soon(job)
+        await asyncio.sleep(0)  # the writer takes the first snapshot
+        job.items[0].status, job.items[0].analysis = COMPLETE, "Good sizing."
+        queue._persist_soon(job)
+        await queue.flush(timeout=5)
+
+    asyncio.run(scenario())
+
+    assert backend.load("job1").items[0].analysis == "Good sizing."
+
+
+def test_flush_gives_up_after_its_timeout(tmp_path):
+    backend = FlakyBackend(str(tmp_path / "jobs.db"), failures=10**9)
+    queue = _queue(backend)
+
+    async def scenario():
+        queue._persist_soon(_job())
+        await queue.flush(timeout=0.2)
+        await asyncio.sleep(0)
+        return queue._tasks
+
+    assert not asyncio.run(scenario())
+    assert backend.load("job1") is None
@@ -0,0 +1,81 @@
+import struct
+
+import pytest
+
+from backend.database.catalogue import (
+    CATALOGUE_FORMAT, CatalogueError, CatalogueReader, CatalogueWriter, catalogue_version,
+)
+
+HASHES = ["aa" * 32, "bb" * 32, "cc" * 32]
+
+
+def _write(path):
+    with CatalogueWriter(str(path)) as writer:
+        writer.add("one", HASHES[0], b'{"id":"one"}', b'{"s":1}', "Beautify", "McKinsey Study")
+        writer.add("two", HASHES[1], b'{"id":"two"}', b'{"s":2}', "Beautify", "BCG Casebook")
+        writer.add("three", HASHES[2], b'{"id":"three"}', b"{}", "Shop", "McKinsey Study")
+    return path
+
+
+def test_round_trip(tmp_path):
+    path = _write(tmp_path / "cases.catalogue")
+
+    with CatalogueReader(str(path)) as catalogue:
+        assert catalogue.ids == ["one", "two", "three"]
+        assert catalogue.version == catalogue_version(zip(catalogue.ids, HASHES))
+        assert [catalogue.record(number) for number in range(3)] == [b'{"id":"one"}', b'{"id":"two"}', b'{"id":"three"}']
+        assert [catalogue.summary(number) for number in range(3)] == [b'{"s":1}', b'{"s":2}', b"{}"]
+        assert [catalogue.content_hash(number) for number in range(3)] == HASHES
+        assert catalogue.strings == ["Beautify", "McKinsey Study", "BCG Casebook", "Shop"]
+        assert list(catalogue.rows()) == [(0, 1), (0, 2), (3, 1)]
+        row = catalogue.row(2)
+        assert (row.company, row.source, row.content_hash) == ("Shop", "McKinsey Study", HASHES[2])
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_aborted_writer_leaves_nothing(tmp_path):
+    with pytest.raises(RuntimeError):
+        with CatalogueWriter(str(tmp_path / "cases.catalogue")) as writer:
+            writer.add("one", HASHES[0], b"{}", b"{}", "Beautify", "McKinsey Study")
+            raise RuntimeError("stop")
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_other_format_is_refused(tmp_path):
+    path = _write(tmp_path / "cases.catalogue")
+    with open(path, "r+b") as f:
+        f.seek(8)
+        f.write(struct.pack("<I", CATALOGUE_FORMAT + 1))
+
+    with pytest.raises(CatalogueError, match=f"format {CATALOGUE_FORMAT + 1}, expected {CATALOGUE_FORMAT}"):
+        CatalogueReader(str(path))
+
+
+def test_not_a_catalogue(tmp_path):
+    path = tmp_path / "cases.catalogue"
+    path.write_bytes(b"{}" * 100)
+
+    with pytest.raises(CatalogueError, match="not a case catalogue"):
+        CatalogueReader(str(path))
+
+
+@pytest.mark.parametrize("keep", [10, 60, -4])
+def test_truncated_file_is_refused(tmp_path, keep):
+    path = _write(tmp_path / "cases.catalogue")
+    data = path.read_bytes()
+    path.write_bytes(data[:keep])
+
+    with pytest.raises(CatalogueError):
+        CatalogueReader(str(path))
+
+
+def test_truncated_while_open_raises_instead_of_crashing(tmp_path):
+    path = _write(tmp_path / "cases.catalogue")
+    with CatalogueReader(str(path)) as catalogue:
+        assert catalogue.record(0) == b'{"id":"one"}'
+        with open(path, "r+b") as f:
+            f.truncate(20)
+
+        with pytest.raises(CatalogueError, match="truncated while in use"):
+            catalogue.record(2)
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.database.case_store import CaseStore
+from backend.routers import cases
+from backend.services.catalogue_cache import CachedBody, CatalogueCache, decode_cursor, encode_cursor
+
+
+def _case(number):
+    return {
+        "name": f"Case {number}",
+        "company": "Beautify" if number % 2 else "Shop",
+        "source": "McKinsey Study",
+        "url": f"https://example.com/{number}",
+        "description": {
+            "client_name": f"Client {number}",
+            "client_goal": "Grow the online channel.",
+            "client_description": f"A cosmetics retailer, number {number}.",
+            "situation_description": "Sales are moving online.",
+            "questions": [{"text": "How big is the market?", "reveal_answer": "Large."}],
+        },
+    }
+
+
+@pytest.fixture
+def library(tmp_path):
+    for number in range(7):
+        (tmp_path / f"case{number}.json").write_text(json.dumps(_case(number)))
+    return tmp_path
+
+
+@pytest.fixture
+def catalogue(library):
+    return CatalogueCache(CaseStore(str(library), refresh_seconds=0))
+
+
+@pytest.fixture
+def client(catalogue, monkeypatch):
+    monkeypatch.setattr(cases, "get_catalogue_cache", lambda: catalogue)
+    app = FastAPI()
+    app.include_router(cases.router, prefix="/cases")
+    return TestClient(app)
+
+
+def _names(response):
+    return [case["name"] for case in response.json()]
+
+
+def test_cursor_round_trip():
+    state = {"after": "case-1", "offset": 40}
+    assert decode_cursor(encode_cursor(state)) == state
+    assert decode_cursor(None) == {}
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", encode_cursor({"after": "x"})[:-3] + "@@@", "WzEsMl0"])
+def test_cursor_we_did_not_issue_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_browsing_walks_every_case_once(client):
+    names, cursor = [], None
+    while True:
+        response = client.get("/cases/", params={"view": "summary", "limit": 3, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        assert response.headers["X-Total-Count"] == "7"
+        names += _names(response)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert sorted(names) == [f"Case {number}" for number in range(7)]
+
+
+def test_tampered_cursor_is_a_400(client):
+    cursor = client.get("/cases/", params={"limit": 3}).headers["X-Next-Cursor"]
+
+    response = client.get("/cases/", params={"limit": 3, "cursor": cursor[:-2] + "!!"})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("offset", ["abc", "3", 1.5, -1, [3], None, True])
+def test_offset_that_is_not_an_int_is_a_400(client, offset):
+    response = client.get("/cases/", params={"q": "market", "limit": 3, "cursor": encode_cursor({"offset": offset})})
+
+    assert response.status_code == 400
+
+
+def test_search_pages_by_offset(client):
+    first = client.get("/cases/", params={"q": "market", "limit": 4})
+    second = client.get("/cases/", params={"q": "market", "limit": 4, "cursor": first.headers["X-Next-Cursor"]})
+
+    assert len(_names(first)) == 4 and len(_names(second)) == 3
+    assert not set(_names(first)) & set(_names(second))
+
+
+def test_cursor_after_a_removed_case_is_a_410(client, catalogue, library):
+    response = client.get("/cases/", params={"limit": 3})
+    last = response.json()[-1]
+    next((path for path in library.iterdir() if json.loads(path.read_text())["name"] == last["name"])).unlink()
+    catalogue.store.refresh()
+
+    response = client.get("/cases/", params={"limit": 3, "cursor": response.headers["X-Next-Cursor"]})
+
+    assert response.status_code == 410
+
+
+@pytest.mark.parametrize("q", ["the", "and of the", "", "  "])
+def test_query_without_searchable_words_matches_nothing(client, q):
+    response = client.get("/cases/", params={"q": q})
+
+    assert response.status_code == 200
+    assert response.json() == []
+    assert response.headers["X-Total-Count"] == "0"
+
+
+def test_case_bodies_are_built_off_the_event_loop_once(catalogue, monkeypatch):
+    threads = []
+    build = CachedBody.build
+
+    def recording_build(body, precompress=True):
+        threads.append(threading.current_thread())
+        return build(body, precompress)
+
+    monkeypatch.setattr(CachedBody, "build", staticmethod(recording_build))
+    case_id = catalogue.store.find()[0]
+
+    async def cold_requests():
+        return await asyncio.gather(*(catalogue.case(case_id) for _ in range(5)))
+
+    bodies = asyncio.run(cold_requests())
+
+    assert len(threads) == 1 and threads[0] is not threading.main_thread()
+    assert all(body is bodies[0] for body in bodies)
+    assert asyncio.run(catalogue.case("missing")) is None
+
+
+def test_case_endpoint_revalidates(client, catalogue):
+    case_id = catalogue.store.find()[0]
+    first = client.get(f"/cases/{case_id}")
+
+    again = client.get(f"/cases/{case_id}", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert first.status_code == 200 and first.json()["id"] == case_id
+    assert again.status_code == 304
+    assert client.get("/cases/missing").status_code == 404
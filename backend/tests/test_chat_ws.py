@@ -0,0 +1,52 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from backend.database.case_store import get_case_store
+from backend.main import app
+from backend.services import llm_provider, llm_service
+from backend.services.llm_provider import LatencyDistribution, StubProvider
+
+ORIGIN = {"origin": "http://localhost:3000"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    llm_provider.set_provider(StubProvider(latency=LatencyDistribution("fixed", median_ms=0), token_ms=0))
+    monkeypatch.setattr(llm_service, "_llm_semaphore", None)
+    with TestClient(app) as client:
+        yield client
+    llm_provider.set_provider(None)
+
+
+def test_interview_from_greeting_to_analysis(client):
+    case = get_case_store().list_cases()[0]
+    chat = client.post("/chat/initiate_chat", json={"case_id": case.id}).json()
+    assert chat["response_id"], chat
+
+    url = f"/ws/chat/{case.id}/{chat['response_id']}?session_id={chat['session_id']}"
+    with client.websocket_connect(url, headers=ORIGIN) as ws:
+        ws.receive_json()
+        ws.send_text(json.dumps({"type": "start"}))
+        ws.receive_json()
+        ws.receive_json()
+        ws.send_text("I would size the market first.")
+        assert "error" not in ws.receive_json()
+        ws.send_text(json.dumps({"type": "end"}))
+        ended = ws.receive_json()
+
+    assert ended["phase"] == "ended"
+    job = client.get(f"/analysis/{ended['analysis_job_id']}?wait=5").json()
+    assert job["status"] == "complete", job
+
+
+def test_other_origins_are_rejected(client):
+    case = get_case_store().list_cases()[0]
+
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect(f"/ws/chat/{case.id}/resp_1", headers={"origin": "http://evil.test"}) as ws:
+            ws.receive_json()
+
+    assert closed.value.code == 4003
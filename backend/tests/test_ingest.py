@@ -0,0 +1,73 @@
+import json
+
+from backend.database.catalogue import CatalogueReader
+from backend.database.ingest import ingest
+
+
+def _case(name, questions=1):
+    return {
+        "name": name,
+        "company": "Beautify",
+        "source": "McKinsey Study",
+        "url": f"https://example.com/{name}",
+        "description": {
+            "client_name": "Beautify",
+            "client_goal": "Grow online.",
+            "client_description": "A cosmetics company.",
+            "situation_description": "Sales are moving online.",
+            "questions": [{"text": f"Question {n}?", "reveal_answer": "An answer."} for n in range(questions)],
+        },
+    }
+
+
+def test_invalid_cases_are_skipped_and_the_rest_of_the_file_is_imported(tmp_path):
+    source = tmp_path / "cases"
+    source.mkdir()
+    (source / "book.json").write_text(json.dumps([_case("a"), _case("broken", questions=0), _case("b")]))
+    (source / "single.json").write_text(json.dumps(_case("c")))
+    destination = tmp_path / "cases.catalogue"
+
+    report = ingest(str(source), str(destination), workers=1)
+
+    assert report.cases == 3
+    assert report.invalid_cases == 1
+    assert report.failed_files == 1
+    assert [path for path, _ in report.errors] == [str(source / "book.json")]
+    with CatalogueReader(str(destination)) as catalogue:
+        names = [json.loads(catalogue.record(number))["name"] for number in range(len(catalogue))]
+    assert names == ["a", "b", "c"]
+
+
+def test_unparsable_files_are_left_out(tmp_path):
+    source = tmp_path / "cases"
+    source.mkdir()
+    (source / "bad.json").write_text('{"name": ')
+    (source / "good.json").write_text(json.dumps(_case("a")))
+
+    report = ingest(str(source), str(tmp_path / "cases.catalogue"), workers=1)
+
+    assert (report.cases, report.invalid_cases, report.failed_files) == (1, 0, 1)
+
+
+def test_duplicates_across_files_are_imported_once(tmp_path):
+    source = tmp_path / "cases"
+    source.mkdir()
+    (source / "one.json").write_text(json.dumps(_case("a")))
+    (source / "two.json").write_text(json.dumps([_case("a"), _case("b")]))
+
+    report = ingest(str(source), str(tmp_path / "cases.catalogue"), workers=1)
+
+    assert (report.cases, report.duplicates, report.failed_files) == (2, 1, 0)
+
+
+def test_strict_writes_nothing_when_a_case_is_invalid(tmp_path):
+    source = tmp_path / "cases"
+    source.mkdir()
+    (source / "book.json").write_text(json.dumps([_case("a"), _case("broken", questions=0)]))
+    destination = tmp_path / "cases.catalogue"
+
+    report = ingest(str(source), str(destination), workers=1, strict=True)
+
+    assert report.version is None
+    assert not destination.exists()
+    assert list(tmp_path.iterdir()) == [source]
@@ -0,0 +1,162 @@
+import asyncio
+
+import httpx
+import pytest
+from openai import APIConnectionError
+
+from backend.services import llm_resilience
+from backend.services.llm_resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, LLMUnavailable, Resilience
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(llm_resilience, "time", fake)
+    return fake
+
+
+def _breaker(**overrides):
+    settings = dict(enabled=True, window_seconds=30, min_calls=4, failure_ratio=0.5, open_seconds=10, max_open_seconds=30)
+    return CircuitBreaker(**{**settings, **overrides})
+
+
+def _open(breaker):
+    for failed in (False, False, True, True):
+        assert breaker.before_call() is False
+        breaker.record_failure() if failed else breaker.record_success()
+
+
+def _connection_error():
+    return APIConnectionError(request=httpx.Request("POST", "http://upstream.test/v1/responses"))
+
+
+def test_breaker_opens_at_the_failure_threshold(clock):
+    breaker = _breaker()
+    for failed in (False, False, True):
+        breaker.before_call()
+        breaker.record_failure() if failed else breaker.record_success()
+    assert breaker.state == CLOSED  # 1 failure in 3 calls: below min_calls
+
+    breaker.before_call()
+    breaker.record_failure()  # 2 of 4
+    assert breaker.state == OPEN
+    with pytest.raises(LLMUnavailable) as raised:
+        breaker.before_call()
+    assert raised.value.retry_after == pytest.approx(10)
+
+
+def test_breaker_ignores_failures_outside_the_window(clock):
+    breaker = _breaker()
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    clock.now += 31
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_success()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CLOSED  # 1 of the 4 calls in the window failed
+
+
+def test_half_open_lets_exactly_one_probe_through(clock):
+    breaker = _breaker()
+    _open(breaker)
+    clock.now += 10
+
+    assert breaker.before_call() is True
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(LLMUnavailable):
+        breaker.before_call()
+
+
+def test_failed_probe_doubles_the_open_time_up_to_the_maximum(clock):
+    breaker = _breaker()
+    _open(breaker)
+    clock.now += 10
+    for expected in (20, 30, 30):  # doubled each time, capped at max_open_seconds
+        assert breaker.before_call() is True
+        breaker.record_failure(probe=True)
+        assert breaker.state == OPEN
+        clock.now += expected - 0.5
+        with pytest.raises(LLMUnavailable):
+            breaker.before_call()
+        clock.now += 0.5
+
+
+def test_successful_probe_closes_and_resets_the_open_time(clock):
+    breaker = _breaker()
+    _open(breaker)
+    clock.now += 10
+    assert breaker.before_call() is True
+    breaker.record_failure(probe=True)
+    clock.now += 20
+    assert breaker.before_call() is True
+    breaker.record_success(probe=True)
+
+    assert breaker.state == CLOSED
+    assert breaker.before_call() is False
+    _open(breaker)
+    with pytest.raises(LLMUnavailable) as raised:
+        breaker.before_call()
+    assert raised.value.retry_after == pytest.approx(10)
+
+
+def test_neutral_probe_frees_the_probe_slot(clock):
+    breaker = _breaker()
+    _open(breaker)
+    clock.now += 10
+    assert breaker.before_call() is True
+    breaker.record_neutral(probe=True)
+    assert breaker.before_call() is True
+
+
+def test_call_retries_retryable_errors_then_succeeds():
+    calls = []
+
+    async def operation():
+        calls.append(1)
+        if len(calls) < 3:
+            raise _connection_error()
+        return "ok"
+
+    resilience = Resilience(breaker=_breaker(), attempts=3, base_delay=0, max_delay=0)
+    assert asyncio.run(resilience.call("test", operation, timeout=5)) == "ok"
+    assert len(calls) == 3
+
+
+def test_call_does_not_retry_or_count_other_errors():
+    calls = []
+
+    async def operation():
+        calls.append(1)
+        raise ValueError("bad request body")
+
+    breaker = _breaker(min_calls=1)
+    resilience = Resilience(breaker=breaker, attempts=3, base_delay=0, max_delay=0)
+    with pytest.raises(ValueError):
+        asyncio.run(resilience.call("test", operation, timeout=5))
+    assert len(calls) == 1
+    assert breaker.state == CLOSED
+
+
+def test_call_fails_fast_while_open(clock):
+    breaker = _breaker()
+    _open(breaker)
+    calls = []
+
+    async def operation():
+        calls.append(1)
+        return "ok"
+
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(Resilience(breaker=breaker).call("test", operation, timeout=5))
+    assert calls == []
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from backend.services import llm_provider, llm_resilience, llm_routing, llm_service
+from backend.services.llm_provider import LatencyDistribution, StubProvider
+
+CASE = dict(question="How big is the market?", answer="About 1bn.", instructions="Be the interviewer.")
+
+
+@pytest.fixture(autouse=True)
+def stub(monkeypatch):
+    provider = StubProvider(latency=LatencyDistribution("fixed", median_ms=0), token_ms=0)
+    llm_provider.set_provider(provider)
+    llm_resilience.set_resilience(None)
+    llm_routing.set_router(None)
+    monkeypatch.setattr(llm_service, "_llm_semaphore", None)  # bound to the previous test's loop
+    yield provider
+    llm_provider.set_provider(None)
+    llm_resilience.set_resilience(None)
+    llm_routing.set_router(None)
+
+
+CALLS = {
+    "get_ai_response_initial": lambda: llm_service.get_ai_response_initial(
+        instructions="Greet the candidate.", current_case_context="A cosmetics company."),
+    "get_ai_response_follow_up": lambda: llm_service.get_ai_response_follow_up(
+        response_id="resp_1", instructions="Follow up.", curr_message="Where do I start?",
+        history=[{"role": "user", "content": "Hi"}]),
+    "gen_ai_response_question": lambda: llm_service.gen_ai_response_question(response_id=None, **CASE),
+    "gen_ai_response_question_unstored": lambda: llm_service.gen_ai_response_question(response_id=None, store=False, **CASE),
+    "gen_ai_response_hints": lambda: llm_service.gen_ai_response_hints(hints=["Think of channels."], **CASE),
+    "gen_ai_response_answer": lambda: llm_service.gen_ai_response_answer(
+        response_id="resp_1", curr_message="It is 2bn.", **CASE),
+    "gen_ai_response_analysis": lambda: llm_service.gen_ai_response_analysis(
+        response_id="resp_1", user_answer="It is 2bn.", **CASE),
+    "gen_ai_response_summary": lambda: llm_service.gen_ai_response_summary(
+        transcript="user: hi\nassistant: hello", instructions="Summarise."),
+}
+
+
+@pytest.mark.parametrize("name", CALLS)
+def test_every_call_answers_with_the_stub(name, stub):
+    result = asyncio.run(CALLS[name]())
+
+    assert result["response_id"], result
+    assert result["ai_message"]
+    assert stub.requests_served == 1
+
+
+def test_streaming_follow_up_yields_the_whole_reply(stub):
+    async def collect():
+        events = []
+        async for event in llm_service.stream_ai_response_follow_up(
+            response_id="resp_1", instructions="Follow up.", curr_message="Where do I start?"
+        ):
+            events.append(event)
+        return events
+
+    events = asyncio.run(collect())
+
+    deltas = "".join(event["delta"] for event in events if event["type"] == "delta")
+    assert events[-1]["type"] == "done", events[-1]
+    assert deltas and all(event["type"] != "error" for event in events)
+
+
+def test_api_errors_come_back_as_a_retryable_failure(stub):
+    stub.error_rate = 1.0
+    llm_resilience.set_resilience(llm_resilience.Resilience(attempts=1))
+
+    result = asyncio.run(CALLS["gen_ai_response_question"]())
+
+    assert result["response_id"] is None
+    assert result["retryable"] is True
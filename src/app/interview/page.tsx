@@ -55,6 +55,7 @@ export default function InterviewPage() {
   const [isSendingMessage, setIsSendingMessage] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [lastAiResponseId, setLastAiResponseId] = useState<string>();
+  const [sessionId, setSessionId] = useState<string>();
 
   // WebSocket / follow‑up
   const [wsClient, setWsClient] = useState<WebSocket | null>(null);
@@ -160,6 +161,7 @@ export default function InterviewPage() {
         const init = await initiateChatSession(caseId);
         setChatMessages([{ sender: "ai", text: init.ai_message, id: init.response_id }]);
         setLastAiResponseId(init.response_id);
+        setSessionId(init.session_id);
       } catch (e: any) {
         setError(e.message || "Failed to load case or start chat.");
       } finally {
@@ -219,14 +221,48 @@ export default function InterviewPage() {
       setChatMessages((p) => [...p, { sender: "ai", text: "You can now ask follow‑up questions." }]);
       setIsSendingMessage(false);
     };
+    // Streaming frames: "delta" pieces append to the reply being written, "done" finalises it
+    // with the new response_id, "error" replaces it with the error message.
+    let streaming = false;
     wsClient.onmessage = (evt) => {
-      setIsSendingMessage(false);
       const data = JSON.parse(evt.data);
-      if (data.error) {
+      // Rate-limit notices: the reply is still coming, just later (or the message was dropped)
+      if (data.type === "throttled") {
+        if (data.dropped) setError(`${data.dropped} message(s) were dropped — please slow down.`);
+        return;
+      }
+      setIsSendingMessage(false);
+      if (data.type === "session") {
+        // Resume handshake: the server's chain head wins over ours
+        setSessionId(data.session_id);
+        if (data.response_id) setLastAiResponseId(data.response_id);
+        return;
+      }
+      if (data.type === "phase") {
+        // Interview phase change from the server: keep the question panel in step
+        setCurrentQuestionIndex(data.question_index);
+        return;
+      }
+      if (data.type === "delta") {
+        const started = streaming;
+        streaming = true;
+        setChatMessages((p) =>
+          started
+            ? [...p.slice(0, -1), { ...p[p.length - 1], text: p[p.length - 1].text + data.delta }]
+            : [...p, { sender: "ai", text: data.delta }]
+        );
+      } else if (data.error) {
+        const replace = streaming;
+        streaming = false;
         setError(data.error);
-        setChatMessages((p) => [...p, { sender: "ai", text: `Error: ${data.error}` }]);
+        setChatMessages((p) => [...(replace ? p.slice(0, -1) : p), { sender: "ai", text: `Error: ${data.error}` }]);
       } else {
-        setChatMessages((p) => [...p, { sender: "ai", text: data.ai_message, id: data.response_id }]);
+        const replace = streaming;
+        streaming = false;
+        setChatMessages((p) => [
+          ...(replace ? p.slice(0, -1) : p),
+          { sender: "ai", text: data.ai_message, id: data.response_id },
+        ]);
         setLastAiResponseId(data.response_id);
       }
     };
@@ -268,7 +304,8 @@ export default function InterviewPage() {
     }
     const proto = window.location.protocol === "https:" ? "wss:" : "ws:";
     const host = process.env.NEXT_PUBLIC_WS_BACKEND_HOST || "localhost:8000";
-    const ws = new WebSocket(`${proto}//${host}/ws/chat/${currentCase.id}/${lastAiResponseId}`);
+    const session = sessionId ? `&session_id=${encodeURIComponent(sessionId)}` : "";
+    const ws = new WebSocket(`${proto}//${host}/ws/chat/${currentCase.id}/${lastAiResponseId}?stream=1${session}`);
     setWsClient(ws);
     setIsFollowUpMode(true);
     setShowFollowUpButton(false);
@@ -576,6 +613,11 @@ export default function InterviewPage() {
                   setShowFollowUpButton(false);
                   setTimerActive(false);
                   setProceedToInterviewMode(true);
+                  // Let the server explain the first question on the same socket
+                  if (wsClient?.readyState === WebSocket.OPEN) {
+                    wsClient.send(JSON.stringify({ type: "start" }));
+                    setIsSendingMessage(true);
+                  }
                 }}
               >
                 Yes
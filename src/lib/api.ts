@@ -33,6 +33,7 @@ export interface Case {
 export interface AIResponseMessage {
   response_id?: string;   // optional per backend
   ai_message: string;
+  session_id?: string;    // pass to the chat websocket to make it resumable
 }
 
 /**